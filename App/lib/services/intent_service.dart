@@ -7,8 +7,10 @@ import 'rasa_service.dart';
 class IntentService {
   /// Process voice command and execute action
   /// Flow: Voice text -> Flask (intent classification) ->
-  ///       If confidence >= 70%: Extract keywords & route to Django for UPI actions
-  ///       If confidence < 70%: Route to Rasa for casual conversation
+  ///       If Flask says to act: Extract keywords & route to Django for UPI actions
+  ///       If Flask sets route_to_rasa: Route to Rasa for casual conversation
+  /// Flask decides with the confidence threshold of the model that served the
+  /// user, which differs per model; the app does not second-guess it.
   static Future<Map<String, dynamic>> processVoiceCommand(String text) async {
     try {
       print('Processing voice command: $text');
@@ -30,13 +32,31 @@ class IntentService {
       final confidence = intentResponse['confidence_percentage'];
       final action = intentResponse['action'];
       final assistantMessage = intentResponse['assistant_message'];
-      final routeToRasa = intentResponse['route_to_rasa'] ?? false;
+      // Servers that predate route_to_rasa only sent the confidence; compare it
+      // against the threshold they report, or the old fixed 70%
+      final threshold =
+          (intentResponse['confidence_threshold'] as num?)?.toDouble() ?? 70.0;
+      final routeToRasa =
+          intentResponse['route_to_rasa'] ??
+          (confidence != null && confidence < threshold);
 
       print('Intent: $intent, Confidence: $confidence%');
       print('Action: $action');
 
-      // CONFIDENCE CHECK: If confidence < 70% OR flagged to route to Rasa, send to Rasa chatbot
-      if (routeToRasa || (confidence != null && confidence < 70.0)) {
+      // Flask already asked Rasa (or its chatbot fallback) and replied inline
+      if (action == 'chatbot') {
+        return {
+          'status': 'success',
+          'intent': intent,
+          'action': 'chatbot',
+          'message': assistantMessage ?? 'I\'m here to help!',
+          'confidence': confidence,
+          'source': intentResponse['source'] ?? 'rasa',
+        };
+      }
+
+      // Low confidence or casual: send to Rasa chatbot
+      if (routeToRasa) {
         print('Routing to Rasa (confidence: $confidence%)...');
 
         // Send to Rasa for casual conversation
@@ -52,8 +72,8 @@ class IntentService {
         };
       }
 
-      // HIGH CONFIDENCE (>= 70%): Process UPI-related actions
-      print('High confidence - Processing UPI action...');
+      // Confident enough for Flask: Process UPI-related actions
+      print('Processing UPI action...');
 
       // Extract entities if available
       final entities = intentResponse['entities'];
@@ -0,0 +1,131 @@
+"""Request-coalescing micro-batcher used by the intent server."""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into batched calls of ``batch_fn``.
+
+    ``batch_fn`` takes a list of items and must return a list of results in the
+    same order. Callers block in ``submit`` until the batch holding their item
+    is flushed, which happens as soon as ``max_batch_size`` items are queued or
+    the oldest queued item has waited ``max_wait_ms``.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5.0, name="batcher"):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.batch_fn = batch_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000.0
+        self.name = name
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        self._reset_queue()
+        # Worker threads do not survive fork(); start a fresh one in the child
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_queue)
+
+    def _reset_queue(self):
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._worker = None
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._histogram = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(
+                target=self._run, name=f"{self.name}-worker", daemon=True
+            )
+            self._worker.start()
+
+    def submit_async(self, item):
+        """Queue ``item`` and return a Future for its result"""
+        future = Future()
+        with self._cond:
+            self._ensure_worker()
+            self._pending.append((item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def submit(self, item, timeout=None):
+        """Queue ``item`` and block until its batch has been processed"""
+        return self.submit_async(item).result(timeout)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            size = min(len(self._pending), self.max_batch_size)
+            return [self._pending.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            flushed_at = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"{self.name}: batch_fn returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                self._record(batch, flushed_at, failed=True)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self._record(batch, flushed_at)
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def _record(self, batch, flushed_at, failed=False):
+        waits = [flushed_at - enqueued_at for _, _, enqueued_at in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            if failed:
+                self._errors += 1
+            self._histogram[len(batch)] = self._histogram.get(len(batch), 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self):
+        """Return batch-size histogram and queue wait statistics"""
+        with self._stats_lock:
+            return {
+                "enabled": True,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "queue_depth": len(self._pending),
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._errors,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._histogram.items())},
+                "queue_wait_ms": {
+                    "avg": round(self._wait_total / self._items * 1000, 3) if self._items else 0.0,
+                    "max": round(self._wait_max * 1000, 3),
+                },
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
@@ -0,0 +1,162 @@
+"""Benchmark entity_extractor against the original regex cascade.
+
+Usage:
+    python bench_entities.py                 # regex slots only
+    python bench_entities.py --ner           # also load ../keyword_ner_model
+    python bench_entities.py --repeat 20
+
+Every text in voice_upi_dataset.csv is run through both extractors with its
+labelled intent and with each money intent. The run fails if the keyword
+mode (``always_ner``, what /predict and /predict_batch use) differs from the
+original output in any way, ``ner_keywords`` included, or if the slot mode
+used by /voice_command differs in any slot.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+
+from entity_extractor import MONEY_INTENTS, extract_entities, extract_entities_batch, extract_slots, needs_ner
+
+
+def legacy_extract_entities(text, intent, nlp=None):
+    """The original extract_entities from flask_server.py, kept for comparison"""
+    entities = {}
+    text_lower = text.lower()
+
+    if intent in ['transfer_money', 'request_money']:
+        amount_patterns = [
+            r'(?:rs\.?|rupees?|₹)?\s*(\d+(?:\.\d{2})?)\s*(?:rs\.?|rupees?|₹)?',
+            r'(\d+)\s*(?:rupees?|rs\.?|₹)',
+            r'₹\s*(\d+(?:\.\d{2})?)',
+            r'(\d+)\s+rupees?'
+        ]
+        for pattern in amount_patterns:
+            amount_match = re.search(pattern, text_lower)
+            if amount_match:
+                entities['amount'] = float(amount_match.group(1))
+                break
+
+        phone_patterns = [
+            r'(?:phone\s+)?(?:number\s+)?(?:mobile\s+)?(\d{10}|\d{11})',
+            r'(\+91\d{10})',
+            r'(?:to\s+|from\s+)?(\d{10})',
+            r'number\s+(\d{10})'
+        ]
+        for pattern in phone_patterns:
+            phone_match = re.search(pattern, text)
+            if phone_match:
+                phone = phone_match.group(1)
+                if not phone.startswith('+91'):
+                    phone = '+91' + phone.lstrip('0')[-10:]
+                entities['phone_number'] = phone
+                break
+
+        upi_match = re.search(r'([a-zA-Z0-9._-]+@[a-zA-Z]+)', text)
+        if upi_match:
+            entities['upi_id'] = upi_match.group(1)
+
+        name_patterns = [
+            r'(?:to|send|pay|give)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)',
+            r'([a-zA-Z]+)\s+(?:rs\.|rupees|₹|\d+)',
+            r'(?:request\s+(?:from\s+)?|ask\s+)([a-zA-Z]+(?:\s+[a-zA-Z]+)?)'
+        ]
+        for pattern in name_patterns:
+            name_match = re.search(pattern, text_lower)
+            if name_match:
+                potential_name = name_match.group(1).strip()
+                if potential_name not in ['money', 'cash', 'amount', 'payment', 'the', 'my', 'his', 'her', 'upi', 'via']:
+                    entities['recipient_name'] = potential_name.title()
+                    break
+
+    if nlp:
+        try:
+            doc = nlp(text)
+            ner_entities = [ent.text for ent in doc.ents]
+            if ner_entities:
+                entities['ner_keywords'] = ner_entities
+        except Exception:
+            pass
+
+    return entities
+
+
+def load_cases(dataset_path):
+    """(text, intent) pairs: each text with its label and with every money intent"""
+    with open(dataset_path, newline='', encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f) if len(row) >= 2][1:]
+    cases = []
+    for text, label in ((row[0], row[1].strip()) for row in rows):
+        cases.append((text, label))
+        cases.extend((text, intent) for intent in MONEY_INTENTS if intent != label)
+    return cases
+
+
+def time_per_call(fn, cases, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text, intent in cases:
+            fn(text, intent)
+    return (time.perf_counter() - started) / (repeat * len(cases)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default='voice_upi_dataset.csv')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ner', action='store_true', help='load the spaCy NER model for both extractors')
+    args = parser.parse_args()
+
+    nlp = None
+    if args.ner:
+        import spacy
+        nlp = spacy.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), '../keyword_ner_model'))
+
+    cases = load_cases(args.dataset)
+
+    mismatches = 0
+    for text, intent in cases:
+        expected = legacy_extract_entities(text, intent, nlp)
+        actual = extract_entities(text, intent, nlp, always_ner=True)
+        if expected != actual:
+            mismatches += 1
+            print(f"Mismatch for {text!r} ({intent}): {expected} != {actual}")
+        expected.pop('ner_keywords', None)
+        slots = extract_entities(text, intent, nlp)
+        slots.pop('ner_keywords', None)
+        if expected != slots:
+            mismatches += 1
+            print(f"Slot mismatch for {text!r} ({intent}): {expected} != {slots}")
+
+    texts = [text for text, _ in cases]
+    intents = [intent for _, intent in cases]
+    for always_ner in (True, False):
+        batch = extract_entities_batch(texts, intents, nlp, always_ner=always_ner)
+        if batch != [extract_entities(t, i, nlp, always_ner=always_ner) for t, i in cases]:
+            mismatches += 1
+            print(f"Batch API output differs from per-text output (always_ner={always_ner})")
+
+    legacy_us = time_per_call(lambda t, i: legacy_extract_entities(t, i, nlp), cases, args.repeat)
+    keywords_us = time_per_call(lambda t, i: extract_entities(t, i, nlp, always_ner=True), cases, args.repeat)
+    new_us = time_per_call(lambda t, i: extract_entities(t, i, nlp), cases, args.repeat)
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        extract_entities_batch(texts, intents, nlp, always_ner=True)
+    batch_us = (time.perf_counter() - started) / (args.repeat * len(cases)) * 1e6
+
+    print(f"Cases compared:    {len(cases)}")
+    print(f"Mismatches:        {mismatches}")
+    ner_calls = sum(1 for text, intent in cases if needs_ner(extract_slots(text, intent), intent))
+    print(f"NER calls:         legacy and keywords {len(cases)}, slots only {ner_calls}")
+    print(f"Legacy:            {legacy_us:.1f} us/text")
+    print(f"Keywords:          {keywords_us:.1f} us/text ({legacy_us / keywords_us:.1f}x)")
+    print(f"Keywords batch:    {batch_us:.1f} us/text ({legacy_us / batch_us:.1f}x)")
+    print(f"Slots only:        {new_us:.1f} us/text ({legacy_us / new_us:.1f}x)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Off-thread chatbot generation with admission control, stop sequences and streaming."""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ChatbotBusy(Exception):
+    """Raised when every chatbot worker is busy and the wait queue is full"""
+
+
+class ChatbotPool:
+    """Run generations on ``workers`` dedicated threads with at most ``queue_size`` waiting
+
+    ``submit`` never blocks: when all workers are busy and the queue is full
+    it raises ChatbotBusy, so callers can answer 503 or degrade instead of
+    piling requests up behind a slow model.
+    """
+
+    def __init__(self, workers=1, queue_size=8, name="chatbot"):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = int(workers)
+        self.queue_size = max(int(queue_size), 0)
+        self.name = name
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        self._reset_executor()
+        # Executor threads do not survive fork(); start fresh ones in the child
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_executor)
+
+    def _reset_executor(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._queued = 0
+        self._active = 0
+
+    def _reset_stats(self):
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.name}-worker")
+            return self._executor
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue ``fn`` and return a Future, or raise ChatbotBusy when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise ChatbotBusy(f"{self.name}: {self.workers} workers busy and {self.queue_size} requests queued")
+        submitted_at = time.perf_counter()
+        with self._stats_lock:
+            self._submitted += 1
+            self._queued += 1
+
+        def run():
+            started_at = time.perf_counter()
+            with self._stats_lock:
+                self._queued -= 1
+                self._active += 1
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                self._record(started_at - submitted_at, time.perf_counter() - started_at, failed)
+                self._slots.release()
+
+        try:
+            return self._get_executor().submit(run)
+        except Exception:
+            with self._stats_lock:
+                self._queued -= 1
+            self._slots.release()
+            raise
+
+    def _record(self, wait, run, failed):
+        with self._stats_lock:
+            self._active -= 1
+            self._completed += 1
+            if failed:
+                self._errors += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._run_total += run
+            self._run_max = max(self._run_max, run)
+
+    def stats(self):
+        """Return queue occupancy, admission and latency statistics"""
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "active": self._active,
+                "queued": self._queued,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "errors": self._errors,
+                "queue_wait_ms": {
+                    "avg": round(self._wait_total / self._completed * 1000, 3) if self._completed else 0.0,
+                    "max": round(self._wait_max * 1000, 3),
+                },
+                "generation_ms": {
+                    "avg": round(self._run_total / self._completed * 1000, 3) if self._completed else 0.0,
+                    "max": round(self._run_max * 1000, 3),
+                },
+            }
+
+
+def truncate_at_stop(text, stop_sequences):
+    """Cut ``text`` at the earliest stop sequence"""
+    cut = min((text.find(stop) for stop in stop_sequences if stop in text), default=-1)
+    return text[:cut] if cut >= 0 else text
+
+
+def stopping_criteria(tokenizer, prompt_length, stop_sequences, cancelled, tail_tokens=8):
+    """Criteria that end decoding once the new tokens contain a stop sequence or the caller gave up"""
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class StopOnSequences(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            if cancelled.is_set():
+                return True
+            # Stop sequences are a few tokens long, so only the tail needs decoding
+            start = max(prompt_length, input_ids.shape[-1] - tail_tokens)
+            tail = tokenizer.decode(input_ids[0, start:], skip_special_tokens=True)
+            return any(stop in tail for stop in stop_sequences)
+
+    return StoppingCriteriaList([StopOnSequences()])
+
+
+class ChatbotGenerator:
+    """Generate replies for a Hugging Face text-generation pipeline on a ChatbotPool"""
+
+    def __init__(self, generator, pool, stop_sequences=("User:",), max_length=128, timeout=10.0):
+        self.model = generator.model
+        self.tokenizer = generator.tokenizer
+        self.pool = pool
+        self.stop_sequences = tuple(stop_sequences)
+        self.max_length = max_length
+        self.timeout = timeout
+
+    @staticmethod
+    def format_prompt(prompt):
+        return f"User: {prompt.strip()}\nAssistant:"
+
+    def _generate(self, prompt, cancelled, streamer=None):
+        inputs = self.tokenizer(self.format_prompt(prompt), return_tensors="pt")
+        prompt_length = inputs["input_ids"].shape[-1]
+        output = self.model.generate(
+            **inputs,
+            max_length=self.max_length,
+            pad_token_id=self.tokenizer.eos_token_id,
+            stopping_criteria=stopping_criteria(self.tokenizer, prompt_length, self.stop_sequences, cancelled),
+            streamer=streamer,
+        )
+        return self.tokenizer.decode(output[0, prompt_length:], skip_special_tokens=True)
+
+    def clean(self, text):
+        return " ".join(truncate_at_stop(text, self.stop_sequences).split())
+
+    def reply(self, prompt, cancelled=None):
+        """Generated reply text; raises ChatbotBusy when the pool is full, TimeoutError past ``timeout``
+
+        Setting ``cancelled`` stops decoding at the next token.
+        """
+        cancelled = cancelled or threading.Event()
+        future = self.pool.submit(self._generate, prompt, cancelled)
+        try:
+            return self.clean(future.result(self.timeout))
+        except TimeoutError:
+            cancelled.set()
+            raise
+
+    def stream(self, prompt):
+        """Iterator over reply text chunks as they are decoded
+
+        The generation is admitted before this returns, so ChatbotBusy is
+        raised here rather than part way through a response. Closing the
+        iterator stops decoding at the next token.
+        """
+        from transformers import TextIteratorStreamer
+
+        cancelled = threading.Event()
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=self.timeout
+        )
+        future = self.pool.submit(self._generate, prompt, cancelled, streamer)
+        return self._chunks(streamer, future, cancelled)
+
+    def _chunks(self, streamer, future, cancelled):
+        # A stop sequence can arrive split over several chunks, so the last
+        # few characters are held back until they cannot start one
+        holdback = max(len(stop) for stop in self.stop_sequences) - 1 if self.stop_sequences else 0
+        text, sent = "", 0
+        try:
+            for chunk in streamer:
+                text = text + chunk if sent else (text + chunk).lstrip()
+                if len(truncate_at_stop(text, self.stop_sequences)) < len(text):
+                    cancelled.set()
+                    break
+                if len(text) - holdback > sent:
+                    yield text[sent:len(text) - holdback].replace("\n", " ")
+                    sent = len(text) - holdback
+            reply = truncate_at_stop(text, self.stop_sequences).rstrip()
+            if len(reply) > sent:
+                yield reply[sent:].replace("\n", " ")
+            future.result(self.timeout)
+        finally:
+            cancelled.set()
@@ -0,0 +1,194 @@
+"""Pooled, fault-tolerant HTTP client for the Django accounts API."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class CircuitBreaker:
+    """Fail fast after ``failure_threshold`` consecutive failures
+
+    After ``reset_timeout`` seconds one trial call is let through (half-open);
+    its success closes the circuit again, its failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = self.HALF_OPEN
+                return True
+            if self.state == self.HALF_OPEN:
+                # Only the single trial call goes through while half-open
+                self.rejected += 1
+                return False
+            return True
+
+    def is_open(self):
+        """True while calls are being rejected; unlike ``allow`` this never starts a trial call"""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected_calls": self.rejected,
+            }
+
+
+def build_session(pool_size=20, retries=0, backoff=0.2, retry_methods=('GET',)):
+    """requests.Session with a keep-alive pool; only retry_methods are retried after a response"""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(retry_methods),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def parse_timeouts(spec):
+    """Parse 'getBalance=3,sendMoneyPhone=8' into {'getBalance': 3.0, 'sendMoneyPhone': 8.0}"""
+    timeouts = {}
+    for item in (spec or '').split(','):
+        if '=' in item:
+            endpoint, seconds = item.split('=', 1)
+            timeouts[endpoint.strip()] = float(seconds)
+    return timeouts
+
+
+class DjangoClient:
+    """Client for the Django accounts API with pooling, retries and a circuit breaker
+
+    ``call`` keeps the response contract of the original call_django_api: the
+    decoded JSON on HTTP 200, otherwise a dict with 'error' and status 'error'
+    (carrying Django's own message for 4xx responses).
+    ``call_async`` runs the same call on a small thread pool and returns a
+    Future, so the orchestrator can overlap several backend calls.
+    """
+
+    def __init__(self, base_url, pool_size=20, connect_timeout=2.0, default_timeout=10.0,
+                 timeouts=None, get_retries=2, backoff=0.2, failure_threshold=5,
+                 reset_timeout=30.0, async_workers=8):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+        self.session = build_session(pool_size, retries=get_retries, backoff=backoff)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.async_workers = async_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _count(self, failed):
+        with self._stats_lock:
+            self.calls += 1
+            if failed:
+                self.errors += 1
+
+    def call(self, endpoint, method='GET', data=None, params=None):
+        """Make an API call to the Django backend"""
+        if not self.breaker.allow():
+            self._count(True)
+            return {"error": "Django backend unavailable, please try again shortly", "status": "error"}
+
+        url = f"{self.base_url}/{endpoint}/"
+        timeout = (self.connect_timeout, self.timeouts.get(endpoint, self.default_timeout))
+        try:
+            if method == 'GET':
+                response = self.session.get(url, params=params, timeout=timeout)
+            elif method == 'POST':
+                response = self.session.post(url, json=data, timeout=timeout)
+            else:
+                raise ValueError(f"Unsupported method: {method}")
+        except requests.exceptions.RequestException as e:
+            self.breaker.record_failure()
+            self._count(True)
+            return {"error": f"Connection error: {str(e)}", "status": "error"}
+        except Exception as e:
+            self.breaker.record_failure()
+            self._count(True)
+            return {"error": f"Unexpected error: {str(e)}", "status": "error"}
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+        if response.status_code == 200:
+            self._count(False)
+            try:
+                return response.json()
+            except ValueError as e:
+                return {"error": f"Unexpected error: {str(e)}", "status": "error"}
+
+        self._count(True)
+        if response.status_code < 500:
+            # Django answers client errors with {'error': ..., 'status': 'error'}; keep its message
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            if isinstance(body, dict) and body.get('error'):
+                return {"error": body['error'], "status": "error", "http_status": response.status_code}
+        return {"error": f"API call failed: {response.status_code}", "status": "error"}
+
+    def call_async(self, endpoint, method='GET', data=None, params=None):
+        """Run ``call`` in the background and return a Future for its result"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.async_workers, thread_name_prefix='django-client')
+        return self._executor.submit(self.call, endpoint, method, data, params)
+
+    def stats(self):
+        with self._stats_lock:
+            calls, errors = self.calls, self.errors
+        return {
+            "base_url": self.base_url,
+            "calls": calls,
+            "errors": errors,
+            "circuit_breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,114 @@
+"""Precompiled entity extraction for money intents.
+
+Produces exactly the slots of the original regex cascade in flask_server
+(amount, phone_number, upi_id, recipient_name) but with patterns compiled
+once and amount and phone number found in a single pass over the digit runs.
+The spaCy NER model is only consulted when a required slot is still missing,
+unless ``always_ner`` is set: /predict and /predict_batch return the NER
+keywords for every text, as the original did, while /voice_command only
+needs the slots.
+"""
+import re
+
+MONEY_INTENTS = ('transfer_money', 'request_money')
+RECIPIENT_SLOTS = ('phone_number', 'upi_id', 'recipient_name')
+
+# Words the name patterns can capture that are never recipients
+NAME_STOPWORDS = frozenset(['money', 'cash', 'amount', 'payment', 'the', 'my', 'his', 'her', 'upi', 'via'])
+
+_DIGITS_RE = re.compile(r'\d+')
+_DECIMALS_RE = re.compile(r'\.\d{2}')
+_UPI_RE = re.compile(r'([a-zA-Z0-9._-]+@[a-zA-Z]+)')
+
+# Tried in order; the first capture that is not a stopword wins
+_NAME_PATTERNS = (
+    re.compile(r'(?:to|send|pay|give)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)'),
+    re.compile(r'([a-zA-Z]+)\s+(?:rs\.|rupees|₹|\d+)'),
+    re.compile(r'(?:request\s+(?:from\s+)?|ask\s+)([a-zA-Z]+(?:\s+[a-zA-Z]+)?)'),
+)
+
+
+def _scan_numbers(text, entities):
+    """Find the amount (first number) and phone (first run of 10+ digits) in one pass"""
+    for match in _DIGITS_RE.finditer(text):
+        if 'amount' not in entities:
+            end = match.end()
+            decimals = _DECIMALS_RE.match(text, end)
+            entities['amount'] = float(text[match.start():decimals.end() if decimals else end])
+        if len(match.group()) >= 10:
+            phone = match.group()[:10]
+            entities['phone_number'] = '+91' + phone.lstrip('0')[-10:]
+            return
+
+
+def _find_name(text_lower):
+    for pattern in _NAME_PATTERNS:
+        name_match = pattern.search(text_lower)
+        if name_match:
+            potential_name = name_match.group(1).strip()
+            if potential_name not in NAME_STOPWORDS:
+                return potential_name.title()
+    return None
+
+
+def extract_slots(text, intent):
+    """Extract amount, phone number, UPI ID and recipient name without NER"""
+    entities = {}
+    if intent not in MONEY_INTENTS:
+        return entities
+
+    _scan_numbers(text, entities)
+
+    upi_match = _UPI_RE.search(text)
+    if upi_match:
+        entities['upi_id'] = upi_match.group(1)
+
+    name = _find_name(text.lower())
+    if name:
+        entities['recipient_name'] = name
+
+    return entities
+
+
+def needs_ner(entities, intent):
+    """True when a money intent is still missing its amount or recipient"""
+    if intent not in MONEY_INTENTS:
+        return False
+    return 'amount' not in entities or not any(slot in entities for slot in RECIPIENT_SLOTS)
+
+
+def _add_ner_keywords(entities, doc):
+    ner_entities = [ent.text for ent in doc.ents]
+    if ner_entities:
+        entities['ner_keywords'] = ner_entities
+
+
+def extract_entities(text, intent, nlp=None, always_ner=False):
+    """Extract entities for one text, falling back to NER only for missing slots"""
+    entities = extract_slots(text, intent)
+    if nlp is not None and (always_ner or needs_ner(entities, intent)):
+        try:
+            _add_ner_keywords(entities, nlp(text))
+        except Exception:
+            pass
+    return entities
+
+
+def extract_entities_batch(texts, intents, nlp=None, batch_size=64, always_ner=False):
+    """Extract entities for many texts, running NER through nlp.pipe for those that need it"""
+    results = [extract_slots(text, intent) for text, intent in zip(texts, intents)]
+    if nlp is None:
+        return results
+
+    pending = [
+        index for index, (entities, intent) in enumerate(zip(results, intents))
+        if always_ner or needs_ner(entities, intent)
+    ]
+    if pending:
+        try:
+            docs = nlp.pipe((texts[index] for index in pending), batch_size=batch_size)
+            for index, doc in zip(pending, docs):
+                _add_ner_keywords(results[index], doc)
+        except Exception:
+            pass
+    return results
@@ -0,0 +1,162 @@
+"""Export intent_model.h5 and its preprocessors to a lean NumPy bundle.
+
+Usage:
+    python export_model.py                      # writes ./intent_model_lean
+    python export_model.py --verify             # export, then check parity with Keras
+    python export_model.py --verify-only        # check an existing bundle
+
+The bundle is a directory with ``spec.json`` (layer list, classes, max_len and
+tokenizer settings), ``vocab.json`` (tokenizer word_index) and one ``.npy`` file
+per weight array. It is served by ``LeanIntentRuntime`` in intent_runtime.py
+without TensorFlow (set INTENT_RUNTIME=lean on the Flask server).
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from intent_runtime import LEAN_BUNDLE_FORMAT, KerasIntentRuntime, LeanIntentRuntime
+from preprocessing import preprocess_text
+
+IDENTITY_LAYERS = {'InputLayer', 'Dropout', 'SpatialDropout1D'}
+WEIGHTLESS_LAYERS = {'GlobalMaxPooling1D', 'GlobalAveragePooling1D', 'Flatten'}
+
+
+def layer_spec(layer):
+    """Describe one Keras layer for the lean runtime"""
+    kind = layer.__class__.__name__
+    config = layer.get_config()
+
+    if kind in WEIGHTLESS_LAYERS:
+        return {'type': kind}
+    if kind == 'Embedding':
+        if config.get('mask_zero'):
+            raise ValueError("Embedding layers with mask_zero=True are not supported")
+        return {'type': kind}
+    if kind == 'Conv1D':
+        strides = tuple(config.get('strides', (1,)))
+        dilation = tuple(config.get('dilation_rate', (1,)))
+        if config.get('padding') != 'valid' or strides != (1,) or dilation != (1,):
+            raise ValueError("Only Conv1D layers with padding='valid', strides=1 and dilation_rate=1 are supported")
+        return {'type': kind, 'activation': config.get('activation')}
+    if kind == 'Dense':
+        return {'type': kind, 'activation': config.get('activation')}
+    raise ValueError(f"Unsupported layer type for lean export: {kind}")
+
+
+def export_bundle(model_dir, output_dir):
+    """Write the lean bundle for the Keras model found in model_dir"""
+    runtime = KerasIntentRuntime(model_dir)
+    tokenizer = runtime.tokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    layers = []
+    for index, layer in enumerate(runtime.model.layers):
+        if layer.__class__.__name__ in IDENTITY_LAYERS:
+            continue
+        spec = layer_spec(layer)
+        weights = []
+        for weight_index, array in enumerate(layer.get_weights()):
+            name = f"layer{index}_{weight_index}.npy"
+            np.save(os.path.join(output_dir, name), np.ascontiguousarray(array, dtype=np.float32))
+            weights.append(name)
+        if weights:
+            spec['weights'] = weights
+        layers.append(spec)
+
+    spec = {
+        'format': LEAN_BUNDLE_FORMAT,
+        'max_len': int(runtime.max_len),
+        'classes': [str(label) for label in runtime.classes],
+        'tokenizer': {
+            'num_words': tokenizer.num_words,
+            'oov_token': tokenizer.oov_token,
+            'filters': tokenizer.filters,
+            'lower': tokenizer.lower,
+            'split': tokenizer.split,
+            'padding': 'post',
+            'truncating': 'pre',
+        },
+        'layers': layers,
+    }
+    if getattr(tokenizer, 'char_level', False):
+        raise ValueError("Character-level tokenizers are not supported")
+
+    with open(os.path.join(output_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(tokenizer.word_index, f, ensure_ascii=False)
+    with open(os.path.join(output_dir, 'spec.json'), 'w', encoding='utf-8') as f:
+        json.dump(spec, f, indent=2)
+
+    print(f"Exported {len(layers)} layers to {output_dir}")
+
+
+def load_texts(dataset_path):
+    with open(dataset_path, newline='', encoding='utf-8') as f:
+        return [row[0] for row in csv.reader(f) if row][1:]
+
+
+def verify_bundle(model_dir, output_dir, dataset_path, atol):
+    """Compare Keras and lean outputs on the dataset; return True on parity"""
+    texts = [preprocess_text(text) for text in load_texts(dataset_path)]
+
+    started = time.perf_counter()
+    keras_runtime = KerasIntentRuntime(model_dir)
+    keras_load = time.perf_counter() - started
+
+    started = time.perf_counter()
+    lean_runtime = LeanIntentRuntime(output_dir)
+    lean_load = time.perf_counter() - started
+
+    keras_padded = keras_runtime.encode(texts)
+    lean_padded = lean_runtime.encode(texts)
+    if not np.array_equal(np.asarray(keras_padded), lean_padded):
+        mismatched = int((np.asarray(keras_padded) != lean_padded).any(axis=1).sum())
+        print(f"FAIL: tokenization differs for {mismatched} of {len(texts)} texts")
+        return False
+
+    keras_probs = keras_runtime.predict_proba(keras_padded)
+    lean_probs = lean_runtime.predict_proba(lean_padded)
+    max_diff = float(np.abs(keras_probs - lean_probs).max())
+    same_labels = bool((keras_probs.argmax(axis=1) == lean_probs.argmax(axis=1)).all())
+
+    def per_request_ms(runtime):
+        started = time.perf_counter()
+        for text in texts[:200]:
+            runtime.predict_proba(runtime.encode([text]))
+        return (time.perf_counter() - started) / min(len(texts), 200) * 1000
+
+    print(f"Texts compared:        {len(texts)}")
+    print(f"Max |probability diff|: {max_diff:.2e} (tolerance {atol:.0e})")
+    print(f"Identical labels:      {same_labels}")
+    print(f"Load time:             keras {keras_load:.2f}s, lean {lean_load:.3f}s")
+    print(f"Single-text latency:   keras {per_request_ms(keras_runtime):.2f}ms, lean {per_request_ms(lean_runtime):.3f}ms")
+
+    ok = same_labels and max_diff <= atol
+    print("PASS" if ok else "FAIL")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-dir', default='.', help='directory holding intent_model.h5 and the .pkl files')
+    parser.add_argument('--output', default='intent_model_lean', help='bundle directory to write')
+    parser.add_argument('--dataset', default='voice_upi_dataset.csv', help='CSV used for the parity check')
+    parser.add_argument('--atol', type=float, default=1e-5, help='max allowed probability difference')
+    parser.add_argument('--verify', action='store_true', help='check parity with Keras after exporting')
+    parser.add_argument('--verify-only', action='store_true', help='only check parity of an existing bundle')
+    args = parser.parse_args()
+
+    if not args.verify_only:
+        export_bundle(args.model_dir, args.output)
+
+    if args.verify or args.verify_only:
+        if not verify_bundle(args.model_dir, args.output, args.dataset, args.atol):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
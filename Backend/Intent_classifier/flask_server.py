@@ -1,204 +1,436 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g, has_request_context, stream_with_context
 from flask_cors import CORS
-import pickle
+import json
 import numpy as np
-import re
-import requests
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.sequence import pad_sequences
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-import spacy
 import os
+import re
+import secrets
+import time
+from functools import wraps
+from batching import MicroBatcher
+from chatbot_runtime import ChatbotBusy, ChatbotGenerator, ChatbotPool
+from django_client import DjangoClient, parse_timeouts
+import entity_extractor
+from intent_runtime import load_intent_runtime
+from model_loader import ComponentLoader, ComponentNotReady
+from model_registry import ModelRegistry, RegistryError, UnknownVersion
+from preprocessing import preprocess_text
+from rasa_client import RasaClient
+from result_cache import create_cache
+import shadow
+from shadow import ShadowLog, ShadowScorer
+from speculation import Speculator
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for Flutter app
 
-# Django backend configuration
-DJANGO_BASE_URL = "http://172.16.192.54:8000/accounts"  # For physical device on same network
+# Django backend configuration (docker-compose sets DJANGO_BASE_URL=http://django:8000/accounts)
+DJANGO_BASE_URL = os.getenv('DJANGO_BASE_URL', 'http://localhost:8000/accounts')
+DJANGO_POOL_SIZE = int(os.getenv('DJANGO_POOL_SIZE', '20'))
+DJANGO_TIMEOUT = float(os.getenv('DJANGO_TIMEOUT', '10'))
+DJANGO_CONNECT_TIMEOUT = float(os.getenv('DJANGO_CONNECT_TIMEOUT', '2'))
+# Per-endpoint read timeouts, e.g. "getBalance=3,sendMoneyPhone=8"
+DJANGO_TIMEOUTS = parse_timeouts(os.getenv('DJANGO_TIMEOUTS', 'getBalance=3,searchPhonenumber=3,searchByUpiId=3,resolveRecipient=1'))
+DJANGO_GET_RETRIES = int(os.getenv('DJANGO_GET_RETRIES', '2'))
+DJANGO_BREAKER_THRESHOLD = int(os.getenv('DJANGO_BREAKER_THRESHOLD', '5'))
+DJANGO_BREAKER_RESET_SECONDS = float(os.getenv('DJANGO_BREAKER_RESET_SECONDS', '30'))
 
-# Load intent classification model and preprocessors
-print("Loading intent classification model...")
-try:
-    model = load_model('intent_model.h5')
-    
-    with open('tokenizer.pkl', 'rb') as f:
-        tokenizer = pickle.load(f)
-    
-    with open('label_encoder.pkl', 'rb') as f:
-        label_encoder = pickle.load(f)
-    
-    with open('max_len.pkl', 'rb') as f:
-        max_len = pickle.load(f)
-    
-    print("Intent classification model loaded successfully!")
-    
-except Exception as e:
-    print(f"Error loading intent classification files: {e}")
-    exit(1)
+# Low-confidence and casual utterances: 'client' flags them with route_to_rasa for the
+# app to send to Rasa itself; 'server' asks Rasa here within RASA_TIMEOUT_SECONDS
+# and answers inline, falling back to the GPT chatbot when Rasa misses the deadline
+RASA_ROUTING = os.getenv('RASA_ROUTING', 'client')
+RASA_BASE_URL = os.getenv('RASA_BASE_URL', 'http://localhost:5005')
+RASA_POOL_SIZE = int(os.getenv('RASA_POOL_SIZE', '10'))
+RASA_TIMEOUT_SECONDS = float(os.getenv('RASA_TIMEOUT_SECONDS', '1.5'))
+RASA_CONNECT_TIMEOUT = float(os.getenv('RASA_CONNECT_TIMEOUT', '0.3'))
+# With server routing, SPECULATIVE_ROUTING starts the chatbot reply alongside intent
+# classification while Rasa's circuit breaker is open, i.e. while the chatbot is what
+# answers casual utterances: 'prefilter' for utterances that look casual, 'always'
+# for every utterance, 'off' to wait for the classifier first. Rasa itself is never
+# called speculatively, since every call adds a turn to the sender's tracker.
+SPECULATIVE_ROUTING = os.getenv('SPECULATIVE_ROUTING', 'off')
+SPECULATIVE_WORKERS = int(os.getenv('SPECULATIVE_WORKERS', '8'))
+
+# Execute mode for /voice_command ("execute": true): the Django action runs in the
+# same request. Intents listed here are only prepared and need a confirmation turn.
+VOICE_CONFIRM_INTENTS = [name.strip() for name in os.getenv('VOICE_CONFIRM_INTENTS', 'transfer_money').split(',') if name.strip()]
+CONFIRMATION_TTL_SECONDS = float(os.getenv('CONFIRMATION_TTL_SECONDS', '120'))
+
+# Micro-batching of concurrent predict_intent calls
+INTENT_BATCHING_ENABLED = os.getenv('INTENT_BATCHING', '1') == '1'
+INTENT_BATCH_MAX_SIZE = int(os.getenv('INTENT_BATCH_MAX_SIZE', '32'))
+INTENT_BATCH_MAX_WAIT_MS = float(os.getenv('INTENT_BATCH_MAX_WAIT_MS', '5'))
+
+# Number of texts per forward pass in /predict_batch
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv('PREDICT_BATCH_CHUNK_SIZE', '256'))
+
+# Result cache for predict_intent/extract_entities keyed on normalized text.
+# INTENT_CACHE_SIZE=0 disables it; INTENT_CACHE_REDIS_URL shares it across workers.
+INTENT_CACHE_SIZE = int(os.getenv('INTENT_CACHE_SIZE', '10000'))
+INTENT_CACHE_TTL = float(os.getenv('INTENT_CACHE_TTL', '0'))
+INTENT_CACHE_REDIS_URL = os.getenv('INTENT_CACHE_REDIS_URL')
 
-# Load GPT chatbot model
-print("Loading GPT chatbot model...")
-try:
+# Intent runtime: 'keras' serves intent_model.h5 through TensorFlow, 'lean' serves
+# the NumPy bundle written by export_model.py without importing TensorFlow
+INTENT_RUNTIME = os.getenv('INTENT_RUNTIME', 'keras')
+INTENT_LEAN_BUNDLE = os.getenv('INTENT_LEAN_BUNDLE', 'intent_model_lean')
+# Memory-map the lean bundle's weights, so forked workers share one copy from the page cache
+INTENT_LEAN_MMAP = os.getenv('INTENT_LEAN_MMAP', '0') == '1'
+
+# Model loading: 'background' loads every component in parallel threads,
+# 'lazy' loads each one on first use, 'eager' loads them one by one at import.
+# LAZY_COMPONENTS lists components to load on first use in any mode.
+MODEL_LOAD_MODE = os.getenv('MODEL_LOAD_MODE', 'background')
+LAZY_COMPONENTS = [name.strip() for name in os.getenv('LAZY_COMPONENTS', '').split(',') if name.strip()]
+INTENT_WAIT_SECONDS = float(os.getenv('INTENT_WAIT_SECONDS', '5'))
+CHATBOT_WAIT_SECONDS = float(os.getenv('CHATBOT_WAIT_SECONDS', '0'))
+
+# Versioned intent/NER models: with MODEL_REGISTRY_DIR set, the manifest's active
+# version is served and a newly activated one is swapped in without a restart.
+# Each worker checks the manifest every MODEL_REGISTRY_POLL_SECONDS (0 disables);
+# /admin/models needs MODEL_ADMIN_TOKEN in an X-Admin-Token header.
+MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR')
+MODEL_REGISTRY_POLL_SECONDS = float(os.getenv('MODEL_REGISTRY_POLL_SECONDS', '5'))
+MODEL_ADMIN_TOKEN = os.getenv('MODEL_ADMIN_TOKEN')
+NER_MODEL_PATH = os.path.join(os.path.dirname(__file__), '../keyword_ner_model')
+
+# Candidate intent model for comparison on live traffic, loaded with the
+# SHADOW_MODEL_RUNTIME runtime ('sklearn', 'lean' or 'keras') from SHADOW_MODEL_PATH.
+# SHADOW_SAMPLE_RATE of /voice_command requests are also scored by both models off
+# the response path and logged to SHADOW_LOG_PATH (summarize with `python shadow.py`);
+# utterances are logged as hashes unless SHADOW_LOG_TEXT=1. AB_CANDIDATE_PERCENT of
+# users, picked by hashing userPhone with AB_SALT, are served by the candidate.
+# With both at 0 the candidate is not loaded.
+SHADOW_MODEL_RUNTIME = os.getenv('SHADOW_MODEL_RUNTIME', 'sklearn')
+SHADOW_MODEL_PATH = os.getenv('SHADOW_MODEL_PATH', os.path.join(os.path.dirname(__file__), '../../voice_upi_intent_model.pkl'))
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0'))
+SHADOW_LOG_PATH = os.getenv('SHADOW_LOG_PATH', 'shadow_log.jsonl')
+SHADOW_LOG_TEXT = os.getenv('SHADOW_LOG_TEXT', '0') == '1'
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '100'))
+AB_CANDIDATE_PERCENT = float(os.getenv('AB_CANDIDATE_PERCENT', '0'))
+AB_SALT = os.getenv('AB_SALT', 'intent-ab')
+CANDIDATE_ENABLED = SHADOW_SAMPLE_RATE > 0 or AB_CANDIDATE_PERCENT > 0
+# Confidence (percent) below which /voice_command routes to Rasa instead of acting.
+# Each model needs its own: the TF-IDF candidate spreads probability over the
+# classes more than the Keras model does for the same command.
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '70'))
+CANDIDATE_CONFIDENCE_THRESHOLD = float(os.getenv('CANDIDATE_CONFIDENCE_THRESHOLD', '55'))
+CONFIDENCE_THRESHOLDS = {shadow.PRIMARY: INTENT_CONFIDENCE_THRESHOLD, shadow.CANDIDATE: CANDIDATE_CONFIDENCE_THRESHOLD}
+
+# Chatbot generation runs on CHATBOT_WORKERS threads with at most CHATBOT_QUEUE_SIZE
+# requests waiting. Past that, CHATBOT_OVERLOAD='degrade' answers with the canned
+# reply and 'reject' answers 503. Replies to repeated prompts come from a cache.
+CHATBOT_WORKERS = int(os.getenv('CHATBOT_WORKERS', '1'))
+CHATBOT_QUEUE_SIZE = int(os.getenv('CHATBOT_QUEUE_SIZE', '8'))
+CHATBOT_OVERLOAD = os.getenv('CHATBOT_OVERLOAD', 'degrade')
+CHATBOT_TIMEOUT_SECONDS = float(os.getenv('CHATBOT_TIMEOUT_SECONDS', '10'))
+CHATBOT_MAX_LENGTH = int(os.getenv('CHATBOT_MAX_LENGTH', '128'))
+CHATBOT_STOP_SEQUENCES = [stop for stop in os.getenv('CHATBOT_STOP_SEQUENCES', 'User:').split(',') if stop]
+CHATBOT_CACHE_SIZE = int(os.getenv('CHATBOT_CACHE_SIZE', '1000'))
+CHATBOT_CACHE_TTL = float(os.getenv('CHATBOT_CACHE_TTL', '3600'))
+
+def load_intent_classifier():
+    """Load intent classification model and preprocessors"""
+    return load_intent_runtime(INTENT_RUNTIME, '.', lean_bundle=INTENT_LEAN_BUNDLE, mmap=INTENT_LEAN_MMAP)
+
+def load_candidate_intent():
+    """Load the candidate intent model compared against the primary"""
+    model_dir, name = os.path.split(SHADOW_MODEL_PATH)
+    return load_intent_runtime(SHADOW_MODEL_RUNTIME, model_dir or '.', lean_bundle=name, mmap=INTENT_LEAN_MMAP, sklearn_model=name)
+
+def load_chatbot():
+    """Load GPT chatbot model and its text generation pipeline"""
+    from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+    
     chatbot_model_path = "../gpt/models/tiny_transformer_chatbot"
     chatbot_model = AutoModelForCausalLM.from_pretrained(chatbot_model_path)
     chatbot_tokenizer = AutoTokenizer.from_pretrained(chatbot_model_path)
     
     # Create text generation pipeline
-    chatbot_generator = pipeline(
+    return pipeline(
         "text-generation",
         model=chatbot_model,
         tokenizer=chatbot_tokenizer,
-        max_length=128,
+        max_length=CHATBOT_MAX_LENGTH,
         pad_token_id=chatbot_tokenizer.eos_token_id,
     )
-    
-    print("GPT chatbot model loaded successfully!")
-    
-except Exception as e:
-    print(f"Error loading GPT chatbot model: {e}")
-    print("Continuing without chatbot functionality...")
-    chatbot_generator = None
-
-# Load NER model for entity extraction
-print("Loading NER model...")
-try:
-    ner_model_path = os.path.join(os.path.dirname(__file__), '../keyword_ner_model')
-    if os.path.exists(ner_model_path):
-        nlp = spacy.load(ner_model_path)
-        print("NER model loaded successfully!")
-    else:
+
+def load_ner_model():
+    """Load NER model for entity extraction"""
+    if not os.path.exists(NER_MODEL_PATH):
         print("NER model not found, using fallback entity extraction")
-        nlp = None
-except Exception as e:
-    print(f"Error loading NER model: {e}")
-    nlp = None
-
-def preprocess_text(text):
-    """Clean and preprocess text for prediction"""
-    text = text.lower()  # Convert to lowercase
-    text = re.sub(r'[^\w\s]', '', text)  # Remove punctuation
-    text = re.sub(r'\s+', ' ', text).strip()  # Remove extra spaces
-    return text
-
-def extract_entities(text, intent):
-    """Extract entities based on intent using multiple methods"""
-    entities = {}
-    text_lower = text.lower()
-    
-    if intent in ['transfer_money', 'request_money']:
-        # Extract amount
-        amount_patterns = [
-            r'(?:rs\.?|rupees?|₹)?\s*(\d+(?:\.\d{2})?)\s*(?:rs\.?|rupees?|₹)?',
-            r'(\d+)\s*(?:rupees?|rs\.?|₹)',
-            r'₹\s*(\d+(?:\.\d{2})?)',
-            r'(\d+)\s+rupees?'
-        ]
-        
-        for pattern in amount_patterns:
-            amount_match = re.search(pattern, text_lower)
-            if amount_match:
-                entities['amount'] = float(amount_match.group(1))
-                break
-        
-        # Extract phone number
-        phone_patterns = [
-            r'(?:phone\s+)?(?:number\s+)?(?:mobile\s+)?(\d{10}|\d{11})',
-            r'(\+91\d{10})',
-            r'(?:to\s+|from\s+)?(\d{10})',
-            r'number\s+(\d{10})'
-        ]
-        
-        for pattern in phone_patterns:
-            phone_match = re.search(pattern, text)
-            if phone_match:
-                phone = phone_match.group(1)
-                if not phone.startswith('+91'):
-                    phone = '+91' + phone.lstrip('0')[-10:]  # Get last 10 digits
-                entities['phone_number'] = phone
-                break
-        
-        # Extract UPI ID
-        upi_pattern = r'([a-zA-Z0-9._-]+@[a-zA-Z]+)'
-        upi_match = re.search(upi_pattern, text)
-        if upi_match:
-            entities['upi_id'] = upi_match.group(1)
-        
-        # Extract recipient name (words that could be names)
-        name_patterns = [
-            r'(?:to|send|pay|give)\s+([a-zA-Z]+(?:\s+[a-zA-Z]+)?)',
-            r'([a-zA-Z]+)\s+(?:rs\.|rupees|₹|\d+)',
-            r'(?:request\s+(?:from\s+)?|ask\s+)([a-zA-Z]+(?:\s+[a-zA-Z]+)?)'
-        ]
-        
-        for pattern in name_patterns:
-            name_match = re.search(pattern, text_lower)
-            if name_match:
-                potential_name = name_match.group(1).strip()
-                # Filter out common words
-                if potential_name not in ['money', 'cash', 'amount', 'payment', 'the', 'my', 'his', 'her', 'upi', 'via']:
-                    entities['recipient_name'] = potential_name.title()
-                    break
+        return None
     
-    # Use NER model if available for additional keywords
-    if nlp:
+    import spacy
+    return spacy.load(NER_MODEL_PATH)
+
+components = ComponentLoader(MODEL_LOAD_MODE, lazy_components=LAZY_COMPONENTS)
+model_registry = ModelRegistry(
+    MODEL_REGISTRY_DIR,
+    components,
+    mmap=INTENT_LEAN_MMAP,
+    fallback_ner=NER_MODEL_PATH,
+    poll_seconds=MODEL_REGISTRY_POLL_SECONDS,
+) if MODEL_REGISTRY_DIR else None
+components.register('intent_classifier', model_registry.load_intent if model_registry else load_intent_classifier, required=True)
+components.register('chatbot', load_chatbot)
+components.register('ner_model', model_registry.load_ner if model_registry else load_ner_model)
+if CANDIDATE_ENABLED:
+    components.register('candidate_intent', load_candidate_intent)
+components.start()
+if model_registry:
+    model_registry.start_watcher()
+
+intent_cache = create_cache(
+    'intent',
+    maxsize=INTENT_CACHE_SIZE,
+    ttl=INTENT_CACHE_TTL,
+    redis_url=INTENT_CACHE_REDIS_URL,
+) if INTENT_CACHE_SIZE > 0 else None
+_cache_version = None
+
+# Prepared money actions awaiting a confirmation turn, keyed by one-time token.
+# Shared through Redis with the intent cache so any worker can confirm.
+pending_actions = create_cache(
+    'pending_actions',
+    ttl=CONFIRMATION_TTL_SECONDS,
+    redis_url=INTENT_CACHE_REDIS_URL,
+)
+
+chatbot_pool = ChatbotPool(CHATBOT_WORKERS, CHATBOT_QUEUE_SIZE, name="chatbot")
+chatbot_cache = create_cache(
+    'chatbot',
+    maxsize=CHATBOT_CACHE_SIZE,
+    ttl=CHATBOT_CACHE_TTL,
+    redis_url=INTENT_CACHE_REDIS_URL,
+) if CHATBOT_CACHE_SIZE > 0 else None
+
+def current_models():
+    """(intent runtime, NER model) used by this request
+
+    Read together on first use and pinned for the rest of the request, so a
+    hot swap never mixes versions and requests under way finish on the
+    version they started with.
+    """
+    if has_request_context() and 'models' in g:
+        return g.models
+    components.get('intent_classifier', timeout=INTENT_WAIT_SECONDS)
+    components.peek('ner_model')  # starts a lazy NER load
+    models = components.current('intent_classifier', 'ner_model')
+    if has_request_context() and models[0] is not None:
+        g.models = models
+    return models
+
+def model_version():
+    """Version of the intent model serving this request, without starting a lazy load"""
+    if has_request_context() and 'served_runtime' in g:
+        intent_runtime = g.served_runtime
+    elif has_request_context() and 'models' in g:
+        intent_runtime = g.models[0]
+    else:
+        intent_runtime = components.current('intent_classifier')[0]
+    return intent_runtime.version if intent_runtime is not None else None
+
+def versioned_cache_key(*parts, intent_runtime=None):
+    """Cache key tied to the intent model used; a new primary version drops stale entries"""
+    global _cache_version
+    version = current_models()[0].version
+    if version != _cache_version:
+        if _cache_version is not None and intent_cache.backend == "memory":
+            intent_cache.clear()
+        _cache_version = version
+    if intent_runtime is not None:
+        version = intent_runtime.version
+    return ":".join((version,) + parts)
+
+def requires_intent_classifier(view):
+    """Answer 503 instead of serving a request before the intent model is ready"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
         try:
-            doc = nlp(text)
-            ner_entities = [ent.text for ent in doc.ents]
-            if ner_entities:
-                entities['ner_keywords'] = ner_entities
-        except:
-            pass
+            components.get('intent_classifier', timeout=INTENT_WAIT_SECONDS)
+        except ComponentNotReady as e:
+            return jsonify({
+                "error": "Intent classifier is still loading",
+                "state": e.state,
+                "status": "error"
+            }), 503
+        if not components.is_ready('intent_classifier'):
+            return jsonify({
+                "error": "Intent classifier failed to load",
+                "status": "error"
+            }), 503
+        return view(*args, **kwargs)
+    return wrapper
+
+def extract_entities(text, intent, keywords=False):
+    """Extract entities based on intent
     
-    return entities
+    NER is only consulted for missing slots unless ``keywords`` asks for the
+    ner_keywords of every text, as the legacy endpoints return them.
+    """
+    nlp = current_models()[1]
+    if not intent_cache or intent not in entity_extractor.MONEY_INTENTS:
+        return entity_extractor.extract_entities(text, intent, nlp=nlp, always_ner=keywords)
+    
+    # UPI IDs and phone numbers need the raw text, so entities are keyed on it
+    mode = ('keywords' if keywords else 'ner') if nlp else 'regex'
+    cache_key = versioned_cache_key('entities', mode, intent, text)
+    entities = intent_cache.get(cache_key)
+    if entities is None:
+        entities = entity_extractor.extract_entities(text, intent, nlp=nlp, always_ner=keywords)
+        intent_cache.set(cache_key, entities)
+    return dict(entities)
+
+CHATBOT_FALLBACK_REPLY = "I'm here to help you with UPI transactions! You can send money, check balance, or request payments."
+CHATBOT_EMPTY_REPLY = "I'm here to help you with your UPI transactions!"
+
+def get_chatbot():
+    """ChatbotGenerator for the loaded chatbot, or None while it is loading or unavailable"""
+    try:
+        generator = components.get('chatbot', timeout=CHATBOT_WAIT_SECONDS)
+    except ComponentNotReady:
+        return None
+    if not generator:
+        return None
+    return ChatbotGenerator(
+        generator,
+        chatbot_pool,
+        stop_sequences=CHATBOT_STOP_SEQUENCES,
+        max_length=CHATBOT_MAX_LENGTH,
+        timeout=CHATBOT_TIMEOUT_SECONDS,
+    )
 
-def get_chatbot_response(prompt):
-    """Get response from trained GPT chatbot"""
-    if not chatbot_generator:
-        return "I'm here to help you with UPI transactions! You can send money, check balance, or request payments."
+def chatbot_cache_key(prompt):
+    return ":".join(('chatbot', preprocess_text(prompt)))
+
+def get_chatbot_response(prompt, cancelled=None):
+    """Get response from trained GPT chatbot
+
+    Raises ChatbotBusy when the worker queue is full and CHATBOT_OVERLOAD is
+    'reject'; otherwise overload, timeouts and errors give the canned reply.
+    Setting the ``cancelled`` Event stops generation early.
+    """
+    chatbot = get_chatbot()
+    if not chatbot:
+        return CHATBOT_FALLBACK_REPLY
+    
+    cache_key = chatbot_cache_key(prompt)
+    if chatbot_cache:
+        cached = chatbot_cache.get(cache_key)
+        if cached is not None:
+            return cached
     
     try:
-        full_prompt = f"User: {prompt.strip()}\nAssistant:"
-        response = chatbot_generator(full_prompt, num_return_sequences=1)[0]["generated_text"]
-        
-        # Extract only the assistant's response
-        response_lines = response.split('\n')
-        assistant_response = ""
-        found_assistant = False
-        
-        for line in response_lines:
-            if found_assistant:
-                if line.strip() == "" or line.strip().startswith("User:"):
-                    break
-                assistant_response += " " + line.strip()
-            elif line.strip().startswith("Assistant:"):
-                assistant_response = line.replace("Assistant:", "", 1).strip()
-                found_assistant = True
-        
-        return assistant_response if assistant_response else "I'm here to help you with your UPI transactions!"
-        
+        response = chatbot.reply(prompt, cancelled)
+    except ChatbotBusy:
+        if CHATBOT_OVERLOAD == 'reject':
+            raise
+        return CHATBOT_FALLBACK_REPLY
     except Exception as e:
         print(f"Error in chatbot response: {e}")
-        return "I'm here to help you with UPI transactions! You can send money, check balance, or request payments."
+        return CHATBOT_FALLBACK_REPLY
+    
+    if not response:
+        return CHATBOT_EMPTY_REPLY
+    # A cancelled generation may have stopped part way through
+    if chatbot_cache and not (cancelled and cancelled.is_set()):
+        chatbot_cache.set(cache_key, response)
+    return response
 
-def call_django_api(endpoint, method='GET', data=None, params=None):
-    """Make API calls to Django backend"""
+rasa_client = RasaClient(
+    RASA_BASE_URL,
+    pool_size=RASA_POOL_SIZE,
+    timeout=RASA_TIMEOUT_SECONDS,
+    connect_timeout=RASA_CONNECT_TIMEOUT,
+) if RASA_ROUTING == 'server' else None
+
+speculator = Speculator(
+    SPECULATIVE_ROUTING,
+    workers=SPECULATIVE_WORKERS,
+) if rasa_client and SPECULATIVE_ROUTING != 'off' else None
+
+def chatbot_reply(text, cancelled=None):
+    """The chatbot's reply, with the canned reply when the pool is full"""
     try:
-        url = f"{DJANGO_BASE_URL}/{endpoint}/"
-        
-        if method == 'GET':
-            response = requests.get(url, params=params, timeout=10)
-        elif method == 'POST':
-            response = requests.post(url, json=data, timeout=10)
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {"error": f"API call failed: {response.status_code}", "status": "error"}
-            
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Connection error: {str(e)}", "status": "error"}
-    except Exception as e:
-        return {"error": f"Unexpected error: {str(e)}", "status": "error"}
+        return get_chatbot_response(text, cancelled)
+    except ChatbotBusy:
+        return CHATBOT_FALLBACK_REPLY
+
+def conversational_reply(text, sender, speculation=None):
+    """Rasa's reply, or the chatbot's when Rasa is late or down, as response fields
+
+    ``speculation`` is a chatbot reply started before classification; it is
+    used when Rasa does not answer.
+    """
+    messages = rasa_client.reply(text, sender)
+    if messages is not None:
+        if speculation:
+            speculation.unused()
+        texts = [message["text"] for message in messages if message.get("text")]
+        return {
+            "assistant_message": " ".join(texts) if texts else CHATBOT_EMPTY_REPLY,
+            "source": "rasa",
+            "rasa_messages": messages
+        }
+    fields = {"source": "chatbot", "rasa_fallback": True}
+    if speculation:
+        fields.update(assistant_message=speculation.result(time.perf_counter()), speculative=True)
+    else:
+        fields["assistant_message"] = chatbot_reply(text)
+    return fields
+
+def route_to_rasa(response, text, sender, reason=None, speculation=None):
+    """Hand a casual or unclear utterance to Rasa
+
+    In client mode the app is told to call Rasa. In server mode Rasa's
+    reply (or the chatbot's, when Rasa is late or down) comes back inline;
+    the chatbot's is taken from ``speculation`` when it was already started.
+    """
+    if reason:
+        response["reason"] = reason
+    if not rasa_client:
+        response.update({
+            "assistant_message": "Let me help you with that.",
+            "source": "intent_classifier",
+            "action": "route_to_rasa",
+            "route_to_rasa": True
+        })
+        return response
+    
+    response.update(conversational_reply(text, sender, speculation))
+    response.update({"action": "chatbot", "route_to_rasa": False})
+    return response
+
+def sse_event(data, event=None):
+    """One Server-Sent Events message carrying ``data`` as JSON"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def chatbot_busy_response():
+    return jsonify({
+        "error": "Chatbot is busy, try again shortly",
+        "status": "error"
+    }), 503, {"Retry-After": "1"}
+
+django_client = DjangoClient(
+    DJANGO_BASE_URL,
+    pool_size=DJANGO_POOL_SIZE,
+    connect_timeout=DJANGO_CONNECT_TIMEOUT,
+    default_timeout=DJANGO_TIMEOUT,
+    timeouts=DJANGO_TIMEOUTS,
+    get_retries=DJANGO_GET_RETRIES,
+    failure_threshold=DJANGO_BREAKER_THRESHOLD,
+    reset_timeout=DJANGO_BREAKER_RESET_SECONDS,
+)
+
+def call_django_api(endpoint, method='GET', data=None, params=None):
+    """Make API calls to Django backend over pooled keep-alive connections"""
+    return django_client.call(endpoint, method=method, data=data, params=params)
+
+def call_django_api_async(endpoint, method='GET', data=None, params=None):
+    """Start a Django API call in the background; returns a Future"""
+    return django_client.call_async(endpoint, method=method, data=data, params=params)
 
 def process_transfer_money(entities, user_phone):
     """Process money transfer request"""
@@ -291,59 +523,366 @@ def process_request_money(entities, user_phone):
             "suggestion": f"Try saying: 'Request ₹{amount} from [phone number/UPI ID]'"
         }
 
+def resolve_recipient(entities, user_phone):
+    """Look up a name-only recipient among the caller's contacts in Django
+
+    A confident, unambiguous match adds its phone_number and resolved_name to
+    entities and returns None. Otherwise returns the candidate list (possibly
+    empty) so the user can be asked which one they meant.
+    """
+    if 'recipient_name' not in entities or 'phone_number' in entities or 'upi_id' in entities:
+        return None
+    result = call_django_api('resolveRecipient', params={'phoneNumber': user_phone, 'name': entities['recipient_name']})
+    if result.get('status') != 'success':
+        print(f"Recipient resolution failed: {result.get('error')}")
+        return []
+    resolved = result.get('resolved')
+    if resolved:
+        entities['phone_number'] = resolved['phoneNumber']
+        entities['resolved_name'] = resolved['upiName']
+        return None
+    return [
+        {key: candidate[key] for key in ('upiName', 'phoneNumber', 'upiId')}
+        for candidate in result.get('candidates', [])
+    ]
+
+def clarification_message(name, candidates):
+    if not candidates:
+        return f"I couldn't find {name} in your contacts. Please say their phone number or UPI ID."
+    options = ', '.join(f"{candidate['upiName']} ({candidate['upiId']})" for candidate in candidates[:3])
+    return f"Which {name} did you mean: {options}?"
+
 def process_check_balance(user_phone):
     """Process balance check request"""
     params = {'phoneNumber': user_phone}
     return call_django_api('getBalance', params=params)
+
+# Replies to a pending confirmation; anything else is treated as a new command
+CONFIRM_RE = re.compile(r"^\s*(?:yes|yeah|yep|confirm(?:ed)?|ok(?:ay)?|sure|proceed|go ahead|send it|do it)\b", re.IGNORECASE)
+CANCEL_RE = re.compile(r"^\s*(?:no|nope|cancel|stop|abort|don'?t|do not)\b", re.IGNORECASE)
+
+def execute_action(intent, entities, user_phone):
+    """Run the Django action for a money intent"""
+    if intent == 'transfer_money':
+        return process_transfer_money(entities, user_phone)
+    if intent == 'request_money':
+        return process_request_money(entities, user_phone)
+    if intent == 'check_balance':
+        return process_check_balance(user_phone)
+    return {"error": f"Cannot execute intent: {intent}", "status": "error"}
+
+def is_executable(entities):
+    """True when a money intent has an amount and a recipient Django can resolve"""
+    return 'amount' in entities and ('upi_id' in entities or 'phone_number' in entities)
+
+def prepare_action(intent, entities, user_phone):
+    """Store a money action for a later confirmation turn and return its one-time token"""
+    token = secrets.token_urlsafe(16)
+    pending_actions.set(token, {"intent": intent, "entities": entities, "user_phone": user_phone})
+    return token
+
+def execution_message(intent, result):
+    """Spoken summary of a Django action result"""
+    if result.get('status') != 'success':
+        return result.get('error', 'Something went wrong. Please try again.')
+    if intent == 'check_balance':
+        return f"Your balance is ₹{result.get('balance')}"
+    return result.get('message', 'Done')
+
+def confirm_pending_action(text, token, user_phone):
+    """Handle a reply to a prepared action; None when the text is not a confirm/cancel reply"""
+    cancel = CANCEL_RE.match(text)
+    if not cancel and not CONFIRM_RE.match(text):
+        return None
+
+    # Only the user who prepared the action may use its token, so check the
+    # owner before the token is consumed
+    pending = pending_actions.get(token)
+    if pending is not None and pending['user_phone'] != user_phone:
+        return {"error": "Confirmation token belongs to another user", "status": "error"}, 403
+
+    if cancel:
+        pending_actions.pop(token)
+        return {
+            "input_text": text,
+            "assistant_message": "Okay, cancelled.",
+            "action": "cancelled",
+            "executed": False,
+            "status": "success"
+        }, 200
+
+    # pop is atomic, so a repeated "confirm" can never execute the action twice
+    pending = pending_actions.pop(token)
+    if pending is None:
+        return {
+            "input_text": text,
+            "error": "Confirmation expired or already used",
+            "assistant_message": "That request has expired. Please say the command again.",
+            "status": "error"
+        }, 410
+
+    result = execute_action(pending['intent'], pending['entities'], user_phone)
+    return {
+        "input_text": text,
+        "predicted_intent": pending['intent'],
+        "entities": pending['entities'],
+        "assistant_message": execution_message(pending['intent'], result),
+        "action": pending['intent'],
+        "executed": result.get('status') == 'success',
+        "result": result,
+        "status": "success"
+    }, 200
+
+
+def predict_clean_batch(clean_texts, intent_runtime=None):
+    """Predict intents for already preprocessed texts with a single forward pass"""
+    intent_runtime = intent_runtime or current_models()[0]
+    padded_sequences = intent_runtime.encode(clean_texts)
+    
+    prediction_probs = intent_runtime.predict_proba(padded_sequences)
+    predicted_class_indices = np.argmax(prediction_probs, axis=1)
+    predicted_intents = intent_runtime.classes[predicted_class_indices]
+    confidences = prediction_probs[np.arange(len(clean_texts)), predicted_class_indices]
     
+    return [(str(intent), float(confidence)) for intent, confidence in zip(predicted_intents, confidences)]
+
+def predict_pinned_batch(items):
+    """Batch function for (intent runtime, clean text) items
+
+    Each caller passes the runtime its request pinned, so a batch that spans
+    a model swap runs one forward pass per version.
+    """
+    groups = {}
+    for index, (intent_runtime, _) in enumerate(items):
+        groups.setdefault(id(intent_runtime), (intent_runtime, []))[1].append(index)
+    results = [None] * len(items)
+    for intent_runtime, indices in groups.values():
+        predictions = predict_clean_batch([items[index][1] for index in indices], intent_runtime)
+        for index, prediction in zip(indices, predictions):
+            results[index] = prediction
+    return results
 
-def predict_intent(text):
-    """Predict intent from text input"""
+# Concurrent callers are coalesced into one padded batch per flush
+intent_batcher = MicroBatcher(
+    predict_pinned_batch,
+    max_batch_size=INTENT_BATCH_MAX_SIZE,
+    max_wait_ms=INTENT_BATCH_MAX_WAIT_MS,
+    name="intent-batcher",
+) if INTENT_BATCHING_ENABLED else None
+
+def predict_intent(text, intent_runtime=None):
+    """Predict intent from text input, with the request's primary model unless another runtime is given"""
     try:
         # Preprocess text
         clean_text = preprocess_text(text)
         
-        # Convert to sequence and pad
-        sequence = tokenizer.texts_to_sequences([clean_text])
-        padded_sequence = pad_sequences(sequence, maxlen=max_len, padding='post')
+        if intent_cache:
+            cache_key = versioned_cache_key('intent', clean_text, intent_runtime=intent_runtime)
+            cached = intent_cache.get(cache_key)
+            if cached is not None:
+                return tuple(cached)
         
-        # Get prediction
-        prediction_probs = model.predict(padded_sequence, verbose=0)
-        predicted_class_index = np.argmax(prediction_probs, axis=1)[0]
-        predicted_intent = label_encoder.inverse_transform([predicted_class_index])[0]
-        confidence = float(prediction_probs[0][predicted_class_index])
+        intent_runtime = intent_runtime or current_models()[0]
+        if intent_batcher:
+            prediction = intent_batcher.submit((intent_runtime, clean_text))
+        else:
+            prediction = predict_clean_batch([clean_text], intent_runtime)[0]
         
-        return predicted_intent, confidence
+        if intent_cache:
+            intent_cache.set(cache_key, prediction)
+        return prediction
         
     except Exception as e:
         print(f"Error in prediction: {e}")
         return "error", 0.0
 
+shadow_scorer = ShadowScorer(
+    lambda intent_runtime, clean_text: predict_clean_batch([clean_text], intent_runtime)[0],
+    ShadowLog(SHADOW_LOG_PATH),
+    sample_rate=SHADOW_SAMPLE_RATE,
+    queue_size=SHADOW_QUEUE_SIZE,
+    log_text=SHADOW_LOG_TEXT,
+    thresholds={name: threshold / 100 for name, threshold in CONFIDENCE_THRESHOLDS.items()},
+) if CANDIDATE_ENABLED else None
+
+def classify_for_user(text, user_key):
+    """(intent, confidence, cohort) for a voice command
+
+    Users in the candidate cohort are served by the candidate model once it
+    has loaded; sampled requests are compared against the other model in the
+    background.
+    """
+    if shadow_scorer is None:
+        return predict_intent(text) + (shadow.PRIMARY,)
+    candidate = components.peek('candidate_intent')
+    served_by = shadow.cohort(user_key, AB_CANDIDATE_PERCENT, AB_SALT) if candidate is not None else shadow.PRIMARY
+    served_runtime = candidate if served_by == shadow.CANDIDATE else None
+    if served_runtime is not None:
+        g.served_runtime = served_runtime
+    started = time.perf_counter()
+    predicted_intent, confidence = predict_intent(text, served_runtime)
+    shadow_scorer.record_served(served_by, (time.perf_counter() - started) * 1000)
+    if predicted_intent != "error":
+        shadow_scorer.maybe_score(preprocess_text(text), served_by, predicted_intent, current_models()[0], candidate)
+    return predicted_intent, confidence, served_by
+
+def iter_batch_predictions(texts, include_entities=False, chunk_size=PREDICT_BATCH_CHUNK_SIZE):
+    """Yield one result per text, running a single forward pass per chunk"""
+    for start in range(0, len(texts), chunk_size):
+        chunk = texts[start:start + chunk_size]
+        clean_texts = [preprocess_text(text) if isinstance(text, str) else None for text in chunk]
+        valid_texts = [clean_text for clean_text in clean_texts if clean_text is not None]
+        predictions = iter(predict_clean_batch(valid_texts, current_models()[0]) if valid_texts else [])
+        
+        chunk_predictions = [next(predictions) if clean_text is not None else ("error", 0.0) for clean_text in clean_texts]
+        
+        if include_entities:
+            chunk_entities = entity_extractor.extract_entities_batch(
+                [text if isinstance(text, str) else "" for text in chunk],
+                [predicted_intent for predicted_intent, _ in chunk_predictions],
+                nlp=current_models()[1],
+                always_ner=True,
+            )
+        
+        for index, (text, (predicted_intent, confidence)) in enumerate(zip(chunk, chunk_predictions)):
+            result = {
+                "input_text": text,
+                "predicted_intent": predicted_intent,
+                "confidence": round(confidence, 4),
+                "confidence_percentage": round(confidence * 100, 2)
+            }
+            if include_entities:
+                result["entities"] = chunk_entities[index]
+            yield result
+
 @app.route('/')
 def home():
     return jsonify({
         "message": "Enhanced Voice Assistant with Intent Classification and GPT Chatbot is running!",
         "endpoints": {
-            "/voice_command": "POST - Complete voice command processing (recommended)",
+            "/voice_command": "POST - Complete voice command processing (recommended); \"execute\": true runs the action server-side",
             "/predict": "POST - Legacy intent prediction",
-            "/health": "GET - Check server health"
+            "/chatbot/stream": "GET/POST - Chatbot reply streamed as Server-Sent Events",
+            "/health": "GET - Check server health",
+            "/health/live": "GET - Liveness probe",
+            "/health/ready": "GET - Readiness probe with per-component load state",
+            "/metrics": "GET - Inference batching, result cache and backend client statistics",
+            "/admin/models": "GET - Model registry status; POST /admin/models/activate switches versions"
         }
     })
 
+@app.after_request
+def add_model_version(response):
+    """Tag every response with the intent model version that served it
+
+    Only a header, so bodies are never decoded and encoded again; the
+    classification endpoints also put model_version in the body themselves.
+    """
+    version = model_version()
+    if version is not None:
+        response.headers['X-Model-Version'] = version
+    return response
+
+def model_info():
+    if model_registry:
+        return dict(model_registry.status(), version=model_version())
+    return {"version": model_version(), "registry": None}
+
+def requires_admin_token(view):
+    """Admin endpoints are off unless MODEL_ADMIN_TOKEN is set and sent as X-Admin-Token"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not MODEL_ADMIN_TOKEN or not secrets.compare_digest(token, MODEL_ADMIN_TOKEN):
+            return jsonify({"error": "Forbidden", "status": "error"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/models')
+@requires_admin_token
+def admin_models():
+    return jsonify(model_info())
+
+@app.route('/admin/models/activate', methods=['POST'])
+@requires_admin_token
+def admin_activate_model():
+    """Make a registry version active: this worker loads it now, the others on their next manifest poll
+
+    The current version keeps serving until the new one has loaded and
+    passed warm-up; poll GET /admin/models to see when it is active.
+    """
+    if not model_registry:
+        return jsonify({"error": "MODEL_REGISTRY_DIR is not configured", "status": "error"}), 404
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not version:
+        return jsonify({"error": "No version provided", "status": "error"}), 400
+    try:
+        model_registry.promote(version)
+    except UnknownVersion as e:
+        return jsonify({"error": str(e), "status": "error"}), 404
+    except RegistryError as e:
+        return jsonify({"error": str(e), "status": "error"}), 409
+    return jsonify(dict(model_info(), status="loading" if model_registry.loading else "success")), 202
+
+def component_label(name):
+    state = components.components[name].state
+    if state == 'ready':
+        return "loaded"
+    if state in ('failed', 'unavailable'):
+        return "not available"
+    return state
+
 @app.route('/health')
 def health():
     return jsonify({
-        "status": "healthy", 
+        "status": "healthy" if components.ready() else "starting",
         "message": "Enhanced Voice Assistant Server is running",
         "components": {
-            "intent_classifier": "loaded",
-            "chatbot": "loaded" if chatbot_generator else "not available",
-            "ner_model": "loaded" if nlp else "not available",
+            "intent_classifier": component_label('intent_classifier'),
+            "chatbot": component_label('chatbot'),
+            "ner_model": component_label('ner_model'),
             "django_backend": DJANGO_BASE_URL
-        }
+        },
+        "model_version": model_version()
+    })
+
+@app.route('/health/live')
+def health_live():
+    """Liveness: the process is up and no required component has failed"""
+    failed = components.failed()
+    return jsonify({
+        "status": "failed" if failed else "alive",
+        "failed_components": failed,
+        "components": components.status()
+    }), 503 if failed else 200
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness: every required component has loaded"""
+    ready = components.ready()
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "load_mode": MODEL_LOAD_MODE,
+        "components": components.status()
+    }), 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    return jsonify({
+        "model": model_info(),
+        "intent_batcher": intent_batcher.stats() if intent_batcher else {"enabled": False},
+        "intent_cache": dict(intent_cache.stats(), enabled=True) if intent_cache else {"enabled": False},
+        "chatbot_pool": chatbot_pool.stats(),
+        "chatbot_cache": dict(chatbot_cache.stats(), enabled=True) if chatbot_cache else {"enabled": False},
+        "rasa_client": rasa_client.stats() if rasa_client else {"enabled": False},
+        "speculation": speculator.stats() if speculator else {"enabled": False},
+        "shadow": shadow_scorer.stats() if shadow_scorer else {"enabled": False},
+        "django_client": django_client.stats()
     })
 
 @app.route('/voice_command', methods=['POST'])
+@requires_intent_classifier
 def process_voice_command():
     """
     Main endpoint for processing complete voice commands
@@ -352,6 +891,14 @@ def process_voice_command():
     - request_money: intent classifier -> entity -> Django backend -> frontend  
     - check_balance: intent classifier -> Django backend -> frontend
     - general questions: directly to chatbot
+    - low confidence / casual: route_to_rasa for the app, or with
+      RASA_ROUTING=server Rasa's reply inline (chatbot when Rasa is late)
+
+    With "execute": true the Django action runs here and its result is returned
+    in the same response. Intents in VOICE_CONFIRM_INTENTS return a
+    confirmation_token instead; sending it back with "confirmationToken" and a
+    "yes"/"confirm" (or "cancel") text executes (or drops) the prepared action
+    without classifying again.
     """
     try:
         data = request.json
@@ -364,51 +911,83 @@ def process_voice_command():
         
         text = data['text']
         user_phone = data.get('userPhone', '+919999999999')  # Default for testing
+        # Rasa keeps one conversation tracker per sender
+        rasa_sender = data.get('userPhone') or 'user'
         
         if not text or text.strip() == "":
             return jsonify({
                 "error": "Empty text",
                 "message": "Text cannot be empty"
             }), 400
-        
+
+        execute = bool(data.get('execute', False))
+        confirmation_token = data.get('confirmationToken')
+        if (execute or confirmation_token) and not data.get('userPhone'):
+            return jsonify({
+                "error": "No userPhone provided",
+                "message": "Execute mode needs the caller's 'userPhone'"
+            }), 400
+
+        # A reply to a prepared action skips classification entirely
+        if confirmation_token:
+            confirmation = confirm_pending_action(text, confirmation_token, user_phone)
+            if confirmation is not None:
+                body, status_code = confirmation
+                print(f"Response: {body}")
+                return jsonify(body), status_code
+
         print(f"Processing voice command: {text}")
         
+        # While Rasa is down, casual-looking utterances start their chatbot reply before classification
+        speculating = speculator is not None and rasa_client.breaker.is_open()
+        speculation_key = preprocess_text(text) if speculating else None
+        speculation = speculator.start(speculation_key, chatbot_reply, text) if speculating else None
+        
         # Step 1: Intent Classification
-        predicted_intent, confidence = predict_intent(text)
+        predicted_intent, confidence, model_cohort = classify_for_user(text, data.get('userPhone'))
         
         confidence_percentage = round(confidence * 100, 2)
+        confidence_threshold = CONFIDENCE_THRESHOLDS[model_cohort]
+        
+        if speculating:
+            casual = confidence_percentage < confidence_threshold or predicted_intent not in ('transfer_money', 'request_money', 'check_balance')
+            if speculation is None:
+                speculator.observe(speculation_key, casual)
+            elif not casual:
+                speculation.cancel()
+                speculation = None
         
         response = {
             "input_text": text,
             "predicted_intent": predicted_intent,
             "confidence": round(confidence, 4),
             "confidence_percentage": confidence_percentage,
+            "model_version": model_version(),
             "status": "success"
         }
+        if shadow_scorer:
+            response["model_cohort"] = model_cohort
+            response["confidence_threshold"] = confidence_threshold
         
-        # CONFIDENCE THRESHOLD CHECK: If confidence < 70%, route to Rasa for casual conversation
-        if confidence_percentage < 70.0:
+        # CONFIDENCE THRESHOLD CHECK: below the serving model's threshold (70% for the
+        # primary by default), route to Rasa for casual conversation
+        if confidence_percentage < confidence_threshold:
             print(f"Low confidence ({confidence_percentage}%), routing to Rasa...")
-            response.update({
-                "assistant_message": "Let me help you with that.",
-                "source": "intent_classifier",
-                "action": "route_to_rasa",
-                "route_to_rasa": True,
-                "reason": "low_confidence"
-            })
+            route_to_rasa(response, text, rasa_sender, reason="low_confidence", speculation=speculation)
             print(f"Response: {response}")
             return jsonify(response)
         
-        # Step 2: Process based on intent (only if confidence >= 70%)
+        # Step 2: Process based on intent (only if confidence >= threshold)
         print(f"High confidence ({confidence_percentage}%), processing intent: {predicted_intent}")
         if predicted_intent == 'transfer_money':
             print("Processing transfer money request - extracting entities...")
             entities = extract_entities(text, predicted_intent)
+            candidates = resolve_recipient(entities, user_phone) if data.get('userPhone') else None
             
             if 'amount' in entities:
                 assistant_message = f'Ready to send ₹{entities["amount"]}'
                 if 'recipient_name' in entities:
-                    assistant_message += f' to {entities["recipient_name"]}'
+                    assistant_message += f' to {entities.get("resolved_name", entities["recipient_name"])}'
                 elif 'phone_number' in entities:
                     assistant_message += f' to {entities["phone_number"]}'
                 elif 'upi_id' in entities:
@@ -421,15 +1000,19 @@ def process_voice_command():
                 "assistant_message": assistant_message,
                 "action": "transfer_money"
             })
+            if candidates is not None:
+                response["candidates"] = candidates
+                response["assistant_message"] = clarification_message(entities['recipient_name'], candidates)
             
         elif predicted_intent == 'request_money':
             print("Processing request money - extracting entities...")
             entities = extract_entities(text, predicted_intent)
+            candidates = resolve_recipient(entities, user_phone) if data.get('userPhone') else None
             
             if 'amount' in entities:
                 assistant_message = f'Request for ₹{entities["amount"]}'
                 if 'recipient_name' in entities:
-                    assistant_message += f' from {entities["recipient_name"]}'
+                    assistant_message += f' from {entities.get("resolved_name", entities["recipient_name"])}'
                 elif 'phone_number' in entities:
                     assistant_message += f' from {entities["phone_number"]}'
                 elif 'upi_id' in entities:
@@ -442,6 +1025,9 @@ def process_voice_command():
                 "assistant_message": assistant_message,
                 "action": "request_money"
             })
+            if candidates is not None:
+                response["candidates"] = candidates
+                response["assistant_message"] = clarification_message(entities['recipient_name'], candidates)
             
         elif predicted_intent == 'check_balance':
             print("Processing balance check - returning to frontend...")
@@ -454,14 +1040,39 @@ def process_voice_command():
             
         else:
             print(f"General/casual question detected or unknown intent")
-            # For normal/casual/generic questions, return response with flag to route to Rasa
-            response.update({
-                "assistant_message": "Let me help you with that.",
-                "source": "intent_classifier",
-                "action": "route_to_rasa",
-                "route_to_rasa": True
-            })
-        
+            # For normal/casual/generic questions, route to Rasa
+            route_to_rasa(response, text, rasa_sender, speculation=speculation)
+
+        # Step 3 (execute mode): run the Django action here instead of in the app
+        if execute and response["action"] in ('transfer_money', 'request_money', 'check_balance'):
+            entities = response.get("entities", {})
+            if "candidates" in response:
+                # The name matched nobody or several people; ask before touching money
+                response["executed"] = False
+            elif predicted_intent != 'check_balance' and not is_executable(entities):
+                # process_* answer missing slots with an error and a suggestion, without calling Django
+                result = execute_action(predicted_intent, entities, user_phone)
+                response.update({
+                    "executed": False,
+                    "result": result,
+                    "assistant_message": execution_message(predicted_intent, result)
+                })
+            elif predicted_intent in VOICE_CONFIRM_INTENTS:
+                response.update({
+                    "executed": False,
+                    "confirmation_required": True,
+                    "confirmation_token": prepare_action(predicted_intent, entities, user_phone),
+                    "confirmation_expires_in": CONFIRMATION_TTL_SECONDS,
+                    "assistant_message": f'{response["assistant_message"]}. Say "confirm" to proceed.'
+                })
+            else:
+                result = execute_action(predicted_intent, entities, user_phone)
+                response.update({
+                    "executed": result.get('status') == 'success',
+                    "result": result,
+                    "assistant_message": execution_message(predicted_intent, result)
+                })
+
         print(f"Response: {response}")
         return jsonify(response)
         
@@ -473,6 +1084,7 @@ def process_voice_command():
         }), 500
 
 @app.route('/predict', methods=['POST'])
+@requires_intent_classifier
 def predict():
     """Legacy endpoint for backward compatibility"""
     try:
@@ -497,7 +1109,7 @@ def predict():
         predicted_intent, confidence = predict_intent(text)
         
         # Extract entities and keywords
-        entities = extract_entities(text, predicted_intent)
+        entities = extract_entities(text, predicted_intent, keywords=True)
         
         # Format response
         response = {
@@ -534,12 +1146,72 @@ def chatbot_endpoint():
             "status": "success"
         })
         
+    except ChatbotBusy:
+        return chatbot_busy_response()
     except Exception as e:
         return jsonify({"error": str(e), "status": "error"}), 500
 
+@app.route('/chatbot/stream', methods=['GET', 'POST'])
+def chatbot_stream():
+    """Stream the chatbot reply as Server-Sent Events
+
+    Takes 'text' as JSON (POST) or a query parameter (GET, for EventSource).
+    Sends a "token" event per decoded chunk and a final "done" event with the
+    whole reply; cached and canned replies arrive as a single chunk.
+    """
+    data = request.get_json(silent=True) or {}
+    text = data.get('text') or request.args.get('text')
+    if not text or not text.strip():
+        return jsonify({"error": "No text provided"}), 400
+    
+    cache_key = chatbot_cache_key(text)
+    cached = chatbot_cache.get(cache_key) if chatbot_cache else None
+    chatbot = get_chatbot() if cached is None else None
+    chunks = None
+    if chatbot:
+        try:
+            chunks = chatbot.stream(text)
+        except ChatbotBusy:
+            if CHATBOT_OVERLOAD == 'reject':
+                return chatbot_busy_response()
+    
+    def generate():
+        if chunks is None:
+            response = cached if cached is not None else CHATBOT_FALLBACK_REPLY
+            yield sse_event({"token": response}, "token")
+            yield sse_event({"response": response, "cached": cached is not None}, "done")
+            return
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event({"token": chunk}, "token")
+        except Exception as e:
+            print(f"Error in chatbot stream: {e}")
+            yield sse_event({"error": str(e), "status": "error"}, "error")
+            return
+        finally:
+            chunks.close()
+        response = "".join(parts).strip()
+        if response and chatbot_cache:
+            chatbot_cache.set(cache_key, response)
+        yield sse_event({"response": response or CHATBOT_EMPTY_REPLY, "cached": False}, "done")
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.route('/predict_batch', methods=['POST'])
+@requires_intent_classifier
 def predict_batch():
-    """Predict multiple texts at once"""
+    """Predict multiple texts at once
+    
+    Optional fields: 'include_entities' adds extract_entities output per text,
+    'stream' (or an 'Accept: application/x-ndjson' header) streams one JSON
+    object per line followed by a summary line instead of one JSON document.
+    """
     try:
         data = request.json
         
@@ -557,20 +1229,29 @@ def predict_batch():
                 "message": "texts should be an array"
             }), 400
         
-        results = []
-        for text in texts:
-            predicted_intent, confidence = predict_intent(text)
-            results.append({
-                "input_text": text,
-                "predicted_intent": predicted_intent,
-                "confidence": round(confidence, 4),
-                "confidence_percentage": round(confidence * 100, 2)
-            })
+        include_entities = bool(data.get('include_entities', False))
+        stream = bool(data.get('stream', False)) or 'application/x-ndjson' in request.headers.get('Accept', '')
+        
+        if stream:
+            def generate():
+                count = 0
+                try:
+                    for result in iter_batch_predictions(texts, include_entities):
+                        count += 1
+                        yield json.dumps(result, ensure_ascii=False) + "\n"
+                    yield json.dumps({"status": "success", "count": count, "done": True}) + "\n"
+                except Exception as e:
+                    yield json.dumps({"error": str(e), "status": "error", "count": count}) + "\n"
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        results = list(iter_batch_predictions(texts, include_entities))
         
         return jsonify({
             "results": results,
             "status": "success",
-            "count": len(results)
+            "count": len(results),
+            "model_version": model_version()
         })
         
     except Exception as e:
@@ -583,17 +1264,20 @@ if __name__ == '__main__':
     print("=" * 60)
     print("🚀 Enhanced Voice Assistant Server Starting...")
     print("=" * 60)
-    print("📊 Components Status:")
-    print(f"   ✅ Intent Classifier: Loaded")
-    print(f"   {'✅' if chatbot_generator else '❌'} GPT Chatbot: {'Loaded' if chatbot_generator else 'Not Available'}")
-    print(f"   {'✅' if nlp else '❌'} NER Model: {'Loaded' if nlp else 'Not Available'}")
-    print(f"   ⚠️  Django Backend: DISABLED (Mock mode)")
+    print(f"📊 Components Status ({MODEL_LOAD_MODE} loading):")
+    print(f"   Intent Classifier ({INTENT_RUNTIME} runtime): {component_label('intent_classifier')}")
+    print(f"   GPT Chatbot: {component_label('chatbot')}")
+    print(f"   NER Model: {component_label('ner_model')}")
+    print(f"   🔗 Django Backend: {DJANGO_BASE_URL}")
+    print(f"   🤖 Rasa routing: {RASA_ROUTING}" + (f" ({RASA_BASE_URL}, {RASA_TIMEOUT_SECONDS}s budget)" if rasa_client else ""))
     print("=" * 60)
     print("🌐 Server will be available at: http://localhost:5002")
     print("📡 API endpoints:")
     print("   - POST /voice_command: Complete voice assistant (RECOMMENDED)")
     print("   - POST /predict: Legacy intent prediction")
     print("   - POST /chatbot: Direct chatbot access")
+    print("   - GET/POST /chatbot/stream: Chatbot reply as Server-Sent Events")
+    print("   - POST /predict_batch: Batched prediction (NDJSON streaming supported)")
     print("   - GET  /health: Health check")
     print("=" * 60)
     print("🔄 Voice Assistant Workflow (MOCK MODE):")
@@ -0,0 +1,64 @@
+"""gunicorn settings for the intent server.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The master imports the app and loads the models once (``preload_app``),
+then forks the workers, which share the weights' pages copy-on-write. The
+lean intent bundle is memory-mapped, so its pages come from the page cache
+and are shared by every process. Components listed in WORKER_COMPONENTS
+are loaded by each worker after fork instead; by default that is the Keras
+runtime, because TensorFlow's thread pools do not survive fork().
+
+Each worker gets an equal share of the cores for intra-op parallelism
+(INFERENCE_THREADS overrides it), so N workers do not oversubscribe them.
+"""
+import gc
+import multiprocessing
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5002')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+inference_threads = int(os.getenv('INFERENCE_THREADS', '0')) or max(1, multiprocessing.cpu_count() // workers)
+
+# Read by OpenMP/BLAS, torch and TensorFlow when their thread pools start,
+# which happens after this file runs in the master
+for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+    os.environ.setdefault(name, str(inference_threads))
+os.environ.setdefault('TF_NUM_INTEROP_THREADS', '1')
+os.environ.setdefault('INTENT_LEAN_MMAP', '1')
+
+worker_components = [
+    name.strip()
+    for name in os.getenv(
+        'WORKER_COMPONENTS', 'intent_classifier' if os.getenv('INTENT_RUNTIME', 'keras') == 'keras' else ''
+    ).split(',')
+    if name.strip()
+]
+if preload_app and worker_components:
+    lazy = [name for name in os.getenv('LAZY_COMPONENTS', '').split(',') if name.strip()]
+    os.environ['LAZY_COMPONENTS'] = ','.join(lazy + worker_components)
+
+
+def when_ready(server):
+    # Objects created while preloading move to a generation the collector
+    # never scans, so collections in the workers do not write to (and
+    # un-share) the pages holding them
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(inference_threads)
+    if preload_app and worker_components:
+        flask_server = sys.modules['flask_server']
+        for name in worker_components:
+            # Starts loading a lazy component in the background
+            flask_server.components.peek(name)
+    server.log.info(f"Worker {worker.pid}: {inference_threads} inference threads")
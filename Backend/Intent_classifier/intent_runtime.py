@@ -0,0 +1,222 @@
+"""Intent classifier runtimes.
+
+``KerasIntentRuntime`` serves the trained ``intent_model.h5`` through TensorFlow.
+``LeanIntentRuntime`` serves the bundle written by ``export_model.py`` with a
+NumPy forward pass, so TensorFlow is never imported in that mode.
+``SklearnIntentRuntime`` serves a pickled scikit-learn text pipeline such as
+the TF-IDF model in ``voice_upi_intent_model.pkl``.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+LEAN_BUNDLE_FORMAT = 1
+
+
+def artifact_version(paths):
+    """Short content hash of model artifacts, identical across workers and hosts"""
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+class KerasIntentRuntime:
+    """Keras model plus the pickled tokenizer, label encoder and max_len"""
+
+    kind = "keras"
+
+    def __init__(self, model_dir='.'):
+        import pickle
+        from tensorflow.keras.models import load_model
+        from tensorflow.keras.preprocessing.sequence import pad_sequences
+
+        self._pad_sequences = pad_sequences
+        self.version = artifact_version(
+            os.path.join(model_dir, name) for name in ('intent_model.h5', 'tokenizer.pkl', 'label_encoder.pkl', 'max_len.pkl')
+        )
+        self.model = load_model(os.path.join(model_dir, 'intent_model.h5'))
+
+        with open(os.path.join(model_dir, 'tokenizer.pkl'), 'rb') as f:
+            self.tokenizer = pickle.load(f)
+
+        with open(os.path.join(model_dir, 'label_encoder.pkl'), 'rb') as f:
+            self.label_encoder = pickle.load(f)
+
+        with open(os.path.join(model_dir, 'max_len.pkl'), 'rb') as f:
+            self.max_len = pickle.load(f)
+
+        self.classes = np.asarray(self.label_encoder.classes_)
+
+    def encode(self, clean_texts):
+        sequences = self.tokenizer.texts_to_sequences(clean_texts)
+        return self._pad_sequences(sequences, maxlen=self.max_len, padding='post')
+
+    def predict_proba(self, padded_sequences):
+        return np.asarray(self.model.predict_on_batch(padded_sequences))
+
+
+class SequenceEncoder:
+    """NumPy re-implementation of Keras ``texts_to_sequences`` + ``pad_sequences``"""
+
+    def __init__(self, word_index, max_len, num_words=None, oov_token=None,
+                 filters='', lower=True, split=' ', padding='post', truncating='pre'):
+        self.word_index = word_index
+        self.max_len = int(max_len)
+        self.num_words = num_words
+        # Keras drops unknown words when the OOV token itself is not in word_index
+        self.oov_index = word_index.get(oov_token) if oov_token is not None else None
+        self.lower = lower
+        self.split = split
+        self.padding = padding
+        self.truncating = truncating
+        self._translate = str.maketrans({c: split for c in filters})
+
+    def text_to_sequence(self, text):
+        if self.lower:
+            text = text.lower()
+        sequence = []
+        for word in text.translate(self._translate).split(self.split):
+            if not word:
+                continue
+            index = self.word_index.get(word)
+            if index is not None:
+                if self.num_words and index >= self.num_words:
+                    if self.oov_index is not None:
+                        sequence.append(self.oov_index)
+                else:
+                    sequence.append(index)
+            elif self.oov_index is not None:
+                sequence.append(self.oov_index)
+        return sequence
+
+    def encode(self, clean_texts):
+        padded = np.zeros((len(clean_texts), self.max_len), dtype=np.int32)
+        for row, text in enumerate(clean_texts):
+            sequence = self.text_to_sequence(text)
+            if not sequence:
+                continue
+            if self.truncating == 'pre':
+                sequence = sequence[-self.max_len:]
+            else:
+                sequence = sequence[:self.max_len]
+            if self.padding == 'post':
+                padded[row, :len(sequence)] = sequence
+            else:
+                padded[row, -len(sequence):] = sequence
+        return padded
+
+
+def _activate(x, activation):
+    if activation in (None, 'linear'):
+        return x
+    if activation == 'relu':
+        return np.maximum(x, 0)
+    if activation == 'tanh':
+        return np.tanh(x)
+    if activation == 'sigmoid':
+        return 1.0 / (1.0 + np.exp(-x))
+    if activation == 'softmax':
+        shifted = np.exp(x - x.max(axis=-1, keepdims=True))
+        return shifted / shifted.sum(axis=-1, keepdims=True)
+    raise ValueError(f"Unsupported activation: {activation}")
+
+
+def _conv1d_valid(x, kernel, bias):
+    kernel_size = kernel.shape[0]
+    out_len = x.shape[1] - kernel_size + 1
+    out = np.zeros((x.shape[0], out_len, kernel.shape[2]), dtype=np.float32)
+    for k in range(kernel_size):
+        out += x[:, k:k + out_len, :] @ kernel[k]
+    return out + bias
+
+
+class LeanIntentRuntime:
+    """Exported intent model served with a hand-written NumPy forward pass"""
+
+    kind = "lean"
+
+    def __init__(self, bundle_dir, mmap=False):
+        with open(os.path.join(bundle_dir, 'spec.json'), encoding='utf-8') as f:
+            spec = json.load(f)
+        if spec.get('format') != LEAN_BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported lean bundle format: {spec.get('format')}")
+
+        with open(os.path.join(bundle_dir, 'vocab.json'), encoding='utf-8') as f:
+            word_index = json.load(f)
+
+        self.spec = spec
+        self.version = artifact_version(
+            [os.path.join(bundle_dir, 'spec.json'), os.path.join(bundle_dir, 'vocab.json')]
+            + [os.path.join(bundle_dir, name) for layer in spec['layers'] for name in layer.get('weights', [])]
+        )
+        self.max_len = spec['max_len']
+        self.classes = np.asarray(spec['classes'])
+        self.encoder = SequenceEncoder(word_index, spec['max_len'], **spec['tokenizer'])
+
+        mmap_mode = 'r' if mmap else None
+        self.layers = []
+        for layer in spec['layers']:
+            weights = [np.load(os.path.join(bundle_dir, name), mmap_mode=mmap_mode) for name in layer.get('weights', [])]
+            self.layers.append((layer, weights))
+
+    def encode(self, clean_texts):
+        return self.encoder.encode(clean_texts)
+
+    def predict_proba(self, padded_sequences):
+        x = np.asarray(padded_sequences)
+        for layer, weights in self.layers:
+            kind = layer['type']
+            if kind == 'Embedding':
+                x = weights[0][x]
+            elif kind == 'Conv1D':
+                x = _activate(_conv1d_valid(x, weights[0], weights[1]), layer.get('activation'))
+            elif kind == 'GlobalMaxPooling1D':
+                x = x.max(axis=1)
+            elif kind == 'GlobalAveragePooling1D':
+                x = x.mean(axis=1)
+            elif kind == 'Flatten':
+                x = x.reshape(x.shape[0], -1)
+            elif kind == 'Dense':
+                x = _activate(x @ weights[0] + weights[1], layer.get('activation'))
+            else:
+                raise ValueError(f"Unsupported layer type: {kind}")
+        return x
+
+
+class SklearnIntentRuntime:
+    """Pickled scikit-learn pipeline that takes raw text and has ``predict_proba``"""
+
+    kind = "sklearn"
+
+    def __init__(self, path):
+        import pickle
+
+        self.version = artifact_version([path])
+        with open(path, 'rb') as f:
+            self.pipeline = pickle.load(f)
+        self.classes = np.asarray(self.pipeline.classes_)
+
+    def encode(self, clean_texts):
+        # The pipeline vectorizes text itself
+        return list(clean_texts)
+
+    def predict_proba(self, texts):
+        return np.asarray(self.pipeline.predict_proba(texts))
+
+
+def load_intent_runtime(kind='keras', model_dir='.', lean_bundle='intent_model_lean', mmap=False,
+                        sklearn_model='voice_upi_intent_model.pkl'):
+    """Load the intent classifier for the configured runtime"""
+    if kind == 'keras':
+        return KerasIntentRuntime(model_dir)
+    if kind == 'lean':
+        return LeanIntentRuntime(os.path.join(model_dir, lean_bundle), mmap=mmap)
+    if kind == 'sklearn':
+        return SklearnIntentRuntime(os.path.join(model_dir, sklearn_model))
+    raise ValueError(f"Unknown intent runtime: {kind}")
@@ -0,0 +1,137 @@
+"""Measure startup time and per-worker memory of the intent server under gunicorn.
+
+Starts ``gunicorn -c gunicorn.conf.py wsgi:app`` once per worker count,
+times how long it takes until every worker answers /health/ready, sends a
+few predictions so inference pages are touched, then reads each process's
+PSS (proportional set size: shared pages split between the processes
+sharing them) from /proc/<pid>/smaps_rollup. Linux only.
+
+    python measure_workers.py --workers 1 4
+    python measure_workers.py --workers 1 4 --compare-preload
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+SAMPLE_TEXTS = [
+    "send 500 to mom",
+    "check my balance",
+    "request 200 from priya",
+    "how are you",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def memory(pid):
+    """Rss, Pss and shared kB of one process"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].endswith(':'):
+                fields[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+        'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+        'shared_mb': round((fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024, 1),
+    }
+
+
+def children(pid):
+    found = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            found.extend(int(child) for child in f.read().split())
+    return found
+
+
+def wait_ready(base_url, process, workers, timeout):
+    """Seconds until 2 x workers consecutive readiness checks succeed"""
+    started = time.perf_counter()
+    streak = 0
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with {process.returncode}")
+        try:
+            ok = requests.get(f'{base_url}/health/ready', timeout=2).status_code == 200
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        if streak >= 2 * workers:
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    raise RuntimeError(f"not ready after {timeout}s")
+
+
+def measure(workers, preload, args):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), PORT=str(port), GUNICORN_PRELOAD='1' if preload else '0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL if not args.verbose else None,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+        start_new_session=True,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        startup = wait_ready(base_url, process, workers, args.timeout)
+        for _ in range(args.requests):
+            for text in SAMPLE_TEXTS:
+                requests.post(f'{base_url}/predict', json={'text': text}, timeout=10)
+        time.sleep(0.5)
+        master = memory(process.pid)
+        worker_memory = [memory(pid) for pid in children(process.pid)]
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(30)
+    return {
+        'workers': workers,
+        'preload': preload,
+        'startup_seconds': round(startup, 2),
+        'master': master,
+        'per_worker': worker_memory,
+        'total_pss_mb': round(master['pss_mb'] + sum(m['pss_mb'] for m in worker_memory), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--compare-preload', action='store_true', help='also run each worker count without preload_app')
+    parser.add_argument('--requests', type=int, default=25, help='rounds of sample predictions before measuring')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--verbose', action='store_true', help="show gunicorn's output")
+    args = parser.parse_args()
+
+    results = []
+    for workers in args.workers:
+        for preload in ((True, False) if args.compare_preload else (True,)):
+            results.append(measure(workers, preload, args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'workers':>8}{'preload':>9}{'startup s':>11}{'master PSS':>12}{'worker PSS (each)':>28}{'total PSS':>11}")
+    for result in results:
+        each = ', '.join(f"{m['pss_mb']:g}" for m in result['per_worker'])
+        print(f"{result['workers']:>8}{'yes' if result['preload'] else 'no':>9}{result['startup_seconds']:>11}"
+              f"{result['master']['pss_mb']:>12}{each:>28}{result['total_pss_mb']:>11}")
+
+
+if __name__ == '__main__':
+    main()
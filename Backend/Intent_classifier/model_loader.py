@@ -0,0 +1,178 @@
+"""Background, parallel or lazy loading of the intent server's models."""
+import os
+import threading
+import time
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+FAILED = "failed"
+
+LOAD_MODES = ("eager", "background", "lazy")
+
+
+class ComponentNotReady(Exception):
+    """Raised when a component is requested before it has finished loading"""
+
+    def __init__(self, name, state):
+        super().__init__(f"{name} is not ready (state: {state})")
+        self.name = name
+        self.state = state
+
+
+class Component:
+    def __init__(self, name, loader, required=False, lazy=False):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.lazy = lazy
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.load_seconds = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_time_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+
+
+class ComponentLoader:
+    """Load named components eagerly, in parallel background threads, or on first use
+
+    A loader returns the loaded object, or None when the component is optional
+    and not installed. Exceptions mark the component as failed.
+    """
+
+    def __init__(self, mode="background", lazy_components=()):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Unknown load mode: {mode} (expected one of {', '.join(LOAD_MODES)})")
+        self.mode = mode
+        self.lazy_components = set(lazy_components)
+        self.components = {}
+        self._swap_lock = threading.Lock()
+        # Loader threads do not survive fork(); the child restarts interrupted loads
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_interrupted)
+
+    def register(self, name, loader, required=False):
+        lazy = self.mode == "lazy" or name in self.lazy_components
+        self.components[name] = Component(name, loader, required=required, lazy=lazy)
+
+    def start(self):
+        """Load every non-lazy component according to the configured mode"""
+        for component in self.components.values():
+            if component.lazy:
+                continue
+            if self.mode == "eager":
+                self._load(component)
+            else:
+                threading.Thread(
+                    target=self._load, args=(component,), name=f"load-{component.name}", daemon=True
+                ).start()
+
+    def _restart_interrupted(self):
+        self._swap_lock = threading.Lock()
+        for component in self.components.values():
+            if component.state == LOADING:
+                component.lock = threading.Lock()
+                component.state = PENDING
+                if not component.lazy:
+                    threading.Thread(
+                        target=self._load, args=(component,), name=f"load-{component.name}", daemon=True
+                    ).start()
+
+    def wait(self, timeout=None):
+        """Block until every non-lazy component has finished loading; False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for component in self.components.values():
+            if component.lazy:
+                continue
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            if not component.done.wait(remaining):
+                return False
+        return True
+
+    def _load(self, component):
+        with component.lock:
+            if component.state != PENDING:
+                return
+            component.state = LOADING
+
+        print(f"Loading {component.name}...")
+        started = time.perf_counter()
+        try:
+            value = component.loader()
+        except Exception as e:
+            component.error = str(e)
+            component.state = FAILED
+            print(f"Error loading {component.name}: {e}")
+        else:
+            component.value = value
+            component.state = READY if value is not None else UNAVAILABLE
+            print(f"{component.name} {'loaded' if value is not None else 'not available'}")
+        finally:
+            component.load_seconds = time.perf_counter() - started
+            component.done.set()
+
+    def get(self, name, timeout=None):
+        """Return a component, loading it now if lazy, or waiting up to timeout seconds
+
+        Returns None for components that failed or are not available and raises
+        ComponentNotReady if the component is still loading after the timeout.
+        """
+        component = self.components[name]
+        if component.state == PENDING and component.lazy:
+            self._load(component)
+        if not component.done.wait(timeout):
+            raise ComponentNotReady(name, component.state)
+        return component.value
+
+    def peek(self, name):
+        """Return a component if it is loaded without waiting; lazy components start loading"""
+        component = self.components[name]
+        if component.state == PENDING and component.lazy:
+            threading.Thread(target=self._load, args=(component,), name=f"load-{name}", daemon=True).start()
+        return component.value if component.state == READY else None
+
+    def set(self, name, value):
+        """Replace a loaded component"""
+        component = self.components[name]
+        component.value = value
+        component.state = READY if value is not None else UNAVAILABLE
+        component.error = None
+        component.done.set()
+
+    def swap(self, values):
+        """Replace several loaded components at once; ``current`` never sees half a swap"""
+        with self._swap_lock:
+            for name, value in values.items():
+                self.set(name, value)
+
+    def current(self, *names):
+        """Loaded values of ``names`` (None when not ready), read consistently with ``swap``"""
+        with self._swap_lock:
+            return tuple(
+                self.components[name].value if self.components[name].state == READY else None
+                for name in names
+            )
+
+    def is_ready(self, name):
+        return self.components[name].state == READY
+
+    def ready(self):
+        """True once every required component has loaded"""
+        return all(c.state == READY for c in self.components.values() if c.required)
+
+    def failed(self):
+        """Names of required components that failed to load"""
+        return [c.name for c in self.components.values() if c.required and c.state in (FAILED, UNAVAILABLE)]
+
+    def status(self):
+        return {name: component.status() for name, component in self.components.items()}
@@ -0,0 +1,352 @@
+"""Versioned model bundles with background loading, warm-up and atomic swap.
+
+MODEL_REGISTRY_DIR holds one directory per version and a manifest naming
+the active one::
+
+    manifest.json   {"active": "v2", "versions": {"v2": {"runtime": "lean", "path": "v2", ...}}}
+    v1/             intent_model.h5, tokenizer.pkl, label_encoder.pkl, max_len.pkl
+    v2/             intent_model_lean/, keyword_ner_model/
+
+A new version is loaded and warmed in a background thread while the old
+one keeps serving, then the intent classifier and NER model are swapped in
+one step. Every worker polls the manifest, so promoting a version (the
+admin endpoint or ``python model_registry.py activate``) reaches all of
+them. Publish a version with::
+
+    python model_registry.py publish v3 --model-dir . --activate
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from intent_runtime import artifact_version, load_intent_runtime
+from preprocessing import preprocess_text
+
+MANIFEST = 'manifest.json'
+KERAS_ARTIFACTS = ('intent_model.h5', 'tokenizer.pkl', 'label_encoder.pkl', 'max_len.pkl')
+NER_DIR = 'keyword_ner_model'
+LEAN_DIR = 'intent_model_lean'
+
+# Utterances run through a new version before it takes traffic
+WARMUP_TEXTS = [
+    "send 500 to mom",
+    "transfer 1000 rupees to 9876543210",
+    "request 250 from priya",
+    "ask rahul@okaxis for 2000",
+    "check my balance",
+    "how much money do i have",
+    "hello how are you",
+]
+
+
+class RegistryError(Exception):
+    """Raised for a missing manifest or version, or a version that fails to load or warm up"""
+
+
+class UnknownVersion(RegistryError):
+    """Raised for a version that is not in the manifest"""
+
+
+def read_manifest(registry_dir):
+    path = os.path.join(registry_dir, MANIFEST)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise RegistryError(f"No {MANIFEST} in {registry_dir}")
+    except ValueError as e:
+        raise RegistryError(f"Invalid {MANIFEST}: {e}")
+    manifest.setdefault('versions', {})
+    return manifest
+
+
+def write_manifest(registry_dir, manifest):
+    """Replace the manifest atomically, so pollers never read a partial file"""
+    path = os.path.join(registry_dir, MANIFEST)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _load_spacy(path):
+    import spacy
+
+    return spacy.load(path)
+
+
+class ModelRegistry:
+    """Loads registry versions into a ComponentLoader and swaps them in without downtime"""
+
+    def __init__(self, registry_dir, components, mmap=False, fallback_ner=None,
+                 warmup_texts=WARMUP_TEXTS, poll_seconds=5.0, history_size=10):
+        self.registry_dir = registry_dir
+        self.components = components
+        self.mmap = mmap
+        self.fallback_ner = fallback_ner
+        self.warmup_texts = list(warmup_texts)
+        self.poll_seconds = poll_seconds
+        self.active = None
+        self.ner_source = None
+        self.loading = None
+        self.last_error = None
+        self.history = []
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._activation_lock = threading.Lock()
+        self._watcher = None
+        self._failed = set()
+        self._manifest_mtime = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def manifest(self):
+        return read_manifest(self.registry_dir)
+
+    def _entry(self, name, manifest=None):
+        manifest = manifest or self.manifest()
+        entry = manifest['versions'].get(name)
+        if entry is None:
+            raise UnknownVersion(f"Unknown model version: {name}")
+        return entry
+
+    def _version_dir(self, name, entry):
+        return os.path.join(self.registry_dir, entry.get('path', name))
+
+    def load_intent(self, name=None):
+        """Intent runtime for ``name`` (default: the manifest's active version)"""
+        name = name or self.manifest()['active']
+        entry = self._entry(name)
+        runtime = load_intent_runtime(
+            entry.get('runtime', 'keras'),
+            self._version_dir(name, entry),
+            lean_bundle=entry.get('lean_bundle', LEAN_DIR),
+            mmap=self.mmap,
+        )
+        # Result caches are keyed on this, so each version gets its own entries
+        runtime.version = name
+        with self._lock:
+            if self.active is None:
+                self.active = name
+        return runtime
+
+    def _ner_path(self, name, entry):
+        path = os.path.join(self._version_dir(name, entry), entry.get('ner_model') or NER_DIR)
+        return path if os.path.exists(path) else None
+
+    def load_ner(self, name=None):
+        """spaCy model shipped with the version, else the fallback model, else None"""
+        name = name or self.manifest()['active']
+        path = self._ner_path(name, self._entry(name)) or self.fallback_ner
+        if not path or not os.path.exists(path):
+            print("NER model not found, using fallback entity extraction")
+            return None
+        nlp = _load_spacy(path)
+        with self._lock:
+            self.ner_source = path
+        return nlp
+
+    def warm(self, runtime, nlp=None):
+        """Run the warm-up utterances and check the outputs look like probabilities"""
+        texts = [preprocess_text(text) for text in self.warmup_texts]
+        probs = np.asarray(runtime.predict_proba(runtime.encode(texts)))
+        if probs.shape != (len(texts), len(runtime.classes)):
+            raise RegistryError(f"Warm-up produced shape {probs.shape}, expected {(len(texts), len(runtime.classes))}")
+        if not np.isfinite(probs).all() or not np.allclose(probs.sum(axis=1), 1.0, atol=1e-3):
+            raise RegistryError("Warm-up produced invalid probabilities")
+        if nlp is not None:
+            list(nlp.pipe(self.warmup_texts))
+
+    def activate(self, name, background=True):
+        """Load, warm and swap in ``name``; raises RegistryError if another load is running"""
+        if not self._activation_lock.acquire(blocking=False):
+            raise RegistryError(f"Version {self.loading} is still loading")
+        with self._lock:
+            self.loading = name
+        if not background:
+            self._activate(name)
+            return
+        threading.Thread(target=self._activate, args=(name,), name=f"model-activate-{name}", daemon=True).start()
+
+    def _activate(self, name):
+        started = time.perf_counter()
+        try:
+            entry = self._entry(name)
+            runtime = self.load_intent(name)
+            ner_path = self._ner_path(name, entry)
+            nlp = _load_spacy(ner_path) if ner_path else None
+            self.warm(runtime, nlp)
+
+            # Versions without their own NER model keep the current one
+            values = {'intent_classifier': runtime}
+            if nlp is not None:
+                values['ner_model'] = nlp
+            self.components.swap(values)
+            with self._lock:
+                previous, self.active = self.active, name
+                if ner_path:
+                    self.ner_source = ner_path
+                self.history.insert(0, {
+                    "version": name,
+                    "previous": previous,
+                    "load_seconds": round(time.perf_counter() - started, 3),
+                    "activated_at": time.time(),
+                })
+                del self.history[self.history_size:]
+            print(f"Model version {name} active (was {previous})")
+        except Exception as e:
+            with self._lock:
+                self.last_error = {"version": name, "error": f"{type(e).__name__}: {e}", "at": time.time()}
+                self._failed.add(name)
+            print(f"Model version {name} failed to load, keeping {self.active}: {e}")
+        finally:
+            with self._lock:
+                self.loading = None
+            self._activation_lock.release()
+
+    def promote(self, name):
+        """Make ``name`` the manifest's active version and start loading it here"""
+        manifest = self.manifest()
+        self._entry(name, manifest)
+        manifest['active'] = name
+        write_manifest(self.registry_dir, manifest)
+        with self._lock:
+            self._failed.discard(name)
+        if name != self.active:
+            self.activate(name)
+
+    def poll(self):
+        """Follow a changed manifest; failed versions are retried only after the next manifest change"""
+        try:
+            mtime = os.stat(os.path.join(self.registry_dir, MANIFEST)).st_mtime_ns
+            if mtime != self._manifest_mtime:
+                self._manifest_mtime = mtime
+                with self._lock:
+                    self._failed.clear()
+            name = self.manifest().get('active')
+        except (OSError, RegistryError) as e:
+            print(f"Model registry poll failed: {e}")
+            return
+        with self._lock:
+            wanted = name and name != self.active and name != self.loading and name not in self._failed
+        if wanted and self.components.is_ready('intent_classifier'):
+            try:
+                self.activate(name)
+            except RegistryError:
+                pass
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            self.poll()
+
+    def start_watcher(self):
+        if self.poll_seconds > 0 and (self._watcher is None or not self._watcher.is_alive()):
+            self._watcher = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+            self._watcher.start()
+        return self
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._activation_lock = threading.Lock()
+        self.loading = None
+        if self._watcher is not None:
+            self._watcher = None
+            self.start_watcher()
+
+    def status(self):
+        try:
+            manifest = self.manifest()
+        except RegistryError as e:
+            manifest = {"active": None, "versions": {}, "error": str(e)}
+        with self._lock:
+            return {
+                "registry": self.registry_dir,
+                "active": self.active,
+                "manifest_active": manifest.get('active'),
+                "loading": self.loading,
+                "ner_model": self.ner_source,
+                "versions": sorted(manifest['versions']),
+                "last_error": self.last_error,
+                "history": list(self.history),
+            }
+
+
+def publish(registry_dir, name, model_dir='.', runtime='keras', lean_bundle=LEAN_DIR, ner_model=None, activate=False):
+    """Copy artifacts into a new version directory and add it to the manifest"""
+    os.makedirs(registry_dir, exist_ok=True)
+    try:
+        manifest = read_manifest(registry_dir)
+    except RegistryError:
+        manifest = {"active": None, "versions": {}}
+    if name in manifest['versions']:
+        raise RegistryError(f"Version {name} already exists; versions are immutable")
+
+    version_dir = os.path.join(registry_dir, name)
+    os.makedirs(version_dir)
+    if runtime == 'keras':
+        sources = [os.path.join(model_dir, artifact) for artifact in KERAS_ARTIFACTS]
+        for source in sources:
+            shutil.copy2(source, version_dir)
+    else:
+        shutil.copytree(os.path.join(model_dir, lean_bundle), os.path.join(version_dir, LEAN_DIR))
+        sources = [os.path.join(version_dir, LEAN_DIR, file) for file in sorted(os.listdir(os.path.join(version_dir, LEAN_DIR)))]
+    if ner_model:
+        shutil.copytree(ner_model, os.path.join(version_dir, NER_DIR))
+
+    manifest['versions'][name] = {
+        "runtime": runtime,
+        "path": name,
+        "ner_model": NER_DIR if ner_model else None,
+        "artifacts": artifact_version(sources),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if activate or not manifest.get('active'):
+        manifest['active'] = name
+    write_manifest(registry_dir, manifest)
+    print(f"Published {name} to {registry_dir}" + (" (active)" if manifest['active'] == name else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registry', default=os.getenv('MODEL_REGISTRY_DIR', 'model_registry'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = commands.add_parser('publish', help='add a version from trained artifacts')
+    publish_parser.add_argument('name')
+    publish_parser.add_argument('--model-dir', default='.', help='directory holding the artifacts')
+    publish_parser.add_argument('--runtime', choices=('keras', 'lean'), default='keras')
+    publish_parser.add_argument('--lean-bundle', default=LEAN_DIR)
+    publish_parser.add_argument('--ner-model', help='spaCy model directory to ship with this version')
+    publish_parser.add_argument('--activate', action='store_true')
+
+    activate_parser = commands.add_parser('activate', help='make a version active; running servers follow')
+    activate_parser.add_argument('name')
+
+    commands.add_parser('list', help='show versions and the active one')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        publish(args.registry, args.name, args.model_dir, args.runtime, args.lean_bundle, args.ner_model, args.activate)
+    elif args.command == 'activate':
+        manifest = read_manifest(args.registry)
+        if args.name not in manifest['versions']:
+            raise SystemExit(f"Unknown model version: {args.name}")
+        manifest['active'] = args.name
+        write_manifest(args.registry, manifest)
+        print(f"{args.name} is now active")
+    else:
+        manifest = read_manifest(args.registry)
+        for name, entry in sorted(manifest['versions'].items()):
+            marker = '*' if name == manifest.get('active') else ' '
+            print(f"{marker} {name:<20} {entry.get('runtime', 'keras'):<6} {entry.get('artifacts', '')}  {entry.get('created_at', '')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+"""Text preprocessing shared by the intent server and offline tools."""
+import re
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def preprocess_text(text):
+    """Clean and preprocess text for prediction"""
+    text = text.lower()  # Convert to lowercase
+    text = _PUNCTUATION_RE.sub('', text)  # Remove punctuation
+    text = _WHITESPACE_RE.sub(' ', text).strip()  # Remove extra spaces
+    return text
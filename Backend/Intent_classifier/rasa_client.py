@@ -0,0 +1,100 @@
+"""Pooled client for the Rasa REST channel with a hard per-call deadline."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import requests
+
+from django_client import CircuitBreaker, build_session
+
+
+class RasaClient:
+    """Send utterances to Rasa's REST webhook over keep-alive connections
+
+    ``reply`` returns Rasa's messages, or None when Rasa errors, the circuit
+    is open, or no answer arrives within ``timeout`` seconds in total. The
+    deadline covers connecting, queueing and reading, so callers can fall
+    back to another responder and still answer on time.
+    """
+
+    def __init__(self, base_url, pool_size=10, timeout=1.5, connect_timeout=0.3,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.base_url = base_url.rstrip('/')
+        self.url = f"{self.base_url}/webhooks/rest/webhook"
+        self.timeout = timeout
+        self.connect_timeout = min(connect_timeout, timeout)
+        self.pool_size = pool_size
+        self.session = build_session(pool_size, retries=0)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _post(self, sender, message):
+        response = self.session.post(
+            self.url,
+            json={"sender": sender, "message": message},
+            timeout=(self.connect_timeout, self.timeout),
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='rasa-client')
+            return self._executor
+
+    def _record(self, started, error=None):
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.calls += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+            if error == 'timeout':
+                self.timeouts += 1
+            elif error:
+                self.errors += 1
+
+    def reply(self, message, sender='user'):
+        """Rasa's messages for ``message`` as a list of dicts, or None"""
+        if not self.breaker.allow():
+            return None
+        started = time.perf_counter()
+        future = self._get_executor().submit(self._post, sender, message)
+        try:
+            messages = future.result(self.timeout)
+        except TimeoutError:
+            # The worker finishes on its own; its socket timeout bounds it
+            self.breaker.record_failure()
+            self._record(started, 'timeout')
+            print(f"Rasa missed its {self.timeout}s deadline")
+            return None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            self.breaker.record_failure()
+            self._record(started, 'error')
+            print(f"Rasa error: {e}")
+            return None
+        self.breaker.record_success()
+        self._record(started)
+        return messages if isinstance(messages, list) else []
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "url": self.url,
+                "timeout_seconds": self.timeout,
+                "calls": self.calls,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "latency_ms": {
+                    "avg": round(self._latency_total / self.calls * 1000, 3) if self.calls else 0.0,
+                    "max": round(self._latency_max * 1000, 3),
+                },
+                "circuit_breaker": self.breaker.stats(),
+            }
@@ -0,0 +1,168 @@
+"""Bounded result caches for the intent server.
+
+``LRUCache`` is a per-process LRU with optional TTL. ``RedisCache`` stores the
+same entries in a Redis-compatible server so every gunicorn worker shares them.
+Both count hits, misses, evictions and expirations for the /metrics endpoint.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU cache holding at most ``maxsize`` entries, each for at most ``ttl`` seconds"""
+
+    backend = "memory"
+
+    def __init__(self, maxsize=10000, ttl=None, name="cache"):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl) if ttl else None
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove and return an entry in one step"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            return default
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisCache:
+    """Cache shared across workers through a Redis-compatible server
+
+    Values are stored as JSON under ``prefix``. Memory is bounded by the TTL
+    and by the server's maxmemory policy. Connection errors count as misses,
+    so the cache never fails a request.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url, ttl=None, prefix="voiceupi:", name="cache", default_ttl=86400):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.ttl = float(ttl) if ttl else None
+        self.default_ttl = default_ttl
+        self.prefix = f"{prefix}{name}:"
+        self.name = name
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def get(self, key, default=None):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            self._count('errors')
+            raw = None
+        if raw is None:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl or self.ttl or self.default_ttl
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+        except Exception:
+            self._count('errors')
+
+    def pop(self, key, default=None):
+        """Remove and return an entry atomically, so only one worker ever gets it"""
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(self.prefix + key)
+            pipe.delete(self.prefix + key)
+            raw, _ = pipe.execute()
+        except Exception:
+            self._count('errors')
+            return default
+        return json.loads(raw) if raw is not None else default
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(match=self.prefix + '*', count=500):
+                self.client.delete(key)
+        except Exception:
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "ttl_seconds": self.ttl or self.default_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "errors": self.errors,
+            }
+
+
+def create_cache(name, maxsize=10000, ttl=None, redis_url=None):
+    """Return a shared RedisCache when redis_url is set, else a per-process LRUCache"""
+    if redis_url:
+        return RedisCache(redis_url, ttl=ttl, name=name)
+    return LRUCache(maxsize=maxsize, ttl=ttl, name=name)
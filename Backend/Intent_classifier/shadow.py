@@ -0,0 +1,261 @@
+"""Shadow scoring and sticky A/B assignment for comparing two intent models.
+
+A sampled fraction of requests is scored by both the primary and the
+candidate model on a background thread, and one JSON line per comparison
+is appended to the shadow log. Utterances are logged as a hash unless
+SHADOW_LOG_TEXT is set, since they carry phone numbers and UPI IDs.
+Summarize a log with::
+
+    python shadow.py shadow_log.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+PRIMARY = "primary"
+CANDIDATE = "candidate"
+
+
+def cohort(user_key, candidate_percent, salt=""):
+    """Sticky cohort: the same user always lands in the same bucket of 100"""
+    if not user_key or candidate_percent <= 0:
+        return PRIMARY
+    bucket = int(hashlib.sha256(f"{salt}:{user_key}".encode()).hexdigest()[:8], 16) % 100
+    return CANDIDATE if bucket < candidate_percent else PRIMARY
+
+
+class ShadowLog:
+    """Append-only JSON lines file
+
+    Records are queued and written by one background thread; when the queue
+    is full they are dropped and counted rather than slowing requests. Each
+    record is a single O_APPEND write, so several workers can share a file.
+    """
+
+    def __init__(self, path, queue_size=10000):
+        self.path = path
+        self.queue_size = queue_size
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._writer = None
+
+    def append(self, record):
+        with self._cond:
+            if len(self._pending) >= self.queue_size:
+                self.dropped += 1
+                return
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name="shadow-log-writer", daemon=True)
+                self._writer.start()
+            self._pending.append(record)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                records = list(self._pending)
+                self._pending.clear()
+            for record in records:
+                try:
+                    os.write(self._fd, (json.dumps(record, separators=(',', ':'), ensure_ascii=False) + "\n").encode())
+                    self.written += 1
+                except OSError as e:
+                    self.errors += 1
+                    print(f"Shadow log write failed: {e}")
+
+    def stats(self):
+        return {"path": self.path, "written": self.written, "dropped": self.dropped, "errors": self.errors}
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+
+def _action(result):
+    """What /voice_command does with one model's answer: the intent, or low confidence"""
+    return result["intent"] if result["conf"] >= result.get("threshold", 0.0) else "low_confidence"
+
+
+def _latency(samples):
+    return {"count": len(samples), "p50": _percentile(samples, 0.5), "p95": _percentile(samples, 0.95)}
+
+
+class ShadowScorer:
+    """Score sampled requests with both models off the response path
+
+    ``predict(runtime, clean_text)`` returns (intent, confidence). A sampled
+    request is classified again by the primary and the candidate one after
+    the other on a worker thread, so their latencies are measured the same
+    way. At most ``queue_size`` comparisons wait; the rest are skipped.
+
+    ``thresholds`` maps each model to the confidence below which its answer
+    is not acted on, so the log also shows whether the two models would
+    have taken the same action.
+    """
+
+    def __init__(self, predict, log, sample_rate=0.1, workers=1, queue_size=100, log_text=False, window=1000,
+                 thresholds=None):
+        self.predict = predict
+        self.log = log
+        self.thresholds = {PRIMARY: 0.0, CANDIDATE: 0.0, **(thresholds or {})}
+        self.sample_rate = sample_rate
+        self.workers = workers
+        self.queue_size = queue_size
+        self.log_text = log_text
+        self._stats_lock = threading.Lock()
+        self.counts = Counter()
+        # Classification time as the caller saw it (cache and batching included) per cohort,
+        # and bare model time from the comparisons
+        self.served_ms = {PRIMARY: deque(maxlen=window), CANDIDATE: deque(maxlen=window)}
+        self.model_ms = {PRIMARY: deque(maxlen=window), CANDIDATE: deque(maxlen=window)}
+        self._reset_executor()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset_executor)
+
+    def _reset_executor(self):
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="shadow-scorer")
+            return self._executor
+
+    def record_served(self, served_by, latency_ms):
+        with self._stats_lock:
+            self.counts[f"served_{served_by}"] += 1
+            self.served_ms[served_by].append(latency_ms)
+
+    def maybe_score(self, clean_text, served_by, served_intent, primary, candidate):
+        """Queue a comparison for a sampled request; True when one was queued"""
+        if primary is None or candidate is None or random.random() >= self.sample_rate:
+            return False
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.counts['skipped_busy'] += 1
+            return False
+        try:
+            self._get_executor().submit(self._score, clean_text, served_by, served_intent, primary, candidate)
+        except Exception:
+            self._slots.release()
+            raise
+        return True
+
+    def _score(self, clean_text, served_by, served_intent, primary, candidate):
+        try:
+            record = {"ts": round(time.time(), 3), "served": served_by}
+            if self.log_text:
+                record["text"] = clean_text
+            else:
+                record["text_sha1"] = hashlib.sha1(clean_text.encode()).hexdigest()[:16]
+            for name, runtime in ((PRIMARY, primary), (CANDIDATE, candidate)):
+                started = time.perf_counter()
+                intent, confidence = self.predict(runtime, clean_text)
+                record[name] = {
+                    "model": f"{runtime.kind}:{runtime.version}",
+                    "intent": intent,
+                    "conf": round(float(confidence), 4),
+                    "threshold": self.thresholds[name],
+                    "ms": round((time.perf_counter() - started) * 1000, 3),
+                }
+            agree = record[PRIMARY]["intent"] == record[CANDIDATE]["intent"]
+            record["agree"] = agree
+            record["action_agree"] = _action(record[PRIMARY]) == _action(record[CANDIDATE])
+            if record[served_by]["intent"] != served_intent:
+                # The served answer came from an older cache entry or model version
+                record["served_intent"] = served_intent
+            self.log.append(record)
+            with self._stats_lock:
+                self.counts['scored'] += 1
+                self.counts['agreed' if agree else 'disagreed'] += 1
+                if record["action_agree"]:
+                    self.counts['actions_agreed'] += 1
+                for name in (PRIMARY, CANDIDATE):
+                    self.model_ms[name].append(record[name]["ms"])
+        except Exception as e:
+            with self._stats_lock:
+                self.counts['errors'] += 1
+            print(f"Shadow scoring failed: {e}")
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self.counts)
+            served = {name: list(samples) for name, samples in self.served_ms.items()}
+            model = {name: list(samples) for name, samples in self.model_ms.items()}
+        scored = counts.get('scored', 0)
+        return {
+            "enabled": True,
+            "sample_rate": self.sample_rate,
+            **counts,
+            "agreement_rate": round(counts.get('agreed', 0) / scored, 4) if scored else None,
+            "action_agreement_rate": round(counts.get('actions_agreed', 0) / scored, 4) if scored else None,
+            "thresholds": self.thresholds,
+            "served_latency_ms": {name: _latency(samples) for name, samples in served.items()},
+            "model_latency_ms": {name: _latency(samples) for name, samples in model.items()},
+            "log": self.log.stats(),
+        }
+
+
+def summarize(path):
+    """Agreement, confusion counts and latency per model from a shadow log"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    if not records:
+        print("No records")
+        return
+    agree = sum(1 for record in records if record['agree'])
+    action_agree = sum(1 for record in records if _action(record[PRIMARY]) == _action(record[CANDIDATE]))
+    print(f"{len(records)} comparisons, intent agreement {agree / len(records):.2%}, "
+          f"action agreement {action_agree / len(records):.2%}")
+    for name in (PRIMARY, CANDIDATE):
+        models = Counter(record[name]['model'] for record in records)
+        ms = [record[name]['ms'] for record in records]
+        confidence = [record[name]['conf'] for record in records]
+        low = sum(1 for record in records if _action(record[name]) == "low_confidence")
+        print(f"{name:<10} {', '.join(models)}: p50 {_percentile(ms, 0.5)}ms, p95 {_percentile(ms, 0.95)}ms, "
+              f"mean confidence {sum(confidence) / len(confidence):.3f}, below threshold {low / len(records):.2%}")
+    confusion = Counter((record[PRIMARY]['intent'], record[CANDIDATE]['intent']) for record in records if not record['agree'])
+    if confusion:
+        print("Disagreements (primary -> candidate):")
+        for (primary_intent, candidate_intent), count in confusion.most_common():
+            print(f"  {primary_intent:>16} -> {candidate_intent:<16} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log', nargs='?', default=os.getenv('SHADOW_LOG_PATH', 'shadow_log.jsonl'))
+    args = parser.parse_args()
+    summarize(args.log)
+
+
+if __name__ == '__main__':
+    main()
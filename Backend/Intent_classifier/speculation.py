@@ -0,0 +1,181 @@
+"""Speculative start of the chatbot reply while the intent classifier runs.
+
+Only side-effect-free work is started speculatively: chatbot generation
+keeps no per-user state, whereas a Rasa call records the turn in the
+sender's tracker even when its reply is thrown away. The server therefore
+speculates only while the chatbot is what answers casual utterances, that
+is while Rasa's circuit breaker is open.
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import LRUCache
+
+# Words that point at a money action; an utterance with none of them, no
+# digits and no UPI handle is probably small talk
+MONEY_WORDS = frozenset([
+    'send', 'sent', 'pay', 'paid', 'payment', 'transfer', 'request', 'ask', 'collect', 'receive',
+    'balance', 'money', 'amount', 'rupees', 'rupee', 'rs', 'inr', 'upi', 'account', 'bank',
+    'owe', 'give', 'refund', 'credit', 'debit', 'transaction', 'wallet',
+])
+_WORD_RE = re.compile(r'[a-z]+')
+
+
+def looks_casual(clean_text):
+    """Heuristic prefilter over preprocessed text"""
+    if any(char.isdigit() for char in clean_text) or '@' in clean_text:
+        return False
+    return not MONEY_WORDS.intersection(_WORD_RE.findall(clean_text))
+
+
+class Speculation:
+    """One speculative call
+
+    Once classification has decided, ``result`` serves it, ``unused`` drops
+    it for a casual utterance that was answered otherwise, and ``cancel``
+    drops it for an action utterance. Dropping sets ``cancelled``, which the
+    call is expected to check so it stops early.
+    """
+
+    def __init__(self, speculator, key, started_at):
+        self.speculator = speculator
+        self.key = key
+        self.future = None
+        self.cancelled = threading.Event()
+        self.started_at = started_at
+        self.finished_at = None
+        self.settled = False
+
+    def _done(self, _future):
+        self.finished_at = time.perf_counter()
+
+    def result(self, needed_at, timeout=None):
+        """The speculative result, recording the latency it saved"""
+        value = self.future.result(timeout)
+        finished_at = self.finished_at or time.perf_counter()
+        # Run one after the other, the call would have started at needed_at
+        saved = min(needed_at, finished_at) - self.started_at
+        self.speculator._settle(self, 'speculated_used', saved=max(saved, 0.0))
+        return value
+
+    def unused(self):
+        """The utterance was casual but another responder answered it"""
+        self.speculator.outcomes.set(self.key, True)
+        self._drop('speculated_unused')
+
+    def cancel(self):
+        """The utterance was an action, so the reply is not needed"""
+        self.speculator.outcomes.set(self.key, False)
+        self._drop('speculated_wasted')
+
+    def _drop(self, outcome):
+        # Work already under way stops at its next check and counts as wasted once it ends
+        self.cancelled.set()
+        if self.future.cancel():
+            self.speculator._settle(self, outcome, wasted=0.0)
+        else:
+            self.future.add_done_callback(
+                lambda _: self.speculator._settle(
+                    self, outcome, wasted=(self.finished_at or time.perf_counter()) - self.started_at
+                )
+            )
+
+
+class Speculator:
+    """Start the chatbot call alongside classification for likely-casual utterances
+
+    ``mode`` is 'prefilter' (remembered outcome for the text, else
+    looks_casual) or 'always'. Outcomes are kept per text so a prefilter
+    miss is not repeated for the same utterance.
+    """
+
+    def __init__(self, mode='prefilter', workers=8, memory_size=10000):
+        if mode not in ('prefilter', 'always'):
+            raise ValueError(f"Unknown speculation mode: {mode} (expected 'prefilter' or 'always')")
+        self.mode = mode
+        self.workers = workers
+        self.outcomes = LRUCache(maxsize=memory_size, name='speculation')
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        # Prefilter confusion matrix against what classification decided
+        self.counts = {
+            'speculated_used': 0,
+            'speculated_unused': 0,
+            'speculated_wasted': 0,
+            'missed_casual': 0,
+            'skipped_actions': 0,
+        }
+        self.saved_total = 0.0
+        self.wasted_total = 0.0
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='speculation')
+            return self._executor
+
+    def should_speculate(self, clean_text):
+        if self.mode == 'always':
+            return True
+        remembered = self.outcomes.get(clean_text)
+        if remembered is not None:
+            return remembered
+        return looks_casual(clean_text)
+
+    def start(self, clean_text, fn, *args):
+        """A Speculation running ``fn(*args, cancelled=event)``, or None when the prefilter says no"""
+        if not self.should_speculate(clean_text):
+            return None
+        speculation = Speculation(self, clean_text, time.perf_counter())
+        speculation.future = self._get_executor().submit(fn, *args, cancelled=speculation.cancelled)
+        speculation.future.add_done_callback(speculation._done)
+        return speculation
+
+    def observe(self, clean_text, casual):
+        """Record the classification outcome for an utterance that was not speculated on"""
+        self.outcomes.set(clean_text, casual)
+        with self._stats_lock:
+            self.counts['missed_casual' if casual else 'skipped_actions'] += 1
+
+    def _settle(self, speculation, outcome, saved=0.0, wasted=0.0):
+        if speculation.settled:
+            return
+        speculation.settled = True
+        if outcome == 'speculated_used':
+            self.outcomes.set(speculation.key, True)
+        with self._stats_lock:
+            self.counts[outcome] += 1
+            self.saved_total += saved
+            self.wasted_total += wasted
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self.counts)
+            saved, wasted = self.saved_total, self.wasted_total
+        used = counts['speculated_used']
+        dropped = counts['speculated_unused'] + counts['speculated_wasted']
+        casual = used + counts['speculated_unused']
+        return {
+            "enabled": True,
+            "mode": self.mode,
+            **counts,
+            # Share of speculative calls whose result was served
+            "precision": round(used / (used + dropped), 4) if used + dropped else None,
+            # Prefilter quality: casual utterances among those speculated on, and caught among all casual ones
+            "prefilter_precision": round(casual / (used + dropped), 4) if used + dropped else None,
+            "recall": round(casual / (casual + counts['missed_casual']), 4) if casual + counts['missed_casual'] else None,
+            "latency_saved_ms": {
+                "total": round(saved * 1000, 3),
+                "avg": round(saved / used * 1000, 3) if used else 0.0,
+            },
+            "wasted_work_ms": {
+                "total": round(wasted * 1000, 3),
+                "avg": round(wasted / dropped * 1000, 3) if dropped else 0.0,
+            },
+        }
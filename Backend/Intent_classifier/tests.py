@@ -0,0 +1,724 @@
+"""Tests for the intent server.
+
+Run from Backend/Intent_classifier:
+
+    python -m pytest tests.py
+"""
+import importlib.util
+import json
+import os
+import pickle
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import numpy as np
+
+# The lean runtime keeps TensorFlow out of the test process, and the chatbot
+# and NER model are only loaded by the tests that ask for them
+os.environ.setdefault('INTENT_RUNTIME', 'lean')
+os.environ.setdefault('LAZY_COMPONENTS', 'chatbot,ner_model')
+
+import django_client  # noqa: E402
+import flask_server  # noqa: E402
+from batching import MicroBatcher  # noqa: E402
+from chatbot_runtime import ChatbotBusy, ChatbotPool  # noqa: E402
+from django_client import CircuitBreaker, DjangoClient  # noqa: E402
+from intent_runtime import LeanIntentRuntime, SequenceEncoder  # noqa: E402
+from model_loader import ComponentLoader  # noqa: E402
+import shadow  # noqa: E402
+from rasa_client import RasaClient  # noqa: E402
+import result_cache  # noqa: E402
+from result_cache import LRUCache  # noqa: E402
+from speculation import Speculator  # noqa: E402
+
+
+class StubServer:
+    """Local HTTP server answering every request with ``status`` and ``body`` after ``delay`` seconds"""
+
+    def __init__(self, body=None, status=200, delay=0.0):
+        self.body = body
+        self.status = status
+        self.delay = delay
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_one(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                stub.requests.append((self.command, self.path, json.loads(self.rfile.read(length)) if length else None))
+                time.sleep(stub.delay)
+                payload = json.dumps(stub.body).encode()
+                self.send_response(stub.status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = handle_one
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def closed_port_url():
+    """URL of a local port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class MicroBatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+
+    def double(self, items):
+        self.batches.append(list(items))
+        return [item * 2 for item in items]
+
+    def test_full_batch_flushes_without_waiting(self):
+        batcher = MicroBatcher(self.double, max_batch_size=4, max_wait_ms=10000)
+
+        started = time.perf_counter()
+        futures = [batcher.submit_async(item) for item in range(4)]
+        results = [future.result(timeout=5) for future in futures]
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(results, [0, 2, 4, 6])
+        self.assertEqual(self.batches, [[0, 1, 2, 3]])
+
+    def test_partial_batch_flushes_after_max_wait(self):
+        batcher = MicroBatcher(self.double, max_batch_size=100, max_wait_ms=50)
+
+        started = time.perf_counter()
+        self.assertEqual(batcher.submit(21, timeout=5), 42)
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.045)
+        self.assertEqual(batcher.stats()['batch_size_histogram'], {"1": 1})
+
+    def test_concurrent_callers_each_get_their_own_result(self):
+        batcher = MicroBatcher(self.double, max_batch_size=8, max_wait_ms=20)
+        results = {}
+
+        def call(item):
+            results[item] = batcher.submit(item, timeout=5)
+
+        threads = [threading.Thread(target=call, args=(item,)) for item in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {item: item * 2 for item in range(20)})
+        self.assertEqual(sorted(item for batch in self.batches for item in batch), list(range(20)))
+        self.assertTrue(all(len(batch) <= 8 for batch in self.batches))
+
+    def test_batch_failure_reaches_every_waiter(self):
+        def fail(items):
+            raise ValueError("model exploded")
+
+        batcher = MicroBatcher(fail, max_batch_size=3, max_wait_ms=10000)
+        futures = [batcher.submit_async(item) for item in range(3)]
+
+        for future in futures:
+            with self.assertRaisesRegex(ValueError, "model exploded"):
+                future.result(timeout=5)
+        self.assertEqual(batcher.stats()['failed_batches'], 1)
+        # The worker keeps serving later batches
+        batcher.batch_fn = self.double
+        futures = [batcher.submit_async(item) for item in range(3)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4])
+
+    def test_wrong_number_of_results_fails_the_batch(self):
+        batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=10000)
+        futures = [batcher.submit_async(item) for item in range(2)]
+
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+class LRUCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        # Only the cache module's clock moves
+        patcher = mock.patch.object(result_cache, 'time', mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = LRUCache(ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=60)
+
+        self.now += 11
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(cache.stats()['size'], 1)
+
+    def test_counters(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('a')
+        cache.get('missing', 'default')
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (2, 1, 0.6667))
+
+    def test_pop_removes_once(self):
+        cache = LRUCache(ttl=10)
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertIsNone(cache.pop('a'))
+        self.assertIsNone(cache.get('a'))
+        self.now += 11
+        self.assertEqual(cache.pop('b', 'gone'), 'gone')
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch.object(django_client, 'time', mock.Mock(monotonic=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def trip(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.trip()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()['rejected_calls'], 1)
+
+    def test_is_open_does_not_start_a_trial(self):
+        self.assertFalse(self.breaker.is_open())
+        self.trip()
+        self.assertTrue(self.breaker.is_open())
+
+        self.now += 31
+        self.assertFalse(self.breaker.is_open())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_success_closes(self):
+        self.trip()
+        self.now += 31
+
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        # Only the trial call goes through
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_half_open_trial_failure_reopens(self):
+        self.trip()
+        self.now += 31
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+
+class DjangoClientTests(unittest.TestCase):
+    def client_for(self, **kwargs):
+        stub = StubServer(**kwargs)
+        self.addCleanup(stub.close)
+        return stub, DjangoClient(stub.url, get_retries=0, failure_threshold=2, reset_timeout=60)
+
+    def test_success_returns_the_json_body(self):
+        stub, client = self.client_for(body={"balance": 500, "status": "success"})
+
+        self.assertEqual(client.call('getBalance', params={'phoneNumber': '+91900'}), {"balance": 500, "status": "success"})
+        self.assertEqual(stub.requests[0][:2], ('GET', '/getBalance/?phoneNumber=%2B91900'))
+
+    def test_client_errors_keep_django_message(self):
+        _, client = self.client_for(body={"error": "Insufficient balance", "status": "error"}, status=400)
+
+        result = client.call('sendMoneyPhone', method='POST', data={"amount": 10})
+
+        self.assertEqual(result, {"error": "Insufficient balance", "status": "error", "http_status": 400})
+        # A 4xx is the caller's fault and does not count against the backend
+        self.assertEqual(client.breaker.failures, 0)
+
+    def test_server_errors_open_the_breaker(self):
+        stub, client = self.client_for(body={"detail": "boom"}, status=500)
+
+        self.assertEqual(client.call('getBalance'), {"error": "API call failed: 500", "status": "error"})
+        client.call('getBalance')
+        self.assertEqual(client.call('getBalance'),
+                         {"error": "Django backend unavailable, please try again shortly", "status": "error"})
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(client.stats()['errors'], 3)
+
+    def test_connection_errors(self):
+        client = DjangoClient(closed_port_url(), get_retries=0)
+
+        result = client.call('getBalance')
+
+        self.assertEqual(result['status'], 'error')
+        self.assertTrue(result['error'].startswith("Connection error:"))
+
+    def test_call_async_returns_a_future(self):
+        _, client = self.client_for(body={"status": "success"})
+
+        self.assertEqual(client.call_async('getBalance').result(timeout=5), {"status": "success"})
+
+
+class ChatbotPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.pool = ChatbotPool(workers=1, queue_size=1, name="test-chatbot")
+
+    def blocked(self, value):
+        self.release.wait(5)
+        return value
+
+    def test_rejects_past_workers_plus_queue(self):
+        running = self.pool.submit(self.blocked, 'first')
+        queued = self.pool.submit(self.blocked, 'second')
+
+        with self.assertRaises(ChatbotBusy):
+            self.pool.submit(self.blocked, 'third')
+
+        self.release.set()
+        self.assertEqual((running.result(5), queued.result(5)), ('first', 'second'))
+        stats = self.pool.stats()
+        self.assertEqual((stats['submitted'], stats['rejected'], stats['completed']), (2, 1, 2))
+
+    def test_finished_and_failed_work_frees_its_slot(self):
+        def fail():
+            raise RuntimeError("generation failed")
+
+        with self.assertRaises(RuntimeError):
+            self.pool.submit(fail).result(5)
+        self.assertEqual(self.pool.submit(lambda: 'ok').result(5), 'ok')
+        self.assertEqual(self.pool.submit(lambda: 'again').result(5), 'again')
+
+        stats = self.pool.stats()
+        self.assertEqual((stats['errors'], stats['rejected'], stats['active'], stats['queued']), (1, 0, 0, 0))
+
+
+class ModelVersionTests(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+
+    def test_classification_responses_carry_the_version(self):
+        with mock.patch.object(flask_server, 'predict_intent', return_value=('check_balance', 0.95)):
+            response = self.client.post('/voice_command', json={'text': 'check my balance'})
+
+        version = flask_server.components.get('intent_classifier').version
+        self.assertEqual(response.headers['X-Model-Version'], version)
+        self.assertEqual(response.get_json()['model_version'], version)
+
+    def test_version_header_does_not_start_a_lazy_load(self):
+        loader = mock.Mock()
+        components = ComponentLoader('lazy')
+        components.register('intent_classifier', loader, required=True)
+        components.start()
+
+        with mock.patch.object(flask_server, 'components', components):
+            response = self.client.get('/health/live')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Model-Version', response.headers)
+        loader.assert_not_called()
+
+
+class EntityKeywordTests(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+        self.nlp = mock.Mock(return_value=mock.Mock(ents=[mock.Mock(text='balance')]))
+        runtime = flask_server.current_models()[0]
+        patcher = mock.patch.object(flask_server, 'current_models', return_value=(runtime, self.nlp))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_legacy_predict_returns_keywords_for_every_intent(self):
+        with mock.patch.object(flask_server, 'predict_intent', return_value=('check_balance', 0.95)):
+            response = self.client.post('/predict', json={'text': 'check my balance'})
+
+        self.assertEqual(response.get_json()[1], {'keywords': {'ner_keywords': ['balance']}})
+
+    def test_voice_command_skips_ner_when_the_slots_are_filled(self):
+        entities = flask_server.extract_entities('send 500 to 9876543210', 'transfer_money')
+
+        self.assertEqual(entities['amount'], 500.0)
+        self.assertNotIn('ner_keywords', entities)
+        self.nlp.assert_not_called()
+
+
+class ConfirmationTests(unittest.TestCase):
+    owner = '+919000000001'
+    other = '+919000000002'
+
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+        self.entities = {"amount": "500", "recipient": "mom"}
+        self.token = flask_server.prepare_action('transfer_money', self.entities, self.owner)
+        patcher = mock.patch.object(
+            flask_server, 'execute_action', return_value={"status": "success", "message": "Sent ₹500"}
+        )
+        self.execute_action = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reply(self, text, user_phone):
+        return self.client.post('/voice_command', json={
+            'text': text,
+            'userPhone': user_phone,
+            'confirmationToken': self.token,
+        })
+
+    def test_owner_confirm_executes(self):
+        response = self.reply('yes', self.owner)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()['executed'])
+        self.execute_action.assert_called_once_with('transfer_money', self.entities, self.owner)
+
+    def test_other_user_cannot_consume_the_token(self):
+        self.assertEqual(self.reply('confirm', self.other).status_code, 403)
+        self.assertEqual(self.reply('cancel', self.other).status_code, 403)
+        self.execute_action.assert_not_called()
+
+        self.assertEqual(self.reply('confirm', self.owner).status_code, 200)
+        self.execute_action.assert_called_once()
+
+    def test_repeated_confirm_executes_once(self):
+        self.assertEqual(self.reply('yes', self.owner).status_code, 200)
+        self.assertEqual(self.reply('yes', self.owner).status_code, 410)
+        self.execute_action.assert_called_once()
+
+    def test_cancel_drops_the_action(self):
+        response = self.reply('cancel', self.owner)
+
+        self.assertEqual(response.get_json()['action'], 'cancelled')
+        self.assertEqual(self.reply('yes', self.owner).status_code, 410)
+        self.execute_action.assert_not_called()
+
+
+class SpeculationTests(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+        self.rasa = mock.Mock()
+        # Rasa is down unless a test says otherwise
+        self.rasa.breaker.is_open.return_value = True
+        self.rasa.reply.return_value = None
+        self.speculator = Speculator('always', workers=2)
+        for name, value in (('rasa_client', self.rasa), ('speculator', self.speculator)):
+            patcher = mock.patch.object(flask_server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(flask_server, 'get_chatbot_response', return_value="Hi there!")
+        self.chatbot = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def command(self, text, intent, confidence):
+        with mock.patch.object(flask_server, 'predict_intent', return_value=(intent, confidence)):
+            return self.client.post('/voice_command', json={'text': text, 'userPhone': '+919000000001'}).get_json()
+
+    def wait_settled(self, count):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            stats = self.speculator.stats()
+            if stats['speculated_used'] + stats['speculated_unused'] + stats['speculated_wasted'] >= count:
+                return stats
+            time.sleep(0.01)
+        self.fail("speculation was not settled")
+
+    def test_nothing_is_speculated_while_rasa_is_up(self):
+        self.rasa.breaker.is_open.return_value = False
+        self.rasa.reply.return_value = [{"text": "Hello!"}]
+
+        body = self.command('how are you', 'greeting', 0.4)
+
+        self.rasa.reply.assert_called_once_with('how are you', '+919000000001')
+        self.assertEqual((body['source'], body['assistant_message']), ('rasa', 'Hello!'))
+        self.chatbot.assert_not_called()
+        self.assertEqual(self.speculator.stats()['missed_casual'], 0)
+
+    def test_action_commands_never_reach_rasa(self):
+        body = self.command('check my balance', 'check_balance', 0.95)
+
+        self.assertEqual(body['action'], 'check_balance')
+        self.rasa.reply.assert_not_called()
+        # Remembered at once, so the same text is not speculated on again
+        self.assertIs(self.speculator.outcomes.get('check my balance'), False)
+        self.assertEqual(self.wait_settled(1)['speculated_wasted'], 1)
+
+    def test_speculative_chatbot_reply_is_served_while_rasa_is_down(self):
+        body = self.command('how are you', 'greeting', 0.4)
+
+        self.assertEqual((body['source'], body['assistant_message']), ('chatbot', 'Hi there!'))
+        self.assertTrue(body['speculative'])
+        self.assertEqual(self.chatbot.call_count, 1)
+        self.assertEqual(self.chatbot.call_args.args[0], 'how are you')
+        self.assertEqual(self.speculator.stats()['speculated_used'], 1)
+        self.assertEqual(self.speculator.stats()['precision'], 1.0)
+
+    def test_reply_unused_when_rasa_answers_counts_as_waste(self):
+        # The breaker's trial call went through and Rasa answered after all
+        self.rasa.reply.return_value = [{"text": "Hello!"}]
+
+        body = self.command('how are you', 'greeting', 0.4)
+
+        self.assertEqual(body['source'], 'rasa')
+        stats = self.wait_settled(1)
+        self.assertEqual((stats['speculated_used'], stats['speculated_unused']), (0, 1))
+        self.assertEqual(stats['precision'], 0.0)
+        self.assertEqual(stats['prefilter_precision'], 1.0)
+        self.assertIs(self.speculator.outcomes.get('how are you'), True)
+
+    def test_dropping_a_speculation_stops_the_running_call(self):
+        started = threading.Event()
+
+        def generate(cancelled):
+            started.set()
+            # Stands in for decoding: runs until told to stop
+            self.assertTrue(cancelled.wait(5))
+            return "partial"
+
+        speculation = self.speculator.start('how are you', generate)
+        self.assertTrue(started.wait(5))
+        speculation.cancel()
+
+        stats = self.wait_settled(1)
+        self.assertEqual(stats['speculated_wasted'], 1)
+        self.assertGreater(stats['wasted_work_ms']['total'], 0)
+
+
+class RasaClientTests(unittest.TestCase):
+    def start_stub(self, **kwargs):
+        stub = StubServer(**kwargs)
+        self.addCleanup(stub.close)
+        return stub
+
+    def test_fast_reply(self):
+        stub = self.start_stub(body=[{"recipient_id": "u1", "text": "Hello!"}])
+        client = RasaClient(stub.url, timeout=1.0)
+
+        self.assertEqual(client.reply("hi", sender="u1"), [{"recipient_id": "u1", "text": "Hello!"}])
+        self.assertEqual(stub.requests, [('POST', '/webhooks/rest/webhook', {"sender": "u1", "message": "hi"})])
+        self.assertEqual(client.stats()['calls'], 1)
+
+    def test_late_reply_gives_up_at_the_deadline(self):
+        stub = self.start_stub(body=[{"text": "too late"}], delay=1.0)
+        client = RasaClient(stub.url, timeout=0.2)
+
+        started = time.perf_counter()
+        self.assertIsNone(client.reply("hi"))
+        self.assertLess(time.perf_counter() - started, 0.8)
+        self.assertEqual(client.stats()['timeouts'], 1)
+
+    def test_down_server_returns_none(self):
+        client = RasaClient(closed_port_url(), timeout=1.0)
+
+        self.assertIsNone(client.reply("hi"))
+        self.assertEqual(client.stats()['errors'], 1)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        stub = self.start_stub(body={"error": "boom"}, status=500)
+        client = RasaClient(stub.url, timeout=1.0, failure_threshold=2, reset_timeout=60)
+
+        self.assertIsNone(client.reply("one"))
+        self.assertIsNone(client.reply("two"))
+        self.assertIsNone(client.reply("three"))
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(client.breaker.stats()['state'], 'open')
+        self.assertEqual(client.breaker.stats()['rejected_calls'], 1)
+
+    def test_voice_command_falls_back_to_the_chatbot(self):
+        stub = self.start_stub(body=[{"text": "too late"}], delay=1.0)
+        client = flask_server.app.test_client()
+        with mock.patch.object(flask_server, 'rasa_client', RasaClient(stub.url, timeout=0.2)), \
+                mock.patch.object(flask_server, 'speculator', None), \
+                mock.patch.object(flask_server, 'predict_intent', return_value=('greeting', 0.3)), \
+                mock.patch.object(flask_server, 'get_chatbot_response', return_value="Hi there!"):
+            body = client.post('/voice_command', json={'text': 'how are you', 'userPhone': '+919000000001'}).get_json()
+
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(body['source'], 'chatbot')
+        self.assertEqual(body['assistant_message'], 'Hi there!')
+        self.assertTrue(body['rasa_fallback'])
+        self.assertEqual(body['action'], 'chatbot')
+
+
+class ABCohortTests(unittest.TestCase):
+    def setUp(self):
+        self.client = flask_server.app.test_client()
+        self.log_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.log_dir.cleanup)
+        self.log_path = os.path.join(self.log_dir.name, 'shadow.jsonl')
+        self.candidate = mock.Mock(kind='sklearn', version='candidate-v1')
+        primary = flask_server.components.get('intent_classifier')
+        # Same intent from both models, but a confidence only the candidate's threshold accepts
+        self.scorer = shadow.ShadowScorer(
+            lambda runtime, clean_text: ('transfer_money', 0.6175 if runtime is self.candidate else 0.8035),
+            shadow.ShadowLog(self.log_path),
+            sample_rate=1.0,
+            thresholds={shadow.PRIMARY: 0.7, shadow.CANDIDATE: 0.55},
+        )
+        peek = flask_server.components.peek
+        for patcher in (
+            mock.patch.object(flask_server, 'shadow_scorer', self.scorer),
+            mock.patch.object(flask_server, 'AB_CANDIDATE_PERCENT', 100),
+            mock.patch.object(flask_server.components, 'peek',
+                              lambda name: self.candidate if name == 'candidate_intent' else peek(name)),
+            mock.patch.object(flask_server, 'predict_intent',
+                              lambda text, runtime=None: ('transfer_money', 0.6175 if runtime is self.candidate else 0.6)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.primary_version = primary.version
+
+    def command(self, user_phone):
+        return self.client.post('/voice_command', json={'text': 'send 500 to 9876543210', 'userPhone': user_phone})
+
+    def test_candidate_cohort_uses_the_candidate_threshold(self):
+        response = self.command('+919000000001')
+        body = response.get_json()
+
+        self.assertEqual((body['model_cohort'], body['confidence_threshold']), ('candidate', 55.0))
+        self.assertEqual(body['action'], 'transfer_money')
+        self.assertEqual(response.headers['X-Model-Version'], 'candidate-v1')
+
+    def test_primary_cohort_keeps_its_threshold(self):
+        with mock.patch.object(flask_server, 'AB_CANDIDATE_PERCENT', 0):
+            body = self.command('+919000000001').get_json()
+
+        self.assertEqual((body['model_cohort'], body['confidence_threshold']), ('primary', 70.0))
+        self.assertEqual(body['action'], 'route_to_rasa')
+
+    def test_comparisons_log_thresholds_and_actions(self):
+        self.command('+919000000001')
+        deadline = time.monotonic() + 5
+        while self.scorer.log.written < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        with open(self.log_path) as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record['served'], 'candidate')
+        self.assertEqual((record['primary']['threshold'], record['candidate']['threshold']), (0.7, 0.55))
+        self.assertTrue(record['agree'])
+        self.assertTrue(record['action_agree'])
+        self.assertEqual(record['primary']['model'], f"{flask_server.components.get('intent_classifier').kind}:{self.primary_version}")
+        self.assertNotIn('send 500', json.dumps(record))
+
+
+HAS_TENSORFLOW = importlib.util.find_spec('tensorflow') is not None
+
+
+class SequenceEncoderTests(unittest.TestCase):
+    def test_unknown_words_without_an_oov_index_are_dropped(self):
+        encoder = SequenceEncoder({'send': 1, 'money': 2}, 4, oov_token='<unk>')
+
+        self.assertEqual(encoder.text_to_sequence('send some money'), [1, 2])
+        self.assertEqual(encoder.encode(['send some money']).tolist(), [[1, 2, 0, 0]])
+
+    def test_unknown_and_out_of_range_words_map_to_the_oov_index(self):
+        encoder = SequenceEncoder({'<unk>': 1, 'send': 2, 'money': 3}, 3, num_words=3, oov_token='<unk>')
+
+        self.assertEqual(encoder.text_to_sequence('send some money'), [2, 1, 1])
+
+
+@unittest.skipUnless(HAS_TENSORFLOW, "needs TensorFlow")
+class LeanExportParityTests(unittest.TestCase):
+    texts = [
+        "send 500 to mom", "transfer 200 rupees to rahul", "pay priya 50",
+        "check my balance", "what is my account balance", "show balance",
+        "request 300 from amit", "ask dad for 1000", "collect 20 from sam",
+    ]
+    labels = ["transfer_money"] * 3 + ["check_balance"] * 3 + ["request_money"] * 3
+    unseen = ["send 75 to grandma quickly", "balance please", "", "request request request " * 10]
+
+    @classmethod
+    def setUpClass(cls):
+        import tensorflow as tf
+        from sklearn.preprocessing import LabelEncoder
+        from export_model import export_bundle
+        from intent_runtime import KerasIntentRuntime
+
+        cls.model_dir = tempfile.TemporaryDirectory()
+        model_dir = cls.model_dir.name
+        # num_words below the vocabulary size exercises the OOV path for rare words
+        tokenizer = tf.keras.preprocessing.text.Tokenizer(num_words=15, oov_token='<unk>')
+        tokenizer.fit_on_texts(cls.texts)
+        label_encoder = LabelEncoder().fit(cls.labels)
+        max_len = 8
+
+        tf.keras.utils.set_random_seed(0)
+        model = tf.keras.Sequential([
+            tf.keras.Input(shape=(max_len,)),
+            tf.keras.layers.Embedding(len(tokenizer.word_index) + 1, 8),
+            tf.keras.layers.Conv1D(6, 3, activation='relu'),
+            tf.keras.layers.GlobalMaxPooling1D(),
+            tf.keras.layers.Dropout(0.5),
+            tf.keras.layers.Dense(5, activation='relu'),
+            tf.keras.layers.Dense(len(label_encoder.classes_), activation='softmax'),
+        ])
+        model.save(os.path.join(model_dir, 'intent_model.h5'))
+        for name, value in (('tokenizer.pkl', tokenizer), ('label_encoder.pkl', label_encoder), ('max_len.pkl', max_len)):
+            with open(os.path.join(model_dir, name), 'wb') as f:
+                pickle.dump(value, f)
+
+        bundle_dir = os.path.join(model_dir, 'lean')
+        export_bundle(model_dir, bundle_dir)
+        cls.keras = KerasIntentRuntime(model_dir)
+        cls.lean = LeanIntentRuntime(bundle_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.model_dir.cleanup()
+
+    def test_tokenization_matches_keras(self):
+        texts = self.texts + self.unseen
+        np.testing.assert_array_equal(self.lean.encode(texts), self.keras.encode(texts))
+
+    def test_probabilities_match_keras(self):
+        texts = self.texts + self.unseen
+        expected = self.keras.predict_proba(self.keras.encode(texts))
+        np.testing.assert_allclose(self.lean.predict_proba(self.lean.encode(texts)), expected, atol=1e-5)
+        self.assertEqual(self.lean.classes.tolist(), self.keras.classes.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
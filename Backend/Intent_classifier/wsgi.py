@@ -0,0 +1,21 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``"""
+import os
+
+MODEL_PRELOAD_TIMEOUT = float(os.getenv('MODEL_PRELOAD_TIMEOUT', '300'))
+
+
+def create_app():
+    """Import the intent server and wait for its models to finish loading
+
+    With ``preload_app`` gunicorn calls this once in the master, so workers
+    are forked with the weights already in memory and share those pages
+    copy-on-write instead of each loading its own copy.
+    """
+    import flask_server
+
+    if not flask_server.components.wait(MODEL_PRELOAD_TIMEOUT):
+        print(f"Models still loading after {MODEL_PRELOAD_TIMEOUT:g}s; each worker will finish loading its own copy")
+    return flask_server.app
+
+
+app = create_app()
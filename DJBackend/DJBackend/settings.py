@@ -14,6 +14,7 @@ from pathlib import Path
 from dotenv import load_dotenv
 import os
 from urllib.parse import urlparse, parse_qsl
+from corsheaders.defaults import default_headers
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(os.path.join(BASE_DIR, '.env'))
@@ -95,6 +96,36 @@ DATABASES = {
 }
 
 
+# Cache: per-process memory by default; REDIS_URL shares it across workers
+# (needs the redis package)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Per-process recipient-resolution indexes (accounts.contacts): how many accounts
+# to keep, how many counterparties each, and a bound on their staleness
+CONTACT_INDEX_MAX_ACCOUNTS = int(os.getenv('CONTACT_INDEX_MAX_ACCOUNTS', '10000'))
+CONTACT_INDEX_MAX_CONTACTS = int(os.getenv('CONTACT_INDEX_MAX_CONTACTS', '500'))
+CONTACT_INDEX_TTL_SECONDS = int(os.getenv('CONTACT_INDEX_TTL_SECONDS', '300'))
+
+# Threads shared by the blocking (money-moving) views under ASGI, which bounds
+# their concurrent database connections; 0 runs them on Django's per-request thread
+SYNC_VIEW_THREADS = int(os.getenv('SYNC_VIEW_THREADS', '10'))
+
+# How long Idempotency-Key responses are replayed; purge_idempotency_keys deletes older ones
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_KEY_TTL_SECONDS', str(24 * 60 * 60)))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -141,9 +172,34 @@ TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 
+# SMS delivery: accounts.sms.FakeSMSBackend collects messages in memory instead
+SMS_BACKEND = os.getenv('SMS_BACKEND', 'accounts.sms.TwilioSMSBackend')
+
+# Background tasks (accounts/tasks.py): 'thread' queues in-process, 'redis' in a
+# shared Redis (drained by TASK_WORKERS threads per process and/or
+# `manage.py run_task_worker`), 'eager' runs tasks inline
+TASK_BROKER = os.getenv('TASK_BROKER', 'thread')
+TASK_REDIS_URL = os.getenv('TASK_REDIS_URL', os.getenv('REDIS_URL'))
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', '4'))
+TASK_MAX_RETRIES = int(os.getenv('TASK_MAX_RETRIES', '3'))
+# Retry n waits TASK_RETRY_BACKOFF_SECONDS * 2**(n-1)
+TASK_RETRY_BACKOFF_SECONDS = float(os.getenv('TASK_RETRY_BACKOFF_SECONDS', '2'))
+TASK_DEAD_LETTER_LIMIT = int(os.getenv('TASK_DEAD_LETTER_LIMIT', '1000'))
+
+# OTPs: 'cache' uses the default cache (shared across workers when REDIS_URL is set),
+# 'memory' a private per-process store
+OTP_STORE = os.getenv('OTP_STORE', 'cache')
+OTP_TTL_SECONDS = int(os.getenv('OTP_TTL_SECONDS', '300'))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', '5'))
+# At most OTP_RATE_LIMIT codes per phone in any OTP_RATE_WINDOW_SECONDS
+OTP_RATE_LIMIT = int(os.getenv('OTP_RATE_LIMIT', '3'))
+OTP_RATE_WINDOW_SECONDS = int(os.getenv('OTP_RATE_WINDOW_SECONDS', '600'))
+
 # CORS settings - Allow all origins for development
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 # REST Framework settings
 REST_FRAMEWORK = {
@@ -0,0 +1,189 @@
+"""Resolve a spoken name to one of the caller's recent counterparties.
+
+Each account gets an in-memory index of the people it has paid, been paid
+by, or exchanged money requests with, built from history with two queries.
+Names are matched exactly, by word or prefix, then by trigram similarity
+(the measure pg_trgm uses), and ties are broken by how often and how
+recently the two interacted. A user has at most a few hundred
+counterparties, so a linear scan over precomputed trigram sets stays well
+under a millisecond and needs no trie or database extension.
+
+Indexes are cached per process. New transactions and requests bump a
+version in the default cache (Redis when REDIS_URL is set) on commit, which
+makes every worker rebuild that account's index on its next lookup.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max
+
+from .models import MoneyRequest, Transaction, User, UserAccount
+
+EXACT = 1.0
+WORD = 0.9
+PREFIX = 0.8
+DIRECTORY = 0.75
+MIN_SIMILARITY = 0.3
+# The best candidate is used without asking only when it scores this well
+# and leads the runner-up by at least MARGIN
+CONFIDENT = 0.8
+MARGIN = 0.1
+
+
+def normalize(name):
+    return ' '.join(re.findall(r'[a-z0-9]+', str(name).lower()))
+
+
+def trigrams(text):
+    """pg_trgm style trigrams: each word padded with two spaces in front and one behind"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _version_key(account_id):
+    return f'contacts:version:{account_id}'
+
+
+def invalidate(*account_ids):
+    """Rebuild these accounts' indexes once the current transaction commits"""
+    def bump():
+        for account_id in account_ids:
+            try:
+                cache.incr(_version_key(account_id))
+            except ValueError:
+                cache.set(_version_key(account_id), 1, None)
+    transaction.on_commit(bump)
+
+
+class ContactIndex:
+    def __init__(self, account_id, version, entries):
+        self.account_id = account_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.entries = entries
+        for entry in entries:
+            entry['keys'] = [normalize(entry['upiName']), normalize(entry['upiId'].split('@')[0])]
+            entry['words'] = entry['keys'][0].split()
+            entry['trigrams'] = [trigrams(entry['keys'][0])] + [trigrams(word) for word in entry['words']]
+
+    @classmethod
+    def build(cls, account_id, version):
+        """Counterparties from both sides of transactions and money requests, most recent first"""
+        branches = [
+            model.objects.filter(**{own: account_id}).order_by()
+            .values(counterparty=F(other))
+            .annotate(interactions=Count('id'), last_at=Max(when))
+            for model, own, other, when in [
+                (Transaction, 'sender', 'receiver', 'timestamp'),
+                (Transaction, 'receiver', 'sender', 'timestamp'),
+                (MoneyRequest, 'requester', 'requestee', 'created_at'),
+                (MoneyRequest, 'requestee', 'requester', 'created_at'),
+            ]
+        ]
+        stats = {}
+        for row in branches[0].union(*branches[1:], all=True):
+            seen = stats.setdefault(row['counterparty'], {'interactions': 0, 'last_at': row['last_at']})
+            seen['interactions'] += row['interactions']
+            seen['last_at'] = max(seen['last_at'], row['last_at'])
+        stats.pop(account_id, None)
+
+        recent = sorted(stats, key=lambda pk: stats[pk]['last_at'], reverse=True)[:settings.CONTACT_INDEX_MAX_CONTACTS]
+        entries = list(UserAccount.objects.filter(pk__in=recent).values(
+            accountId=F('pk'), upiName=F('user__upiName'), phoneNumber=F('user__phoneNumber'), upiId=F('user__upiMail')
+        ))
+        for entry in entries:
+            entry.update(stats[entry['accountId']])
+        return cls(account_id, version, entries)
+
+    def score(self, entry, query, query_trigrams):
+        if query in entry['keys']:
+            return EXACT
+        if query in entry['words'] or entry['keys'][0].startswith(query + ' '):
+            return WORD
+        if len(query) >= 2 and any(key.startswith(query) for key in entry['keys'] + entry['words']):
+            return PREFIX
+        # Against the whole name and each word, so a misheard first name still matches
+        return round(max(similarity(query_trigrams, grams) for grams in entry['trigrams']), 3)
+
+    def search(self, name, limit=5):
+        query = normalize(name)
+        if not query:
+            return []
+        query_trigrams = trigrams(query)
+        matches = []
+        for entry in self.entries:
+            score = self.score(entry, query, query_trigrams)
+            if score >= MIN_SIMILARITY:
+                matches.append((score, entry))
+        matches.sort(key=lambda match: (match[0], match[1]['interactions'], match[1]['last_at']), reverse=True)
+        return [candidate(entry, score, 'history') for score, entry in matches[:limit]]
+
+
+def candidate(entry, score, source):
+    return {
+        'upiName': entry['upiName'],
+        'phoneNumber': entry['phoneNumber'],
+        'upiId': entry['upiId'],
+        'score': score,
+        'source': source,
+        'interactions': entry.get('interactions', 0),
+        'lastInteraction': entry['last_at'].isoformat() if entry.get('last_at') else None,
+    }
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_index(account_id):
+    """The account's index, rebuilt when its version moved or it is older than the TTL"""
+    version = cache.get(_version_key(account_id), 0)
+    with _lock:
+        index = _indexes.get(account_id)
+        if (index is not None and index.version == version
+                and time.monotonic() - index.built_at < settings.CONTACT_INDEX_TTL_SECONDS):
+            _indexes.move_to_end(account_id)
+            return index
+
+    index = ContactIndex.build(account_id, version)
+    with _lock:
+        _indexes[account_id] = index
+        _indexes.move_to_end(account_id)
+        while len(_indexes) > settings.CONTACT_INDEX_MAX_ACCOUNTS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def resolve(account, name, limit=5):
+    """Ranked candidates for ``name`` and the one to use, or None when it is missing or ambiguous
+
+    People the caller has dealt with come first. Only when none of them
+    matches are other users with exactly that name (any case) offered,
+    through the Upper(upiName) index; those are never picked automatically.
+    """
+    candidates = get_index(account.pk).search(name, limit)
+    if not candidates and normalize(name):
+        others = User.objects.filter(upiName__iexact=name.strip(), useraccount__isnull=False).exclude(
+            pk=account.user_id
+        ).values('upiName', 'phoneNumber', upiId=F('upiMail'))[:limit]
+        candidates = [candidate(entry, DIRECTORY, 'directory') for entry in others]
+
+    resolved = None
+    if candidates and candidates[0]['score'] >= CONFIDENT:
+        if len(candidates) == 1 or round(candidates[0]['score'] - candidates[1]['score'], 3) >= MARGIN:
+            resolved = candidates[0]
+    return candidates, resolved
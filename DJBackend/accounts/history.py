@@ -0,0 +1,122 @@
+"""History queries for one account: merged transactions and money requests."""
+from django.db import connection
+from django.db.models import CharField, Count, F, Q, Value
+
+from .models import MoneyRequest, Transaction
+from .pagination import older_than
+
+DIRECTIONS = ('all', 'sent', 'received')
+HISTORY_FIELDS = (
+    'id', 'amount', 'timestamp', 'status', 'direction',
+    'counterparty_name', 'counterparty_phone', 'counterparty_upi',
+)
+
+
+def _branch(account, direction, status=None, counterparty=None, since=None, until=None, cursor=None, limit=None):
+    """Sent or received transactions with the other party's details, newest first"""
+    own, other = ('sender', 'receiver') if direction == 'sent' else ('receiver', 'sender')
+    queryset = Transaction.objects.filter(**{own: account})
+    if status:
+        queryset = queryset.filter(status=status)
+    if counterparty:
+        queryset = queryset.filter(
+            Q(**{f'{other}__user__phoneNumber': counterparty}) | Q(**{f'{other}__user__upiMail': counterparty})
+        )
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lte=until)
+    if cursor:
+        queryset = queryset.filter(older_than('timestamp', cursor))
+
+    queryset = queryset.annotate(
+        direction=Value(direction, output_field=CharField()),
+        counterparty_name=F(f'{other}__user__upiName'),
+        counterparty_phone=F(f'{other}__user__phoneNumber'),
+        counterparty_upi=F(f'{other}__user__upiMail'),
+    ).values(*HISTORY_FIELDS).order_by('-timestamp', '-id')
+
+    if limit is not None:
+        queryset = queryset[:limit]
+    return queryset
+
+
+def _history_queryset(account, limit=None, direction='all', **filters):
+    if direction != 'all':
+        return _branch(account, direction, limit=limit, **filters)
+
+    # SQLite cannot order or slice the parts of a compound query
+    branch_limit = limit if connection.features.supports_slicing_ordering_in_compound else None
+    sent = _branch(account, 'sent', limit=branch_limit, **filters)
+    received = _branch(account, 'received', limit=branch_limit, **filters)
+    if branch_limit is None:
+        sent, received = sent.order_by(), received.order_by()
+    merged = sent.union(received, all=True).order_by('-timestamp', '-id')
+    return merged[:limit] if limit is not None else merged
+
+
+def transaction_history(account, limit=None, direction='all', **filters):
+    """Up to ``limit`` history rows (all when None) in (timestamp, id) descending order
+
+    Each direction is read through its (sender|receiver, timestamp, id) index
+    and stops after ``limit`` rows; the two are merged with UNION ALL so the
+    page costs one query. ``filters`` are status, counterparty (phone or UPI
+    ID), since, until and cursor.
+    """
+    return list(_history_queryset(account, limit, direction, **filters))
+
+
+async def atransaction_history(account, limit=None, direction='all', **filters):
+    """transaction_history for async views"""
+    return [row async for row in _history_queryset(account, limit, direction, **filters)]
+
+
+REQUEST_SIDES = ('all', 'sent', 'received')
+
+
+def _requests_queryset(account, side, status=None, cursor=None, limit=None):
+    own, other = ('requester', 'requestee') if side == 'sent' else ('requestee', 'requester')
+    queryset = MoneyRequest.objects.filter(**{own: account})
+    if status:
+        queryset = queryset.filter(status=status)
+    if cursor:
+        queryset = queryset.filter(older_than('created_at', cursor))
+    queryset = queryset.values(
+        'id', f'{other}__user__upiName', f'{other}__user__phoneNumber',
+        'amount', 'message', 'status', 'created_at', 'updated_at'
+    ).order_by('-created_at', '-id')
+    return queryset[:limit] if limit is not None else queryset
+
+
+def money_requests(account, side, status=None, cursor=None, limit=None):
+    """Requests the account sent (or received), newest first, with the other party's details
+
+    Served by the (requester|requestee, -created_at, -id) indexes, or their
+    partial counterparts when status is 'pending'.
+    """
+    return list(_requests_queryset(account, side, status, cursor, limit))
+
+
+async def amoney_requests(account, side, status=None, cursor=None, limit=None):
+    """money_requests for async views"""
+    return [row async for row in _requests_queryset(account, side, status, cursor, limit)]
+
+
+def _pending(account):
+    return MoneyRequest.objects.filter(Q(requestee=account) | Q(requester=account), status='pending')
+
+
+def _pending_counts(account):
+    return {
+        'received': Count('id', filter=Q(requestee=account)),
+        'sent': Count('id', filter=Q(requester=account)),
+    }
+
+
+def pending_request_counts(account):
+    """Pending requests received and sent by the account, counted in one query"""
+    return _pending(account).aggregate(**_pending_counts(account))
+
+
+async def apending_request_counts(account):
+    return await _pending(account).aaggregate(**_pending_counts(account))
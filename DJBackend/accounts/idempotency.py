@@ -0,0 +1,146 @@
+"""Idempotency-Key support for money-moving endpoints.
+
+The first request with a given key runs the view inside a transaction that
+also inserts the key row. Its response is saved on that row and replayed for
+every retry. Concurrent duplicates block on the unique index until the first
+request commits, then replay its response instead of running the view again.
+Completed responses are also put in the Django cache, so most retries never
+reach the database.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class _RollBack(Exception):
+    """Aborts the key's transaction so a failed request can be retried with the same key"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def key_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60)
+
+
+def request_fingerprint(request):
+    """Hash of the request payload; a key reused with another payload is rejected"""
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_key(endpoint, key):
+    return f"idempotency:{endpoint}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _replay(stored, request_hash):
+    if stored['request_hash'] != request_hash:
+        return JsonResponse({
+            'error': f'{HEADER} was already used with a different request',
+            'status': 'error'
+        }, status=422)
+    response = JsonResponse(stored['body'], status=stored['status_code'])
+    response[REPLAY_HEADER] = 'true'
+    return response
+
+
+def _stored(record):
+    return {
+        'request_hash': record.request_hash,
+        'status_code': record.status_code,
+        'body': record.response_body,
+    }
+
+
+def idempotent(view):
+    """Deduplicate retries of ``view`` that carry the same Idempotency-Key header
+
+    Place it below @api_view. Requests without the header are unaffected.
+    Responses with a 5xx status are not stored, so the client may retry them.
+    """
+    endpoint = view.__name__
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse({
+                'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters',
+                'status': 'error'
+            }, status=400)
+
+        request_hash = request_fingerprint(request)
+        cache_key = _cache_key(endpoint, key)
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, request_hash)
+
+        expires_before = timezone.now() - timedelta(seconds=key_ttl())
+        # An expired key counts as unused even before purge_idempotency_keys removes it
+        IdempotencyKey.objects.filter(key=key, endpoint=endpoint, created_at__lt=expires_before).delete()
+
+        try:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        record = IdempotencyKey.objects.create(key=key, endpoint=endpoint, request_hash=request_hash)
+                except IntegrityError:
+                    # Another request holds this key; the insert waited for it to commit
+                    record = None
+
+                if record is None:
+                    existing = IdempotencyKey.objects.filter(key=key, endpoint=endpoint).first()
+                    if existing is None:
+                        return JsonResponse({
+                            'error': 'A request with this Idempotency-Key is still in progress',
+                            'status': 'error'
+                        }, status=409)
+                    stored = _stored(existing)
+                else:
+                    response = view(request, *args, **kwargs)
+                    if response.status_code >= 500:
+                        raise _RollBack(response)
+                    record.status_code = response.status_code
+                    record.response_body = json.loads(response.content)
+                    record.save(update_fields=['status_code', 'response_body'])
+                    stored = _stored(record)
+                    transaction.on_commit(lambda: cache.set(cache_key, stored, key_ttl()))
+                    return response
+        except _RollBack as rollback:
+            return rollback.response
+
+        cache.set(cache_key, stored, key_ttl())
+        return _replay(stored, request_hash)
+
+    return wrapper
+
+
+def purge_expired_keys(ttl_seconds=None, batch_size=1000):
+    """Delete stored keys older than the TTL in batches; returns how many were deleted"""
+    ttl_seconds = key_ttl() if ttl_seconds is None else ttl_seconds
+    expires_before = timezone.now() - timedelta(seconds=ttl_seconds)
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=expires_before)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from accounts.idempotency import key_ttl, purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL_SECONDS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=None, help='override the TTL in seconds')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ttl = key_ttl() if options['ttl'] is None else options['ttl']
+        deleted = purge_expired_keys(ttl, batch_size=options['batch_size'])
+        self.stdout.write(f"Deleted {deleted} idempotency keys older than {ttl}s")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.ledger import iter_drift, snapshot
+
+
+class Command(BaseCommand):
+    help = 'Recompute every balance from the ledger and report accounts that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='rows fetched per round trip')
+        parser.add_argument('--show', type=int, default=50, help='drifted accounts to list')
+        parser.add_argument('--fail-on-drift', action='store_true', help='exit with an error when any account drifted')
+
+    def handle(self, *args, **options):
+        stats = {}
+        drifted = 0
+        total_drift = 0
+        with snapshot():
+            for account_id, balance, ledger_total in iter_drift(options['chunk_size'], stats):
+                drifted += 1
+                total_drift += balance - ledger_total
+                if drifted <= options['show']:
+                    self.stdout.write(f"account {account_id}: balance {balance}, ledger {ledger_total}, drift {balance - ledger_total}")
+
+        self.stdout.write(f"Checked {stats['accounts']} accounts: {drifted} drifted, net drift {total_drift}")
+        if drifted and options['fail_on_drift']:
+            raise CommandError(f"{drifted} accounts do not match the ledger")
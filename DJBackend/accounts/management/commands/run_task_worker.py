@@ -0,0 +1,29 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import notifications  # noqa: F401  registers the tasks
+from accounts.tasks import RedisBroker, Worker
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the Redis task queue until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if settings.TASK_BROKER != 'redis':
+            raise CommandError("run_task_worker needs TASK_BROKER=redis; the 'thread' broker runs inside each web process")
+        worker = Worker(RedisBroker(settings.TASK_REDIS_URL, settings.TASK_DEAD_LETTER_LIMIT), options['threads']).start()
+        self.stdout.write(f"Task worker running with {options['threads']} threads")
+
+        stopped = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopped.set())
+        stopped.wait()
+        worker.stop()
+        for thread in worker.threads:
+            thread.join()
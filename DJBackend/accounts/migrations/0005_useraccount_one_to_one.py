@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_single_account_per_user(apps, schema_editor):
+    """Refuse to migrate while a user owns several accounts; they hold money and need a manual merge"""
+    UserAccount = apps.get_model('accounts', 'UserAccount')
+    duplicates = list(
+        UserAccount.objects.values('user_id').annotate(accounts=Count('id')).filter(accounts__gt=1)
+        .values_list('user_id', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Users with more than one UserAccount (first 20 user ids): {duplicates}. "
+            "Merge their balances and transactions into one account before migrating."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_single_account_per_user, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='useraccount',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='accounts.user'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_useraccount_one_to_one'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', '-timestamp', '-id'], name='txn_sender_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['receiver', '-timestamp', '-id'], name='txn_receiver_timestamp_idx'),
+        ),
+    ]
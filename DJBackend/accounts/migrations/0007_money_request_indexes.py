@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_transaction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(fields=['requester', '-created_at', '-id'], name='moneyreq_requester_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(fields=['requestee', '-created_at', '-id'], name='moneyreq_requestee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['requester', '-created_at', '-id'], name='moneyreq_requester_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneyrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['requestee', '-created_at', '-id'], name='moneyreq_requestee_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def open_existing_accounts(apps, schema_editor):
+    """Start every existing account's ledger with one opening entry equal to its current balance"""
+    UserAccount = apps.get_model('accounts', 'UserAccount')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+    batch = []
+    for account_id, balance in UserAccount.objects.order_by('id').values_list('id', 'balance').iterator(chunk_size=2000):
+        batch.append(LedgerEntry(account_id=account_id, entry_type='opening', amount=balance))
+        if len(batch) >= 2000:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.bulk_create(batch)
+
+
+def remove_opening_entries(apps, schema_editor):
+    apps.get_model('accounts', 'LedgerEntry').objects.filter(entry_type='opening').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_money_request_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('opening', 'Opening balance'), ('debit', 'Debit'), ('credit', 'Credit')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='accounts.useraccount')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='accounts.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'id'], name='ledger_account_idx')],
+            },
+        ),
+        migrations.RunPython(open_existing_accounts, remove_opening_entries),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:51
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Upper('upiName'), name='user_upiname_upper_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 
 # Create your models here.
 class User(models.Model):
@@ -6,8 +7,14 @@ class User(models.Model):
     upiName = models.CharField(max_length=100)
     upiMail=models.EmailField(max_length=254, unique=True)
 
+    class Meta:
+        # Case-insensitive name lookups (upiName__iexact) in accounts.contacts
+        indexes = [
+            models.Index(Upper('upiName'), name='user_upiname_upper_idx'),
+        ]
+
 class UserAccount(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.OneToOneField(User, on_delete=models.CASCADE)
     balance = models.DecimalField(max_digits=10, decimal_places=2, default=5000.00)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -22,9 +29,33 @@ class Transaction(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending')
     
+    class Meta:
+        # Keyset pagination of each side of a user's history (accounts.history)
+        indexes = [
+            models.Index(fields=['sender', '-timestamp', '-id'], name='txn_sender_timestamp_idx'),
+            models.Index(fields=['receiver', '-timestamp', '-id'], name='txn_receiver_timestamp_idx'),
+        ]
+    
     def __str__(self):
         return f"Transaction from {self.sender.user.upiName} to {self.receiver.user.upiName} - Amount: {self.amount} - Status: {self.status}"
 
+class LedgerEntry(models.Model):
+    """Append-only record of one balance change; an account's entries sum to its balance"""
+    account = models.ForeignKey(UserAccount, related_name='ledger_entries', on_delete=models.CASCADE)
+    transaction = models.ForeignKey(Transaction, related_name='ledger_entries', null=True, blank=True, on_delete=models.PROTECT)
+    entry_type = models.CharField(max_length=10, choices=[('opening', 'Opening balance'), ('debit', 'Debit'), ('credit', 'Credit')])
+    # Signed: debits are negative
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'id'], name='ledger_account_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.entry_type} {self.amount} on account {self.account_id}"
+
 class MoneyRequest(models.Model):
     requester = models.ForeignKey(UserAccount, related_name='sent_requests', on_delete=models.CASCADE)
     requestee = models.ForeignKey(UserAccount, related_name='received_requests', on_delete=models.CASCADE)
@@ -45,6 +76,34 @@ class MoneyRequest(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # Keyset pagination of each side of getMoneyRequests; the partial indexes keep
+        # pending lookups and the polled pending count small as history grows
+        indexes = [
+            models.Index(fields=['requester', '-created_at', '-id'], name='moneyreq_requester_created_idx'),
+            models.Index(fields=['requestee', '-created_at', '-id'], name='moneyreq_requestee_created_idx'),
+            models.Index(fields=['requester', '-created_at', '-id'], name='moneyreq_requester_pending_idx',
+                         condition=models.Q(status='pending')),
+            models.Index(fields=['requestee', '-created_at', '-id'], name='moneyreq_requestee_pending_idx',
+                         condition=models.Q(status='pending')),
+        ]
+    
+    def __str__(self):
+        return f"Request from {self.requester.user.upiName} to {self.requestee.user.upiName} - Amount: {self.amount} - Status: {self.status}"
+
+class IdempotencyKey(models.Model):
+    """Stored response for an Idempotency-Key, replayed when a client retries the same request"""
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=100)
+    request_hash = models.CharField(max_length=64)
+    # Filled in by the same transaction that inserts the row, so never seen empty
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'endpoint'], name='unique_idempotency_key_per_endpoint')
+        ]
     
     def __str__(self):
-        return f"Request from {self.requester.user.upiName} to {self.requestee.user.upiName} - Amount: {self.amount} - Status: {self.status}"
\ No newline at end of file
+        return f"{self.endpoint} {self.key} -> {self.status_code}"
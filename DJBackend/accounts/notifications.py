@@ -0,0 +1,30 @@
+"""SMS notifications for payments and money requests.
+
+Each one is queued with send_sms.delay_on_commit, so it goes out only if
+the surrounding transaction commits and the request never waits for it. A
+notification the queue cannot take is logged and dropped, never raised.
+"""
+from .otp import normalize_phone
+from .sms import send_sms
+
+
+def _notify(user, body):
+    send_sms.delay_on_commit(normalize_phone(user.phoneNumber), body)
+
+
+def payment_received(sender, receiver, amount):
+    _notify(receiver, f"You received ₹{amount} from {sender.upiName}")
+
+
+def money_requested(requester, requestee, amount, message=''):
+    body = f"{requester.upiName} requested ₹{amount} from you"
+    _notify(requestee, f"{body}: {message}" if message else body)
+
+
+def request_updated(money_request, new_status):
+    """Tell the other party that a request was approved, rejected or cancelled"""
+    requester, requestee = money_request.requester.user, money_request.requestee.user
+    if new_status == 'cancelled':
+        _notify(requestee, f"{requester.upiName} cancelled their request for ₹{money_request.amount}")
+    else:
+        _notify(requester, f"{requestee.upiName} {new_status} your request for ₹{money_request.amount}")
@@ -0,0 +1,119 @@
+"""One-time passwords with expiry, attempt limits and send rate limiting.
+
+State lives in a Django cache. With OTP_STORE='cache' that is the default
+cache, which is Redis when REDIS_URL is set, so every worker sees the same
+codes. OTP_STORE='memory' keeps a private per-process cache, for tests and
+single-process development.
+"""
+import hashlib
+import hmac
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f'Too many OTP requests, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+LOCKED = 'locked'
+
+
+def normalize_phone(phone):
+    """OTPs are keyed and sent in +91 format, whichever format the client used"""
+    phone = str(phone).strip()
+    if phone.startswith('+91'):
+        return phone
+    return '+91' + phone.lstrip('0')
+
+
+class OTPStore:
+    """Issues and checks OTPs; codes are stored only as keyed hashes"""
+
+    def __init__(self, cache, ttl=300, max_attempts=5, rate_limit=3, rate_window=600, digits=6):
+        self.cache = cache
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.digits = digits
+
+    def _hash(self, phone, otp):
+        return hmac.new(settings.SECRET_KEY.encode(), f'{phone}:{otp}'.encode(), hashlib.sha256).hexdigest()
+
+    def _check_rate(self, phone):
+        """Sliding window: at most rate_limit sends in any rate_window seconds
+
+        Each send claims one of rate_limit slots with cache.add, which is
+        atomic (SET NX on Redis), and the slot expires rate_window seconds
+        later. Concurrent sends can never claim the same slot, where reading
+        and rewriting a list of send times let them all pass.
+        """
+        keys = [f'otp:sends:{phone}:{slot}' for slot in range(self.rate_limit)]
+        now = time.time()
+        taken = self.cache.get_many(keys)
+        for key in keys:
+            if key not in taken and self.cache.add(key, now, self.rate_window):
+                return
+        # Every slot is held; the oldest one frees up first
+        sent = self.cache.get_many(keys).values()
+        oldest = min(sent, default=now - self.rate_window)
+        raise RateLimited(max(int(oldest + self.rate_window - now) + 1, 1))
+
+    def issue(self, phone):
+        """New code for the phone, replacing any earlier one; raises RateLimited"""
+        self._check_rate(phone)
+        otp = str(secrets.randbelow(10 ** self.digits)).zfill(self.digits)
+        self.cache.set(f'otp:code:{phone}', self._hash(phone, otp), self.ttl)
+        self.cache.set(f'otp:attempts:{phone}', 0, self.ttl)
+        return otp
+
+    def verify(self, phone, otp):
+        """VERIFIED, INVALID, EXPIRED or LOCKED; a verified code cannot be used again"""
+        code_key = f'otp:code:{phone}'
+        attempts_key = f'otp:attempts:{phone}'
+        expected = self.cache.get(code_key)
+        if expected is None:
+            return EXPIRED
+
+        try:
+            attempts = self.cache.incr(attempts_key)
+        except ValueError:
+            # The counter expired together with the code
+            return EXPIRED
+        if attempts > self.max_attempts:
+            self.cache.delete_many([code_key, attempts_key])
+            return LOCKED
+
+        if not hmac.compare_digest(expected, self._hash(phone, str(otp or ''))):
+            return INVALID
+        self.cache.delete_many([code_key, attempts_key])
+        return VERIFIED
+
+
+_memory_cache = None
+
+
+def get_otp_store():
+    global _memory_cache
+    if getattr(settings, 'OTP_STORE', 'cache') == 'memory':
+        if _memory_cache is None:
+            _memory_cache = LocMemCache('otp', {})
+        cache = _memory_cache
+    else:
+        cache = default_cache
+    return OTPStore(
+        cache,
+        ttl=settings.OTP_TTL_SECONDS,
+        max_attempts=settings.OTP_MAX_ATTEMPTS,
+        rate_limit=settings.OTP_RATE_LIMIT,
+        rate_window=settings.OTP_RATE_WINDOW_SECONDS,
+    )
@@ -0,0 +1,75 @@
+"""Keyset (cursor) pagination on (timestamp, id), newest first."""
+import base64
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidQuery(ValueError):
+    """A malformed cursor, limit or filter; answered with HTTP 400"""
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) of the last row of the previous page"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        parsed = parse_datetime(timestamp)
+        if parsed is None:
+            raise ValueError(timestamp)
+        return parsed, int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidQuery('Invalid cursor')
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidQuery('limit must be an integer')
+    if limit < 1:
+        raise InvalidQuery('limit must be positive')
+    return min(limit, maximum)
+
+
+def parse_time_bound(value, end_of_day=False):
+    """ISO datetime or date; a bare date means the start (or end) of that day"""
+    if value in (None, ''):
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise InvalidQuery(f'Invalid date: {value}')
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def older_than(field, cursor):
+    """Filter for the rows that follow the cursor in (field DESC, id DESC) order"""
+    timestamp, pk = cursor
+    return Q(**{f'{field}__lt': timestamp}) | Q(**{field: timestamp, 'id__lt': pk})
+
+
+def paginate(rows, limit, field):
+    """Split limit + 1 fetched rows into a page and the cursor for the next one"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[field], last['id'])
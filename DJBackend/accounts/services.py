@@ -0,0 +1,284 @@
+"""Account resolution and money movement shared by the accounts views."""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from . import contacts
+from .models import User, UserAccount, Transaction, LedgerEntry, MoneyRequest
+
+
+def resolve_account(**user_lookup):
+    """UserAccount, with its User, for a lookup such as phoneNumber=... in one joined query
+
+    Raises User.DoesNotExist when no such user exists and UserAccount.DoesNotExist
+    when the user has no account; telling the two apart costs a second query,
+    but only on the error path.
+    """
+    try:
+        return UserAccount.objects.select_related('user').get(
+            **{f'user__{field}': value for field, value in user_lookup.items()}
+        )
+    except UserAccount.DoesNotExist:
+        if not User.objects.filter(**user_lookup).exists():
+            raise User.DoesNotExist(f'No user with {user_lookup}')
+        raise
+
+
+async def aresolve_account(**user_lookup):
+    """resolve_account for async views"""
+    try:
+        return await UserAccount.objects.select_related('user').aget(
+            **{f'user__{field}': value for field, value in user_lookup.items()}
+        )
+    except UserAccount.DoesNotExist:
+        if not await User.objects.filter(**user_lookup).aexists():
+            raise User.DoesNotExist(f'No user with {user_lookup}')
+        raise
+
+
+def account_by_phone(phone_number):
+    return resolve_account(phoneNumber=phone_number)
+
+
+def account_by_upi(upi_id):
+    return resolve_account(upiMail=upi_id)
+
+
+async def aaccount_by_phone(phone_number):
+    return await aresolve_account(phoneNumber=phone_number)
+
+
+def resolve_recipients(phones=(), upi_ids=()):
+    """Accounts for many phone numbers and UPI IDs in one query
+
+    Returns (by_phone, by_upi) dicts; recipients without an account are absent.
+    """
+    accounts = UserAccount.objects.select_related('user').filter(
+        Q(user__phoneNumber__in=set(phones)) | Q(user__upiMail__in=set(upi_ids))
+    )
+    by_phone, by_upi = {}, {}
+    for account in accounts:
+        by_phone[account.user.phoneNumber] = account
+        by_upi[account.user.upiMail] = account
+    return by_phone, by_upi
+
+
+def open_account(user, balance=None):
+    """Create the user's account and its opening ledger entry together"""
+    with transaction.atomic():
+        account = UserAccount.objects.create(user=user) if balance is None else UserAccount.objects.create(user=user, balance=balance)
+        LedgerEntry.objects.create(account=account, entry_type='opening', amount=account.balance)
+    return account
+
+
+class TransferError(Exception):
+    """A transfer that cannot be made; ``status_code`` is the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class InsufficientBalance(TransferError):
+    def __init__(self, message='Insufficient balance'):
+        super().__init__(message, status_code=400)
+
+
+def transfer(sender_account_id, receiver_account_id, amount):
+    """Move ``amount`` between two accounts and record it, atomically
+
+    Both account rows are locked with SELECT ... FOR UPDATE in primary-key
+    order, so two opposite transfers between the same accounts queue up
+    instead of deadlocking. Balances are changed with F() expressions, and
+    the Transaction row and its debit and credit LedgerEntry rows are written
+    in the same database transaction, so a failure leaves no trace at all.
+    Runs as a savepoint when called inside an outer atomic block.
+    """
+    amount = Decimal(str(amount))
+    if amount <= 0:
+        raise TransferError('Amount must be greater than zero')
+    if sender_account_id == receiver_account_id:
+        raise TransferError('Cannot send money to the same account')
+
+    with transaction.atomic():
+        accounts = {
+            account.pk: account
+            for account in UserAccount.objects.select_for_update()
+            .filter(pk__in=[sender_account_id, receiver_account_id])
+            .order_by('pk')
+        }
+        if sender_account_id not in accounts:
+            raise TransferError('Sender account not found', status_code=404)
+        if receiver_account_id not in accounts:
+            raise TransferError('Receiver account not found', status_code=404)
+
+        # The row lock makes this read authoritative until commit
+        if accounts[sender_account_id].balance < amount:
+            raise InsufficientBalance()
+
+        now = timezone.now()
+        UserAccount.objects.filter(pk=sender_account_id).update(balance=F('balance') - amount, updated_at=now)
+        UserAccount.objects.filter(pk=receiver_account_id).update(balance=F('balance') + amount, updated_at=now)
+
+        record = Transaction.objects.create(
+            sender_id=sender_account_id,
+            receiver_id=receiver_account_id,
+            amount=amount,
+            status='completed'
+        )
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(account_id=sender_account_id, transaction=record, entry_type='debit', amount=-amount),
+            LedgerEntry(account_id=receiver_account_id, transaction=record, entry_type='credit', amount=amount),
+        ])
+        contacts.invalidate(sender_account_id, receiver_account_id)
+        return record
+
+
+MAX_BULK_ITEMS = 100
+
+
+class BulkFailed(TransferError):
+    """An all-or-nothing batch in which some item failed; nothing was written"""
+
+    def __init__(self, results, message='Some items failed; nothing was processed'):
+        super().__init__(message, status_code=400)
+        self.results = results
+
+
+def _item_error(own_account_id, account_id, amount):
+    if account_id is None:
+        return 'Recipient not found'
+    if amount is None or amount <= 0:
+        return 'Amount must be greater than zero'
+    if account_id == own_account_id:
+        return 'Cannot send money to the same account'
+    return None
+
+
+def _validate_batch(own_account_id, items, all_or_nothing):
+    """Per-item results (None where the item is valid), raising BulkFailed in all-or-nothing mode"""
+    if not items:
+        raise TransferError('No items to process')
+    if len(items) > MAX_BULK_ITEMS:
+        raise TransferError(f'At most {MAX_BULK_ITEMS} items per call')
+    results = [None] * len(items)
+    for index, (account_id, amount) in enumerate(items):
+        error = _item_error(own_account_id, account_id, amount)
+        if error:
+            results[index] = {'status': 'failed', 'error': error}
+    if all_or_nothing and any(results):
+        raise BulkFailed([result or {'status': 'not_processed'} for result in results])
+    return results
+
+
+def bulk_transfer(sender_account_id, payments, all_or_nothing=True):
+    """Pay many accounts from one, with a fixed number of queries whatever the batch size
+
+    ``payments`` are (receiver_account_id, amount) pairs, the receiver None
+    when it could not be resolved. All touched accounts are locked in
+    primary-key order, like ``transfer``. In all-or-nothing mode any invalid
+    item or a balance short of the total raises (BulkFailed or
+    InsufficientBalance) and nothing is written; in best-effort mode the
+    failing items are skipped, paying in list order until the balance runs
+    out. Returns one result per payment: ``{'status': 'completed',
+    'transaction': Transaction}`` or ``{'status': 'failed', 'error': ...}``.
+    """
+    payments = [(account_id, None if amount is None else Decimal(str(amount))) for account_id, amount in payments]
+    results = _validate_batch(sender_account_id, payments, all_or_nothing)
+
+    with transaction.atomic():
+        receiver_ids = {account_id for (account_id, _), result in zip(payments, results) if result is None}
+        accounts = {
+            account.pk: account
+            for account in UserAccount.objects.select_for_update()
+            .filter(pk__in=receiver_ids | {sender_account_id})
+            .order_by('pk')
+        }
+        if sender_account_id not in accounts:
+            raise TransferError('Sender account not found', status_code=404)
+
+        balance = accounts[sender_account_id].balance
+        total = sum(amount for (_, amount), result in zip(payments, results) if result is None)
+        if all_or_nothing and total > balance:
+            raise InsufficientBalance(f'Insufficient balance for {len(payments)} payments totalling {total}')
+
+        accepted = []
+        for index, ((account_id, amount), result) in enumerate(zip(payments, results)):
+            if result is not None:
+                continue
+            if amount > balance:
+                results[index] = {'status': 'failed', 'error': 'Insufficient balance'}
+                continue
+            balance -= amount
+            accepted.append(index)
+        if not accepted:
+            return results
+
+        credits = defaultdict(Decimal)
+        for index in accepted:
+            account_id, amount = payments[index]
+            credits[account_id] += amount
+
+        now = timezone.now()
+        UserAccount.objects.filter(pk=sender_account_id).update(
+            balance=F('balance') - sum(credits.values()), updated_at=now
+        )
+        UserAccount.objects.filter(pk__in=credits).update(
+            balance=F('balance') + Case(
+                *[When(pk=account_id, then=Value(amount)) for account_id, amount in credits.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            updated_at=now,
+        )
+
+        records = Transaction.objects.bulk_create([
+            Transaction(sender_id=sender_account_id, receiver_id=payments[index][0], amount=payments[index][1], status='completed')
+            for index in accepted
+        ])
+        LedgerEntry.objects.bulk_create([
+            entry
+            for record in records
+            for entry in (
+                LedgerEntry(account_id=sender_account_id, transaction=record, entry_type='debit', amount=-record.amount),
+                LedgerEntry(account_id=record.receiver_id, transaction=record, entry_type='credit', amount=record.amount),
+            )
+        ])
+        for index, record in zip(accepted, records):
+            results[index] = {'status': 'completed', 'transaction': record}
+        contacts.invalidate(sender_account_id, *credits)
+    return results
+
+
+def bulk_request(requester_account_id, requests, all_or_nothing=True):
+    """Create many money requests in one INSERT
+
+    ``requests`` are (requestee_account_id, amount, message) triples. Returns
+    one result per request, ``{'status': 'created', 'request': MoneyRequest}``
+    or ``{'status': 'failed', 'error': ...}``; in all-or-nothing mode any
+    invalid item raises BulkFailed instead.
+    """
+    requests = [
+        (account_id, None if amount is None else Decimal(str(amount)), message)
+        for account_id, amount, message in requests
+    ]
+    results = _validate_batch(requester_account_id, [item[:2] for item in requests], all_or_nothing)
+    accepted = [index for index, result in enumerate(results) if result is None]
+    created = MoneyRequest.objects.bulk_create([
+        MoneyRequest(
+            requester_id=requester_account_id,
+            requestee_id=requests[index][0],
+            amount=requests[index][1],
+            message=requests[index][2],
+            status='pending'
+        )
+        for index in accepted
+    ])
+    for index, money_request in zip(accepted, created):
+        results[index] = {'status': 'created', 'request': money_request}
+    if created:
+        contacts.invalidate(requester_account_id, *{money_request.requestee_id for money_request in created})
+    return results
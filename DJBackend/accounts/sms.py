@@ -0,0 +1,48 @@
+"""SMS backends and background delivery.
+
+SMS_BACKEND picks the backend class: TwilioSMSBackend in production,
+FakeSMSBackend to collect messages in memory for offline tests.
+"""
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .tasks import task
+
+
+class TwilioSMSBackend:
+    def __init__(self):
+        from twilio.rest import Client
+
+        self.client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+    def send(self, to, body):
+        self.client.messages.create(body=body, from_=settings.TWILIO_PHONE_NUMBER, to=to)
+
+
+class FakeSMSBackend:
+    """Keeps sent messages in ``outbox`` instead of sending them"""
+
+    outbox = []
+
+    def send(self, to, body):
+        self.outbox.append({'to': to, 'body': body})
+
+
+_backend = None
+_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _lock:
+        if _backend is None or type(_backend) is not import_string(settings.SMS_BACKEND):
+            _backend = import_string(settings.SMS_BACKEND)()
+        return _backend
+
+
+@task
+def send_sms(to, body):
+    """Send right away; use send_sms.delay or send_sms.delay_on_commit from views"""
+    get_backend().send(to, body)
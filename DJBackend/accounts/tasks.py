@@ -0,0 +1,310 @@
+"""Background tasks: SMS delivery and notifications, off the request path.
+
+TASK_BROKER picks where queued tasks wait:
+
+* ``thread`` (default): an in-process queue drained by TASK_WORKERS threads.
+* ``redis``: lists in Redis at TASK_REDIS_URL, shared by every process. Web
+  processes drain it with their own TASK_WORKERS threads, or set
+  TASK_WORKERS=0 and run ``manage.py run_task_worker`` separately.
+* ``eager``: run inline, for tests.
+
+``delay`` never raises: when the broker cannot take a task (Redis down, say)
+it is logged and counted as ``enqueue_failed`` and ``delay`` returns None. A
+view queues its notifications after the money has moved, so failing the
+request then would only invite the client to pay again.
+
+A task that raises is retried TASK_MAX_RETRIES times with exponential
+backoff, then moved to a capped dead-letter list. Arguments must be JSON
+serializable, since the Redis broker stores them as JSON.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+_registry = {}
+
+
+def task(func):
+    """Register ``func`` as a task and give it ``delay`` and ``delay_on_commit``"""
+    name = f'{func.__module__}.{func.__qualname__}'
+    _registry[name] = func
+    func.task_name = name
+    func.delay = partial(enqueue, name)
+    func.delay_on_commit = lambda *args, **kwargs: transaction.on_commit(partial(enqueue, name, *args, **kwargs))
+    return func
+
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 4)
+
+
+class TaskMetrics:
+    """Counters and recent latencies for the tasks this process enqueued or ran"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.counts = {'enqueued': 0, 'enqueue_failed': 0, 'succeeded': 0, 'retried': 0, 'dead': 0}
+        self.wait = deque(maxlen=window)
+        self.run = deque(maxlen=window)
+
+    def incr(self, counter):
+        with self._lock:
+            self.counts[counter] += 1
+
+    def record(self, wait, run):
+        with self._lock:
+            self.wait.append(wait)
+            self.run.append(run)
+
+    def snapshot(self):
+        with self._lock:
+            wait, run = list(self.wait), list(self.run)
+            counts = dict(self.counts)
+        return {
+            **counts,
+            'wait_seconds': {'p50': _percentile(wait, 0.5), 'p95': _percentile(wait, 0.95), 'max': max(wait, default=None)},
+            'run_seconds': {'p50': _percentile(run, 0.5), 'p95': _percentile(run, 0.95), 'max': max(run, default=None)},
+        }
+
+
+metrics = TaskMetrics()
+
+
+class EagerBroker:
+    """Runs each task as soon as it is put, retries included"""
+
+    def __init__(self, dead_letter_limit):
+        self.dead = deque(maxlen=dead_letter_limit)
+
+    def put(self, message, delay=0):
+        _execute(self, message)
+
+    def get(self, timeout):
+        return None
+
+    def depth(self):
+        return 0
+
+    def add_dead(self, message):
+        self.dead.appendleft(message)
+
+    def dead_letters(self, limit):
+        return list(self.dead)[:limit]
+
+
+class ThreadBroker(EagerBroker):
+    """In-process queue; retries wait on timers until their backoff is over"""
+
+    def __init__(self, dead_letter_limit):
+        super().__init__(dead_letter_limit)
+        self.ready = deque()
+        self.delayed = 0
+        self._cond = threading.Condition()
+
+    def put(self, message, delay=0):
+        if delay > 0:
+            with self._cond:
+                self.delayed += 1
+            timer = threading.Timer(delay, self._release, (message,))
+            timer.daemon = True
+            timer.start()
+            return
+        with self._cond:
+            self.ready.append(message)
+            self._cond.notify()
+
+    def _release(self, message):
+        with self._cond:
+            self.delayed -= 1
+        self.put(message)
+
+    def get(self, timeout):
+        with self._cond:
+            if not self.ready:
+                self._cond.wait(timeout)
+            return self.ready.popleft() if self.ready else None
+
+    def depth(self):
+        with self._cond:
+            return len(self.ready) + self.delayed
+
+
+class RedisBroker:
+    """Ready tasks in a Redis list, retries in a sorted set scored by due time"""
+
+    QUEUE = 'tasks:queue'
+    DELAYED = 'tasks:delayed'
+    DEAD = 'tasks:dead'
+
+    def __init__(self, url, dead_letter_limit):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.dead_letter_limit = dead_letter_limit
+
+    def put(self, message, delay=0):
+        payload = json.dumps(message)
+        if delay > 0:
+            self.redis.zadd(self.DELAYED, {payload: time.time() + delay})
+        else:
+            self.redis.lpush(self.QUEUE, payload)
+
+    def _promote_due(self):
+        for payload in self.redis.zrangebyscore(self.DELAYED, 0, time.time(), start=0, num=100):
+            # Only the worker whose ZREM succeeds requeues it
+            if self.redis.zrem(self.DELAYED, payload):
+                self.redis.lpush(self.QUEUE, payload)
+
+    def get(self, timeout):
+        self._promote_due()
+        item = self.redis.brpop(self.QUEUE, timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+    def depth(self):
+        return self.redis.llen(self.QUEUE) + self.redis.zcard(self.DELAYED)
+
+    def add_dead(self, message):
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.DEAD, json.dumps(message))
+        pipe.ltrim(self.DEAD, 0, self.dead_letter_limit - 1)
+        pipe.execute()
+
+    def dead_letters(self, limit):
+        return [json.loads(payload) for payload in self.redis.lrange(self.DEAD, 0, limit - 1)]
+
+
+def _resolve(name):
+    func = _registry.get(name)
+    if func is None:
+        # A worker that has not imported the task's module yet
+        func = import_string(name)
+    return func
+
+
+def _execute(broker, message):
+    started = time.time()
+    try:
+        _resolve(message['name'])(*message['args'], **message['kwargs'])
+    except Exception as e:
+        message['attempts'] += 1
+        message['error'] = f'{type(e).__name__}: {e}'
+        if message['attempts'] <= settings.TASK_MAX_RETRIES:
+            metrics.incr('retried')
+            broker.put(message, delay=settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (message['attempts'] - 1))
+        else:
+            metrics.incr('dead')
+            message['failed_at'] = time.time()
+            broker.add_dead(message)
+            print(f"Task {message['name']} failed {message['attempts']} times ({message['error']}), moved to dead letters")
+        return
+    finally:
+        metrics.record(started - message['enqueued_at'], time.time() - started)
+    metrics.incr('succeeded')
+
+
+class Worker:
+    """Threads that take tasks from the broker and run them"""
+
+    def __init__(self, broker, threads):
+        self.broker = broker
+        self.stopping = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._loop, name=f'task-worker-{i}', daemon=True)
+            for i in range(threads)
+        ]
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+    def _loop(self):
+        while not self.stopping.is_set():
+            try:
+                message = self.broker.get(timeout=1)
+            except Exception as e:
+                print(f"Task broker unavailable: {e}")
+                self.stopping.wait(1)
+                continue
+            if message is None:
+                continue
+            close_old_connections()
+            try:
+                _execute(self.broker, message)
+            finally:
+                close_old_connections()
+
+
+_broker = None
+_broker_key = None
+_worker = None
+_lock = threading.Lock()
+
+
+def get_broker():
+    """The broker for the current settings, starting this process's workers on first use"""
+    global _broker, _broker_key, _worker
+    key = (settings.TASK_BROKER, settings.TASK_REDIS_URL)
+    with _lock:
+        if _broker is None or _broker_key != key:
+            if _worker is not None:
+                _worker.stop()
+                _worker = None
+            if settings.TASK_BROKER == 'eager':
+                _broker = EagerBroker(settings.TASK_DEAD_LETTER_LIMIT)
+            elif settings.TASK_BROKER == 'redis':
+                _broker = RedisBroker(settings.TASK_REDIS_URL, settings.TASK_DEAD_LETTER_LIMIT)
+            else:
+                _broker = ThreadBroker(settings.TASK_DEAD_LETTER_LIMIT)
+            _broker_key = key
+            if settings.TASK_BROKER != 'eager' and settings.TASK_WORKERS > 0:
+                _worker = Worker(_broker, settings.TASK_WORKERS).start()
+        return _broker
+
+
+def enqueue(name, *args, **kwargs):
+    """Queue a task and return its id, or None when the broker is unavailable"""
+    message = {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'attempts': 0,
+        'enqueued_at': time.time(),
+    }
+    try:
+        get_broker().put(message)
+    except Exception as e:
+        metrics.incr('enqueue_failed')
+        print(f"Could not queue task {name}: {e}")
+        return None
+    metrics.incr('enqueued')
+    return message['id']
+
+
+def stats(dead_letters=10):
+    broker = get_broker()
+    return {
+        'broker': settings.TASK_BROKER,
+        'workers': settings.TASK_WORKERS if settings.TASK_BROKER != 'eager' else 0,
+        'depth': broker.depth(),
+        **metrics.snapshot(),
+        # Arguments stay out of the report; they can hold phone numbers and OTPs
+        'dead_letters': [
+            {field: message.get(field) for field in ('id', 'name', 'attempts', 'error', 'failed_at')}
+            for message in broker.dead_letters(dead_letters)
+        ],
+    }
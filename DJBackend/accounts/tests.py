@@ -1,3 +1,870 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import User, UserAccount, Transaction, MoneyRequest, IdempotencyKey, LedgerEntry
+from .ledger import iter_drift
+from . import contacts, otp, sms, tasks
+from .services import account_by_phone, account_by_upi, open_account, transfer, TransferError, InsufficientBalance
+
+
+# Notifications and OTPs go to FakeSMSBackend.outbox, inline, and sync views
+# run on the test's own database connection
+offline = override_settings(SMS_BACKEND='accounts.sms.FakeSMSBackend', TASK_BROKER='eager', SYNC_VIEW_THREADS=0)
+
+
+def make_account(index, balance='5000.00'):
+    user = User.objects.create(
+        phoneNumber=f'+9190000{index:05d}',
+        upiName=f'user{index}',
+        upiMail=f'user{index}@voiceupi'
+    )
+    return open_account(user, Decimal(balance))
+
+
+@offline
+class TransferServiceTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+
+    def assertBalances(self, alice, bob):
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal(alice))
+        self.assertEqual(self.bob.balance, Decimal(bob))
+
+    def test_transfer_moves_money_and_records_transaction(self):
+        record = transfer(self.alice.pk, self.bob.pk, Decimal('250.50'))
+
+        self.assertBalances('749.50', '450.50')
+        self.assertEqual(record.status, 'completed')
+        self.assertEqual(Transaction.objects.get().amount, Decimal('250.50'))
+
+    def test_insufficient_balance_changes_nothing(self):
+        with self.assertRaises(InsufficientBalance):
+            transfer(self.bob.pk, self.alice.pk, Decimal('200.01'))
+
+        self.assertBalances('1000.00', '200.00')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_rejects_invalid_transfers(self):
+        for sender, receiver, amount in [
+            (self.alice.pk, self.bob.pk, Decimal('0')),
+            (self.alice.pk, self.bob.pk, Decimal('-10')),
+            (self.alice.pk, self.alice.pk, Decimal('10')),
+        ]:
+            with self.assertRaises(TransferError):
+                transfer(sender, receiver, amount)
+
+        with self.assertRaises(TransferError) as error:
+            transfer(self.alice.pk, self.bob.pk + 1000, Decimal('10'))
+        self.assertEqual(error.exception.status_code, 404)
+        self.assertBalances('1000.00', '200.00')
+
+
+@offline
+class SendMoneyViewTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+
+    def test_send_money_phone(self):
+        response = self.client.post('/accounts/sendMoneyPhone/', {
+            'senderPhone': self.alice.user.phoneNumber,
+            'receiverPhone': self.bob.user.phoneNumber,
+            'amount': '100'
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('300.00'))
+
+    def test_send_money_id_insufficient_balance(self):
+        response = self.client.post('/accounts/sendMoneyId/', {
+            'senderPhone': self.bob.user.phoneNumber,
+            'receiverUpi': self.alice.user.upiMail,
+            'amount': '500'
+        }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Insufficient balance')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_request_is_only_approved_once(self):
+        money_request = MoneyRequest.objects.create(
+            requester=self.bob, requestee=self.alice, amount=Decimal('300.00'), status='pending'
+        )
+        payload = {
+            'requestId': money_request.id,
+            'status': 'approved',
+            'phoneNumber': self.alice.user.phoneNumber
+        }
+
+        first = self.client.post('/accounts/updateRequestStatus/', payload, content_type='application/json')
+        second = self.client.post('/accounts/updateRequestStatus/', payload, content_type='application/json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 400)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('500.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+@offline
+class BulkTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+        self.carol = make_account(3, '0.00')
+        sms.FakeSMSBackend.outbox.clear()
+
+    def post(self, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, content_type='application/json')
+
+    def balances(self):
+        return [account.balance for account in UserAccount.objects.order_by('pk')]
+
+    def test_bulk_send_pays_everyone(self):
+        response = self.post('/accounts/bulkSend/', {
+            'senderPhone': self.alice.user.phoneNumber,
+            'payments': [
+                {'phone': self.bob.user.phoneNumber, 'amount': '100'},
+                {'upi': self.carol.user.upiMail, 'amount': '250.50'},
+                {'phone': self.bob.user.phoneNumber, 'amount': '50'},
+            ]
+        })
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((body['status'], body['succeeded'], body['totalAmount']), ('success', 3, '400.50'))
+        self.assertEqual([row['status'] for row in body['results']], ['completed'] * 3)
+        self.assertEqual(self.balances(), [Decimal('599.50'), Decimal('350.00'), Decimal('250.50')])
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(list(iter_drift()), [])
+        self.assertEqual(len(sms.FakeSMSBackend.outbox), 3)
+
+    def test_all_or_nothing_writes_nothing_on_any_failure(self):
+        for payments, error in [
+            ([{'phone': self.bob.user.phoneNumber, 'amount': '100'}, {'phone': '+910000000000', 'amount': '5'}],
+             'Some items failed; nothing was processed'),
+            ([{'phone': self.bob.user.phoneNumber, 'amount': '600'}, {'phone': self.carol.user.phoneNumber, 'amount': '600'}],
+             'Insufficient balance for 2 payments totalling 1200'),
+        ]:
+            response = self.post('/accounts/bulkSend/', {'senderPhone': self.alice.user.phoneNumber, 'payments': payments})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['error'], error)
+
+        self.assertEqual(self.balances(), [Decimal('1000.00'), Decimal('200.00'), Decimal('0.00')])
+        self.assertFalse(Transaction.objects.exists())
+        self.assertEqual(sms.FakeSMSBackend.outbox, [])
+
+    def test_best_effort_skips_failing_items(self):
+        response = self.post('/accounts/bulkSend/', {
+            'senderPhone': self.alice.user.phoneNumber,
+            'mode': 'best_effort',
+            'payments': [
+                {'phone': self.bob.user.phoneNumber, 'amount': '700'},
+                {'phone': '+910000000000', 'amount': '5'},
+                {'phone': self.carol.user.phoneNumber, 'amount': '400'},
+                {'phone': self.alice.user.phoneNumber, 'amount': '1'},
+                {'phone': self.carol.user.phoneNumber, 'amount': '300'},
+            ]
+        })
+
+        body = response.json()
+        self.assertEqual((response.status_code, body['status']), (200, 'partial'))
+        self.assertEqual(
+            [row.get('error') for row in body['results']],
+            [None, 'Recipient not found', 'Insufficient balance', 'Cannot send money to the same account', None]
+        )
+        self.assertEqual(self.balances(), [Decimal('0.00'), Decimal('900.00'), Decimal('300.00')])
+
+    def test_bulk_request_with_one_amount_each(self):
+        response = self.post('/accounts/bulkRequest/', {
+            'requesterPhone': self.alice.user.phoneNumber,
+            'amount': '200',
+            'message': 'dinner',
+            'requests': [{'phone': self.bob.user.phoneNumber}, {'upi': self.carol.user.upiMail}]
+        })
+
+        body = response.json()
+        self.assertEqual((response.status_code, body['succeeded'], body['totalAmount']), (200, 2, '400'))
+        self.assertEqual(
+            list(MoneyRequest.objects.order_by('id').values_list('requestee', 'amount', 'message', 'status')),
+            [(self.bob.pk, Decimal('200'), 'dinner', 'pending'), (self.carol.pk, Decimal('200'), 'dinner', 'pending')]
+        )
+        self.assertEqual([row['requestId'] for row in body['results']], list(MoneyRequest.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(len(sms.FakeSMSBackend.outbox), 2)
+
+    def test_rejects_malformed_batches(self):
+        for data in [
+            {'payments': 'bob'},
+            {'payments': []},
+            {'payments': [{'phone': self.bob.user.phoneNumber, 'amount': '1'}], 'mode': 'sometimes'},
+        ]:
+            response = self.post('/accounts/bulkSend/', {'senderPhone': self.alice.user.phoneNumber, **data})
+            self.assertEqual(response.status_code, 400, data)
+
+
+@offline
+class RecipientResolutionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        contacts._indexes.clear()
+        self.alice = make_account(1)
+        self.sharma = self.named(make_account(2), 'Rahul Sharma')
+        self.verma = self.named(make_account(3), 'Rahul Verma')
+        self.priya = self.named(make_account(4), 'Priya Singh')
+        for amount in ('10', '20', '30'):
+            transfer(self.alice.pk, self.sharma.pk, Decimal(amount))
+        transfer(self.verma.pk, self.alice.pk, Decimal('5'))
+        MoneyRequest.objects.create(requester=self.priya, requestee=self.alice, amount=Decimal('15'))
+
+    def named(self, account, name):
+        User.objects.filter(pk=account.user_id).update(upiName=name)
+        account.user.refresh_from_db()
+        return account
+
+    def resolve(self, name):
+        response = self.client.get('/accounts/resolveRecipient/', {'phoneNumber': self.alice.user.phoneNumber, 'name': name})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_confident_matches_are_resolved(self):
+        for name, account in [('rahul sharma', self.sharma), ('Priya', self.priya), ('verm', self.verma)]:
+            with self.subTest(name=name):
+                resolved = self.resolve(name)['resolved']
+                self.assertIsNotNone(resolved)
+                self.assertEqual(resolved['phoneNumber'], account.user.phoneNumber)
+
+    def test_fuzzy_matches_are_only_suggested(self):
+        body = self.resolve('pria')
+        self.assertIsNone(body['resolved'])
+        self.assertEqual(body['candidates'][0]['upiName'], 'Priya Singh')
+
+    def test_ambiguous_names_are_ranked_but_not_resolved(self):
+        body = self.resolve('Rahul')
+        self.assertIsNone(body['resolved'])
+        self.assertEqual([c['upiName'] for c in body['candidates']], ['Rahul Sharma', 'Rahul Verma'])
+        self.assertEqual(body['candidates'][0]['interactions'], 3)
+
+    def test_strangers_are_offered_only_by_exact_name(self):
+        stranger = self.named(make_account(5), 'Arjun Rao')
+        self.assertEqual(self.resolve('arjun')['candidates'], [])
+
+        body = self.resolve('arjun rao')
+        self.assertIsNone(body['resolved'])
+        self.assertEqual([(c['phoneNumber'], c['source']) for c in body['candidates']], [(stranger.user.phoneNumber, 'directory')])
+
+    def test_new_counterparties_appear_after_commit(self):
+        arjun = self.named(make_account(5), 'Arjun Rao')
+        self.resolve('arjun')
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer(self.alice.pk, arjun.pk, Decimal('1'))
+        self.assertEqual(self.resolve('arjun')['resolved']['phoneNumber'], arjun.user.phoneNumber)
+
+    def test_warm_lookup_is_one_query(self):
+        self.resolve('rahul')
+        with self.assertNumQueries(1):
+            self.resolve('priya')
+
+    def test_requires_name(self):
+        response = self.client.get('/accounts/resolveRecipient/', {'phoneNumber': self.alice.user.phoneNumber})
+        self.assertEqual(response.status_code, 400)
+
+
+@offline
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+        self.payload = {
+            'senderPhone': self.alice.user.phoneNumber,
+            'receiverPhone': self.bob.user.phoneNumber,
+            'amount': '100'
+        }
+
+    def send(self, payload, key):
+        return self.client.post('/accounts/sendMoneyPhone/', payload, content_type='application/json',
+                                headers={'Idempotency-Key': key})
+
+    def test_retry_replays_first_response(self):
+        first = self.send(self.payload, 'key-1')
+        cache.clear()  # the stored row must be enough on its own
+        second = self.send(self.payload, 'key-1')
+        third = self.send(self.payload, 'key-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(third.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('300.00'))
+
+    def test_client_errors_are_replayed_too(self):
+        payload = dict(self.payload, amount='5000')
+        first = self.send(payload, 'key-2')
+        self.alice.balance = Decimal('9000.00')
+        self.alice.save()
+        second = self.send(payload, 'key-2')
+
+        self.assertEqual(first.status_code, 400)
+        self.assertEqual(second.status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_key_reused_with_other_payload_is_rejected(self):
+        self.send(self.payload, 'key-3')
+        response = self.send(dict(self.payload, amount='150'), 'key-3')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_without_key_every_request_runs(self):
+        for _ in range(2):
+            self.client.post('/accounts/sendMoneyPhone/', self.payload, content_type='application/json')
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_expired_keys_are_purged_and_reusable(self):
+        self.send(self.payload, 'key-4')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        cache.clear()
+        self.send(self.payload, 'key-4')
+        self.assertEqual(Transaction.objects.count(), 2)
+
+
+@offline
+class TransactionHistoryTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '1000.00')
+        self.carol = make_account(3, '1000.00')
+        for index in range(1, 8):
+            transfer(self.alice.pk, self.bob.pk, Decimal(index))
+            transfer(self.carol.pk, self.alice.pk, Decimal(index * 10))
+        Transaction.objects.filter(amount=Decimal('3')).update(status='failed')
+
+    def history(self, **params):
+        return self.client.get('/accounts/transactionHistory/', dict(phoneNumber=self.alice.user.phoneNumber, **params))
+
+    def test_pages_cover_history_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            body = self.history(limit=4, **({'cursor': cursor} if cursor else {})).json()
+            seen.extend(body['transactions'])
+            cursor = body['nextCursor']
+            self.assertEqual(body['hasMore'], cursor is not None)
+            if cursor is None:
+                break
+
+        expected = list(Transaction.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in seen], expected)
+
+    def test_rows_carry_direction_and_counterparty(self):
+        newest = self.history(limit=1).json()['transactions'][0]
+
+        self.assertEqual(newest['direction'], 'received')
+        self.assertEqual(newest['amount'], '70.00')
+        self.assertEqual(newest['counterparty'], {
+            'name': 'user3', 'phoneNumber': self.carol.user.phoneNumber, 'upiId': self.carol.user.upiMail
+        })
+
+    def test_filters(self):
+        sent = self.history(direction='sent', limit=100).json()['transactions']
+        self.assertEqual(len(sent), 7)
+        self.assertTrue(all(row['counterparty']['name'] == 'user2' for row in sent))
+
+        by_upi = self.history(counterparty=self.carol.user.upiMail, limit=100).json()['transactions']
+        self.assertEqual(len(by_upi), 7)
+
+        failed = self.history(status='failed').json()['transactions']
+        self.assertEqual([row['amount'] for row in failed], ['3.00'])
+
+        self.assertEqual(self.history(since='2000-01-01', until='2000-12-31').json()['transactions'], [])
+
+    def test_invalid_parameters(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'limit': 'many'}, {'direction': 'sideways'}, {'since': 'yesterday'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.history(**params).status_code, 400)
+
+    def test_legacy_endpoint_keeps_its_shape(self):
+        body = self.client.get('/accounts/getTransactions/', {'phoneNumber': self.alice.user.phoneNumber}).json()
+
+        self.assertEqual(len(body['transactions']['sent']), 7)
+        self.assertEqual(body['transactions']['received'][0]['sender__user__upiName'], 'user3')
+
+
+@offline
+class MoneyRequestListTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1)
+        self.bob = make_account(2)
+        for index in range(1, 6):
+            MoneyRequest.objects.create(requester=self.alice, requestee=self.bob, amount=Decimal(index))
+            MoneyRequest.objects.create(requester=self.bob, requestee=self.alice, amount=Decimal(index * 10))
+        MoneyRequest.objects.filter(amount__in=[Decimal('1'), Decimal('10'), Decimal('20')]).update(status='rejected')
+
+    def requests(self, **params):
+        return self.client.get('/accounts/getMoneyRequests/', dict(phoneNumber=self.alice.user.phoneNumber, **params))
+
+    def test_without_paging_returns_everything(self):
+        body = self.requests().json()
+
+        self.assertEqual(len(body['sentRequests']), 5)
+        self.assertEqual(len(body['receivedRequests']), 5)
+        self.assertNotIn('nextSentCursor', body)
+
+    def test_each_side_pages_with_its_own_cursor(self):
+        seen, cursor = [], None
+        while True:
+            params = {'side': 'received', 'limit': 2}
+            if cursor:
+                params['receivedCursor'] = cursor
+            body = self.requests(**params).json()
+            self.assertNotIn('sentRequests', body)
+            seen.extend(row['amount'] for row in body['receivedRequests'])
+            cursor = body['nextReceivedCursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, ['50.00', '40.00', '30.00', '20.00', '10.00'])
+
+    def test_status_filter_and_pending_count(self):
+        pending = self.requests(status='pending').json()
+        self.assertEqual([row['amount'] for row in pending['sentRequests']], ['5.00', '4.00', '3.00', '2.00'])
+        self.assertEqual(len(pending['receivedRequests']), 3)
+
+        counts = self.client.get('/accounts/pendingRequestCount/', {'phoneNumber': self.alice.user.phoneNumber}).json()
+        self.assertEqual((counts['received'], counts['sent']), (3, 4))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.requests(side='both').status_code, 400)
+        self.assertEqual(self.requests(sentCursor='###').status_code, 400)
+
+
+@offline
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command('reconcile_ledger', *args, stdout=out)
+        return out.getvalue()
+
+    def test_transfer_writes_balanced_entries(self):
+        record = transfer(self.alice.pk, self.bob.pk, Decimal('75.25'))
+
+        entries = {entry.entry_type: entry for entry in record.ledger_entries.all()}
+        self.assertEqual(entries['debit'].account_id, self.alice.pk)
+        self.assertEqual(entries['debit'].amount, Decimal('-75.25'))
+        self.assertEqual(entries['credit'].account_id, self.bob.pk)
+        self.assertEqual(entries['credit'].amount, Decimal('75.25'))
+
+    def test_failed_transfer_writes_no_entries(self):
+        with self.assertRaises(InsufficientBalance):
+            transfer(self.bob.pk, self.alice.pk, Decimal('500'))
+        self.assertFalse(LedgerEntry.objects.exclude(entry_type='opening').exists())
+
+    def test_signup_opens_ledger(self):
+        self.client.post('/accounts/signup/', {'upiName': 'Dave', 'phoneNumber': '+919811111111'},
+                         content_type='application/json')
+
+        account = account_by_phone('+919811111111')
+        self.assertEqual(account.ledger_entries.get().amount, account.balance)
+
+    def test_reconcile_reports_drift(self):
+        for amount in ('10', '20', '30'):
+            transfer(self.alice.pk, self.bob.pk, Decimal(amount))
+            transfer(self.bob.pk, self.alice.pk, Decimal(amount) / 2)
+        self.assertEqual(list(iter_drift(chunk_size=2)), [])
+        self.assertIn('Checked 2 accounts: 0 drifted', self.reconcile('--chunk-size', '2'))
+
+        UserAccount.objects.filter(pk=self.bob.pk).update(balance=Decimal('1.00'))
+        self.assertEqual(list(iter_drift(chunk_size=2)), [(self.bob.pk, Decimal('1.00'), Decimal('230.00'))])
+        with self.assertRaises(CommandError):
+            self.reconcile('--fail-on-drift')
+
+
+@offline
+@override_settings(OTP_STORE='memory', OTP_MAX_ATTEMPTS=3, OTP_RATE_LIMIT=3, OTP_RATE_WINDOW_SECONDS=600)
+class OTPTests(TestCase):
+    def setUp(self):
+        otp.get_otp_store().cache.clear()
+        sms.FakeSMSBackend.outbox.clear()
+
+    def send(self, phone='9876543210'):
+        return self.client.get('/accounts/send_otp/', {'phone': phone})
+
+    def verify(self, code, phone='9876543210'):
+        return self.client.get('/accounts/verify_otp/', {'phone': phone, 'otp': code}).json()
+
+    def last_code(self):
+        return sms.FakeSMSBackend.outbox[-1]['body'].rsplit(' ', 1)[-1]
+
+    def test_code_verifies_once_in_either_phone_format(self):
+        self.assertEqual(self.send().status_code, 200)
+        self.assertEqual(sms.FakeSMSBackend.outbox[-1]['to'], '+919876543210')
+        code = self.last_code()
+
+        self.assertEqual(self.verify(code, phone='+919876543210')['status'], 'Verified')
+        self.assertEqual(self.verify(code), {'status': 'Failed', 'reason': 'expired'})
+
+    def test_attempts_are_limited(self):
+        self.send()
+        code = self.last_code()
+        wrong = '000000' if code != '000000' else '111111'
+
+        for _ in range(3):
+            self.assertEqual(self.verify(wrong)['reason'], 'invalid')
+        self.assertEqual(self.verify(code)['reason'], 'locked')
+
+    def test_sends_are_rate_limited_in_a_sliding_window(self):
+        with mock.patch('accounts.otp.time.time', return_value=1000.0):
+            for _ in range(3):
+                self.assertEqual(self.send().status_code, 200)
+            limited = self.send()
+        self.assertEqual(limited.status_code, 429)
+        self.assertEqual(limited['Retry-After'], '601')
+
+        with mock.patch('accounts.otp.time.time', return_value=1601.0):
+            self.assertEqual(self.send().status_code, 200)
+
+    def test_concurrent_sends_cannot_exceed_the_limit(self):
+        store = otp.get_otp_store()
+        barrier = threading.Barrier(12)
+        cache_get, cache_get_many = store.cache.get, store.cache.get_many
+
+        def slow(read):
+            # Widen the gap between reading the send history and writing it back
+            def wrapper(*args, **kwargs):
+                value = read(*args, **kwargs)
+                time.sleep(0.01)
+                return value
+            return wrapper
+
+        def issue(_):
+            barrier.wait()
+            try:
+                return store.issue('+919876543210')
+            except otp.RateLimited:
+                return None
+
+        with mock.patch.object(store.cache, 'get', slow(cache_get)), \
+                mock.patch.object(store.cache, 'get_many', slow(cache_get_many)), \
+                ThreadPoolExecutor(12) as pool:
+            codes = [code for code in pool.map(issue, range(12)) if code is not None]
+        self.assertEqual(len(codes), 3)
+
+    def test_codes_are_not_stored_in_clear(self):
+        code = otp.get_otp_store().issue('+919876543210')
+        self.assertNotEqual(otp.get_otp_store().cache.get('otp:code:+919876543210'), code)
+
+
+failures = []
+
+
+@tasks.task
+def flaky(times):
+    """Fails ``times`` times, then succeeds"""
+    failures.append(times)
+    if len(failures) <= times:
+        raise RuntimeError('provider down')
+
+
+@offline
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        failures.clear()
+        sms.FakeSMSBackend.outbox.clear()
+
+    def test_failing_task_is_retried(self):
+        flaky.delay(2)
+        self.assertEqual(len(failures), 3)
+
+    @override_settings(TASK_MAX_RETRIES=1)
+    def test_exhausted_task_goes_to_dead_letters(self):
+        flaky.delay(5)
+        self.assertEqual(len(failures), 2)
+
+        report = self.client.get('/accounts/taskMetrics/').json()['tasks']
+        dead = report['dead_letters'][0]
+        self.assertEqual((dead['name'], dead['attempts']), (flaky.task_name, 2))
+        self.assertEqual(dead['error'], 'RuntimeError: provider down')
+        self.assertNotIn('args', dead)
+
+    @override_settings(TASK_BROKER='thread', TASK_WORKERS=1)
+    def test_thread_broker_runs_tasks_in_the_background(self):
+        sms.send_sms.delay('+919876543210', 'hello')
+        for _ in range(100):
+            if sms.FakeSMSBackend.outbox:
+                break
+            time.sleep(0.05)
+        self.assertEqual(sms.FakeSMSBackend.outbox, [{'to': '+919876543210', 'body': 'hello'}])
+        self.assertEqual(tasks.get_broker().depth(), 0)
+
+
+@offline
+class NotificationTests(TestCase):
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+        sms.FakeSMSBackend.outbox.clear()
+
+    def post(self, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, content_type='application/json')
+
+    def test_receiver_is_told_about_payment(self):
+        self.post('/accounts/sendMoneyPhone/', {
+            'senderPhone': self.alice.user.phoneNumber,
+            'receiverPhone': self.bob.user.phoneNumber,
+            'amount': '100'
+        })
+        self.assertEqual(sms.FakeSMSBackend.outbox, [
+            {'to': self.bob.user.phoneNumber, 'body': 'You received ₹100 from user1'}
+        ])
+
+    def test_failed_transfer_sends_nothing(self):
+        response = self.post('/accounts/sendMoneyPhone/', {
+            'senderPhone': self.bob.user.phoneNumber,
+            'receiverPhone': self.alice.user.phoneNumber,
+            'amount': '500'
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sms.FakeSMSBackend.outbox, [])
+
+    def test_broker_outage_does_not_fail_a_committed_transfer(self):
+        failed = tasks.metrics.counts['enqueue_failed']
+        with mock.patch.object(tasks.EagerBroker, 'put', side_effect=ConnectionError('redis down')):
+            response = self.post('/accounts/sendMoneyPhone/', {
+                'senderPhone': self.alice.user.phoneNumber,
+                'receiverPhone': self.bob.user.phoneNumber,
+                'amount': '100'
+            })
+            otp_response = self.client.get('/accounts/send_otp/', {'phone': self.alice.user.phoneNumber})
+        self.assertEqual(response.json()['status'], 'success')
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('300.00'))
+        self.assertEqual(otp_response.status_code, 503)
+        self.assertEqual(tasks.metrics.counts['enqueue_failed'], failed + 2)
+        self.assertEqual(sms.FakeSMSBackend.outbox, [])
+
+    def test_request_lifecycle_notifies_the_other_party(self):
+        request_id = self.post('/accounts/createMoneyRequest/', {
+            'requesterPhone': self.alice.user.phoneNumber,
+            'requesteePhone': self.bob.user.phoneNumber,
+            'amount': '50',
+            'message': 'lunch'
+        }).json()['requestId']
+        self.post('/accounts/updateRequestStatus/', {
+            'requestId': request_id,
+            'status': 'approved',
+            'phoneNumber': self.bob.user.phoneNumber
+        })
+        self.assertEqual(sms.FakeSMSBackend.outbox, [
+            {'to': self.bob.user.phoneNumber, 'body': 'user1 requested ₹50 from you: lunch'},
+            {'to': self.alice.user.phoneNumber, 'body': 'user2 approved your request for ₹50.00'},
+        ])
+
+
+@override_settings(SYNC_VIEW_THREADS=2)
+@offline
+class ThreadPoolViewTests(TransactionTestCase):
+    def test_money_views_run_on_the_pool(self):
+        alice, bob = make_account(1, '1000.00'), make_account(2, '200.00')
+        seen = []
+        original = transfer
+
+        def spy(*args):
+            seen.append(threading.current_thread().name)
+            return original(*args)
+
+        with mock.patch('accounts.views.transfer', spy):
+            response = self.client.post('/accounts/sendMoneyPhone/', {
+                'senderPhone': alice.user.phoneNumber,
+                'receiverPhone': bob.user.phoneNumber,
+                'amount': '100'
+            }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(seen[0].startswith('sync-view'), seen)
+        bob.refresh_from_db()
+        self.assertEqual(bob.balance, Decimal('300.00'))
+
+    def test_read_views_are_async(self):
+        from . import views
+
+        for view in (views.getBalance, views.getProfile, views.searchNumber, views.searchByUpiId,
+                     views.checkHasAccount, views.getTransactionHistory, views.getMoneyRequests,
+                     views.getPendingRequestCount, views.sendMoneyPhone):
+            self.assertTrue(iscoroutinefunction(view), view.__name__)
+        self.assertTrue(views.sendMoneyId.csrf_exempt)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'row-level locking needs PostgreSQL')
+@offline
+class ConcurrentTransferTests(TransactionTestCase):
+    """Many parallel transfers between a few accounts must conserve money"""
+
+    ACCOUNTS = 8
+    TRANSFERS = 400
+    WORKERS = 16
+
+    def test_parallel_transfers_conserve_money(self):
+        accounts = [make_account(index, '1000.00') for index in range(self.ACCOUNTS)]
+        account_ids = [account.pk for account in accounts]
+        total_before = UserAccount.objects.aggregate(total=Sum('balance'))['total']
+
+        rng = random.Random(1234)
+        jobs = [(rng.sample(account_ids, 2), Decimal(rng.randint(1, 400))) for _ in range(self.TRANSFERS)]
+
+        def run(job):
+            (sender_id, receiver_id), amount = job
+            try:
+                transfer(sender_id, receiver_id, amount)
+                return True
+            except InsufficientBalance:
+                return False
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            completed = sum(pool.map(run, jobs))
+
+        self.assertEqual(UserAccount.objects.aggregate(total=Sum('balance'))['total'], total_before)
+        self.assertEqual(list(iter_drift()), [])
+        self.assertFalse(UserAccount.objects.filter(balance__lt=0).exists())
+        self.assertEqual(Transaction.objects.count(), completed)
+
+        # Every balance is explained by its ledger rows
+        for account in UserAccount.objects.all():
+            sent = Transaction.objects.filter(sender=account).aggregate(total=Sum('amount'))['total'] or 0
+            received = Transaction.objects.filter(receiver=account).aggregate(total=Sum('amount'))['total'] or 0
+            self.assertEqual(account.balance, Decimal('1000.00') - sent + received)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'blocking on the unique index needs PostgreSQL')
+@offline
+class ConcurrentIdempotencyTests(TransactionTestCase):
+    def test_concurrent_duplicates_execute_once(self):
+        alice = make_account(1, '1000.00')
+        bob = make_account(2, '0.00')
+        payload = {'senderPhone': alice.user.phoneNumber, 'receiverPhone': bob.user.phoneNumber, 'amount': '10'}
+
+        def send(_):
+            try:
+                response = Client().post('/accounts/sendMoneyPhone/', payload, content_type='application/json',
+                                         headers={'Idempotency-Key': 'same-key'})
+                return response.status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(send, range(16)))
+
+        self.assertEqual(statuses, [200] * 16)
+        self.assertEqual(Transaction.objects.count(), 1)
+        bob.refresh_from_db()
+        self.assertEqual(bob.balance, Decimal('10.00'))
+
+
+@offline
+class QueryCountTests(TestCase):
+    """Each endpoint runs a fixed number of queries, independent of the data"""
+
+    def setUp(self):
+        self.alice = make_account(1, '1000.00')
+        self.bob = make_account(2, '200.00')
+        for amount in ('10', '20', '30'):
+            transfer(self.alice.pk, self.bob.pk, Decimal(amount))
+            MoneyRequest.objects.create(requester=self.alice, requestee=self.bob, amount=Decimal(amount))
+        self.phone = self.alice.user.phoneNumber
+
+    def test_account_resolution_is_one_query(self):
+        with self.assertNumQueries(1):
+            account = account_by_phone(self.phone)
+            self.assertEqual(account.user.upiName, 'user1')
+        with self.assertNumQueries(1):
+            account_by_upi(self.bob.user.upiMail).user.phoneNumber
+
+    def test_read_endpoints(self):
+        for expected, method, url, data in [
+            (1, 'get', '/accounts/getBalance/', {'phoneNumber': self.phone}),
+            (1, 'get', '/accounts/checkHasAccount/', {'phoneNumber': self.phone}),
+            (1, 'get', '/accounts/getProfile/', {'phoneNumber': self.phone}),
+            (2, 'post', '/accounts/getTransactions/', {'phoneNumber': self.phone}),
+            (2, 'get', '/accounts/transactionHistory/', {'phoneNumber': self.phone}),
+            (3, 'get', '/accounts/getMoneyRequests/', {'phoneNumber': self.phone}),
+            (3, 'get', '/accounts/getMoneyRequests/', {'phoneNumber': self.phone, 'status': 'pending', 'limit': 2}),
+            (2, 'get', '/accounts/pendingRequestCount/', {'phoneNumber': self.phone}),
+        ]:
+            with self.subTest(url=url), self.assertNumQueries(expected):
+                if method == 'get':
+                    response = self.client.get(url, data)
+                else:
+                    response = self.client.post(url, data, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+
+    def test_write_endpoints(self):
+        # Inside TestCase every atomic block adds a SAVEPOINT and a RELEASE;
+        # a transfer is lock, two balance updates, the Transaction and its ledger entries
+        for expected, url, data in [
+            (9, '/accounts/sendMoneyPhone/', {
+                'senderPhone': self.phone, 'receiverPhone': self.bob.user.phoneNumber, 'amount': '5'}),
+            (9, '/accounts/sendMoneyId/', {
+                'senderPhone': self.phone, 'receiverUpi': self.bob.user.upiMail, 'amount': '5'}),
+            (3, '/accounts/createMoneyRequest/', {
+                'requesterPhone': self.phone, 'requesteePhone': self.bob.user.phoneNumber, 'amount': '5'}),
+            (3, '/accounts/createMoneyRequestByUpi/', {
+                'requesterPhone': self.phone, 'requesteeUpi': self.bob.user.upiMail, 'amount': '5'}),
+        ]:
+            with self.subTest(url=url), self.assertNumQueries(expected):
+                response = self.client.post(url, data, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+
+    def test_bulk_endpoints_do_not_grow_with_the_batch(self):
+        carol = make_account(3, '0.00')
+        recipients = [self.bob.user.phoneNumber, carol.user.phoneNumber]
+        for url, key, owner in [('/accounts/bulkSend/', 'payments', 'senderPhone'),
+                                ('/accounts/bulkRequest/', 'requests', 'requesterPhone')]:
+            for size, expected in [(1, 9 if key == 'payments' else 3), (4, 9 if key == 'payments' else 3)]:
+                data = {owner: self.phone, 'amount': '1', key: [{'phone': recipients[i % 2]} for i in range(size)]}
+                with self.subTest(url=url, size=size), self.assertNumQueries(expected):
+                    response = self.client.post(url, data, content_type='application/json')
+                    self.assertEqual(response.status_code, 200)
+
+    def test_update_request_status(self):
+        approve, reject = MoneyRequest.objects.filter(requestee=self.bob)[:2]
+        for expected, money_request, new_status in [(12, approve, 'approved'), (5, reject, 'rejected')]:
+            with self.subTest(status=new_status), self.assertNumQueries(expected):
+                response = self.client.post('/accounts/updateRequestStatus/', {
+                    'requestId': money_request.id,
+                    'status': new_status,
+                    'phoneNumber': self.bob.user.phoneNumber
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+
+    def test_one_account_per_user(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserAccount.objects.create(user=self.alice.user)
@@ -0,0 +1,51 @@
+"""A bounded thread pool for the synchronous views when served over ASGI.
+
+Under ASGI, Django runs each sync view on a thread of its own. Blocking
+views wrapped with ``in_thread_pool`` share SYNC_VIEW_THREADS threads
+instead. That bounds how many money-moving requests hold a database
+connection at once, and the event loop stays free for the async read
+views. SYNC_VIEW_THREADS=0 keeps Django's default, which runs the view
+on the request's own thread (and, in tests, on the test's connection).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.SYNC_VIEW_THREADS, thread_name_prefix='sync-view')
+        return _executor
+
+
+def _with_fresh_connection(view):
+    """Pool threads outlive requests, so apply CONN_MAX_AGE and drop broken connections around each call"""
+    @wraps(view)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return run
+
+
+def in_thread_pool(view):
+    run = _with_fresh_connection(view)
+
+    # wraps() also copies csrf_exempt and the other view attributes
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if settings.SYNC_VIEW_THREADS <= 0:
+            return await sync_to_async(view)(request, *args, **kwargs)
+        return await sync_to_async(run, thread_sensitive=False, executor=get_executor())(request, *args, **kwargs)
+    return wrapper
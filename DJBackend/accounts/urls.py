@@ -1,4 +1,4 @@
-from .views import SignUp, send_otp, verify_otp,searchNumber,checkHasAccount,searchByUpiId,sendMoneyPhone,getProfile, getTransactions, getBalance, sendMoneyId, createMoneyRequest, createMoneyRequestByUpi, getMoneyRequests, updateRequestStatus
+from .views import SignUp, send_otp, verify_otp,searchNumber,checkHasAccount,searchByUpiId,sendMoneyPhone,getProfile, getTransactions, getTransactionHistory, getBalance, sendMoneyId, createMoneyRequest, createMoneyRequestByUpi, getMoneyRequests, getPendingRequestCount, updateRequestStatus, getTaskMetrics, bulkSend, bulkRequest, resolveRecipient
 from django.urls import path
 
 urlpatterns = [
@@ -7,14 +7,20 @@ urlpatterns = [
     path('verify_otp/', verify_otp, name='verify_otp'),
     path('searchPhonenumber/', searchNumber, name='searchPhoneNumber'),
     path('searchByUpiId/', searchByUpiId, name='searchByUpiId'),
+    path('resolveRecipient/', resolveRecipient, name='resolveRecipient'),
     path('getProfile/', getProfile, name='getProfile'),
     path('getBalance/', getBalance, name='getBalance'),
     path('sendMoneyId/',sendMoneyId,name='sendMoneyId'),
     path('getTransactions/',getTransactions,name='getTransactions'),
+    path('transactionHistory/', getTransactionHistory, name='transactionHistory'),
     path('sendMoneyPhone/',sendMoneyPhone,name='sendMoneyPhone'),
+    path('bulkSend/', bulkSend, name='bulkSend'),
+    path('bulkRequest/', bulkRequest, name='bulkRequest'),
     path('checkHasAccount/', checkHasAccount, name='checkAccount'),
     path('createMoneyRequest/', createMoneyRequest, name='createMoneyRequest'),
     path('createMoneyRequestByUpi/', createMoneyRequestByUpi, name='createMoneyRequestByUpi'),
     path('getMoneyRequests/', getMoneyRequests, name='getMoneyRequests'),
+    path('pendingRequestCount/', getPendingRequestCount, name='pendingRequestCount'),
     path('updateRequestStatus/', updateRequestStatus, name='updateRequestStatus'),
+    path('taskMetrics/', getTaskMetrics, name='taskMetrics'),
 ]
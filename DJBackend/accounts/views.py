@@ -1,41 +1,55 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from twilio.rest import Client
-from django.conf import settings
-import random
-from decimal import Decimal
+from django.views.decorators.http import require_GET
+from decimal import Decimal, InvalidOperation
 from rest_framework.decorators import api_view
 from .models import User
-from .models import UserAccount,Transaction, MoneyRequest
+from .models import UserAccount, MoneyRequest
+from .services import (
+    aaccount_by_phone, account_by_phone, account_by_upi, open_account, resolve_recipients, transfer, bulk_transfer, bulk_request,
+    TransferError, InsufficientBalance, BulkFailed,
+)
+from .idempotency import idempotent
+from .threadpool import in_thread_pool
+from .otp import RateLimited, VERIFIED, get_otp_store, normalize_phone as normalize_otp_phone
+from .sms import send_sms
+from . import contacts, notifications, tasks
+from .history import DIRECTIONS, REQUEST_SIDES, amoney_requests, apending_request_counts, atransaction_history, transaction_history
+from .pagination import InvalidQuery, decode_cursor, paginate, parse_limit, parse_time_bound
+from django.db import transaction
 # Create your views here.
 
-otp_store = {}
-
 @api_view(['GET'])
 def send_otp(request):
     phone = request.GET.get("phone")
-    otp = str(random.randint(100000, 999999))
-    # Always store phone in +91 format
-    store_phone = phone
-    if not store_phone.startswith('+91'):
-        store_phone = '+91' + store_phone.lstrip('0')
-    otp_store[phone] = otp  
-    print(store_phone)
-    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-    message = client.messages.create(
-        body=f"Your OTP is {otp}",
-        from_=settings.TWILIO_PHONE_NUMBER,
-        to=store_phone
-    )
+    if not phone:
+        return JsonResponse({'error': 'phone is required', 'status': 'error'}, status=400)
+    store_phone = normalize_otp_phone(phone)
+    try:
+        otp = get_otp_store().issue(store_phone)
+    except RateLimited as e:
+        response = JsonResponse({
+            'error': str(e),
+            'retryAfter': e.retry_after,
+            'status': 'error'
+        }, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
+    # Delivered by the task queue; the response does not wait for the SMS provider
+    if send_sms.delay(store_phone, f"Your OTP is {otp}") is None:
+        return JsonResponse({'error': 'Could not send OTP, try again shortly', 'status': 'error'}, status=503)
     return JsonResponse({"status": "OTP sent"})
 
 def verify_otp(request):
     phone = request.GET.get("phone")
     otp = request.GET.get("otp")
-    if otp_store.get(phone) == otp:
+    if not phone:
+        return JsonResponse({"status": "Failed", "reason": "phone is required"}, status=400)
+    result = get_otp_store().verify(normalize_otp_phone(phone), otp)
+    if result == VERIFIED:
         return JsonResponse({"status": "Verified"})
-    return JsonResponse({"status": "Failed"})
+    return JsonResponse({"status": "Failed", "reason": result})
 
 def login(upiName, phoneNumber):
 
@@ -62,6 +76,7 @@ def normalize_phone_number(phone):
         with_prefix = '+91' + phone_clean
         return phone, with_prefix
 
+@in_thread_pool
 @api_view(['POST'])
 def SignUp(request):
     upiName = request.data.get('upiName')
@@ -129,8 +144,7 @@ def SignUp(request):
         }, status=500)
     
     try:
-        user_account = UserAccount.objects.create(user=user)
-        user_account.save()
+        open_account(user)
     except Exception as e:
         return JsonResponse({
             'error': str(e),
@@ -151,10 +165,10 @@ def generateUpiId(upiName):
     return upi_id
 
 
-def searchNumber(request):
+async def searchNumber(request):
     phoneNumber = request.GET.get('phoneNumber')
     try:
-        user = User.objects.get(phoneNumber=phoneNumber)
+        user = await User.objects.aget(phoneNumber=phoneNumber)
         return JsonResponse({
             'upiName': user.upiName,
             'upiId': user.upiMail,
@@ -166,10 +180,10 @@ def searchNumber(request):
             'status': 'error'
         }, status=404)
         
-def searchByUpiId(request):
+async def searchByUpiId(request):
     upiId = request.GET.get('upiId')
     try:
-        user = User.objects.get(upiMail=upiId)
+        user = await User.objects.aget(upiMail=upiId)
         return JsonResponse({
             'upiName': user.upiName,
             'phoneNumber': user.phoneNumber,
@@ -181,10 +195,43 @@ def searchByUpiId(request):
             'status': 'error'
         }, status=404)
         
-def getProfile(request):
+@api_view(['GET'])
+def resolveRecipient(request):
+    """Match a spoken name against the caller's recent counterparties
+
+    Returns ranked candidates, and in 'resolved' the one to use when the
+    match is confident and unambiguous (null otherwise, so the client asks).
+    """
+    name = request.GET.get('name', '')
+    if not name.strip():
+        return JsonResponse({'error': 'name is required', 'status': 'error'}, status=400)
+    try:
+        limit = parse_limit(request.GET.get('limit'), default=5, maximum=20)
+        user_account = account_by_phone(request.GET.get('phoneNumber'))
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e), 'status': 'error'}, status=400)
+    except User.DoesNotExist:
+        return JsonResponse({
+            'error': 'User not found',
+            'status': 'error'
+        }, status=404)
+    except UserAccount.DoesNotExist:
+        return JsonResponse({
+            'error': 'User account not found',
+            'status': 'error'
+        }, status=404)
+
+    candidates, resolved = contacts.resolve(user_account, name, limit)
+    return JsonResponse({
+        'candidates': candidates,
+        'resolved': resolved,
+        'status': 'success'
+    })
+
+async def getProfile(request):
     phoneNumber = request.GET.get('phoneNumber')
     try:
-        user = User.objects.get(phoneNumber=phoneNumber)
+        user = await User.objects.aget(phoneNumber=phoneNumber)
         return JsonResponse({
             'upiName': user.upiName,
             'upiId': user.upiMail,
@@ -197,11 +244,10 @@ def getProfile(request):
         }, status=404)
 
 
-def getBalance(request):
+async def getBalance(request):
     phoneNumber = request.GET.get('phoneNumber')
     try:
-        user = User.objects.get(phoneNumber=phoneNumber)
-        user_account = UserAccount.objects.get(user=user)
+        user_account = await aaccount_by_phone(phoneNumber)
         return JsonResponse({
             'balance': str(user_account.balance),
             'status': 'success'
@@ -217,16 +263,17 @@ def getBalance(request):
             'status': 'error'
         }, status=404)
 
+@in_thread_pool
 @csrf_exempt
 @api_view(['POST'])
+@idempotent
 def sendMoneyId(request):
     sender_phone = request.data.get('senderPhone')
     receiver_upi = request.data.get('receiverUpi')
     amount = Decimal(str(request.data.get('amount')))
     
     try:
-        sender = User.objects.get(phoneNumber=sender_phone)
-        sender_account = UserAccount.objects.get(user=sender)
+        sender_account = account_by_phone(sender_phone)
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Sender not found',
@@ -239,8 +286,8 @@ def sendMoneyId(request):
         }, status=404)
     
     try:
-        receiver = User.objects.get(upiMail=receiver_upi)
-        receiver_account = UserAccount.objects.get(user=receiver)
+        receiver_account = account_by_upi(receiver_upi)
+        receiver = receiver_account.user
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Receiver not found',
@@ -252,44 +299,36 @@ def sendMoneyId(request):
             'status': 'error'
         }, status=404)
     
-    if sender_account.balance < amount:
+    try:
+        transfer(sender_account.pk, receiver_account.pk, amount)
+    except TransferError as e:
         return JsonResponse({
-            'error': 'Insufficient balance',
+            'error': e.message,
             'status': 'error'
-        }, status=400)
-    sender_account.balance = sender_account.balance - amount
-    receiver_account.balance = receiver_account.balance + amount
-    sender_account.save()
-    receiver_account.save()
-    
-    try:
-        transaction = Transaction.objects.create(
-            sender=sender_account,
-            receiver=receiver_account,
-            amount=amount,
-            status='completed'
-        )
-        transaction.save()
+        }, status=e.status_code)
     except Exception as e:
         return JsonResponse({
             'error': str(e),
             'status': 'error'
         }, status=500)
+    # Outside the try: the money has moved, so nothing after this may turn into an error
+    notifications.payment_received(sender_account.user, receiver, amount)
     
     return JsonResponse({
         'message': f'Successfully sent {amount} to {receiver.upiName}',
         'status': 'success'
     })
 
+@in_thread_pool
 @api_view(['POST'])
+@idempotent
 def sendMoneyPhone(request):
     sender_phone = request.data.get('senderPhone')
     receiver_phone = request.data.get('receiverPhone')
     amount = Decimal(str(request.data.get('amount')))
     
     try:
-        sender = User.objects.get(phoneNumber=sender_phone)
-        sender_account = UserAccount.objects.get(user=sender)
+        sender_account = account_by_phone(sender_phone)
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Sender not found',
@@ -302,8 +341,8 @@ def sendMoneyPhone(request):
         }, status=404)
     
     try:
-        receiver = User.objects.get(phoneNumber=receiver_phone)
-        receiver_account = UserAccount.objects.get(user=receiver)
+        receiver_account = account_by_phone(receiver_phone)
+        receiver = receiver_account.user
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Receiver not found',
@@ -315,47 +354,265 @@ def sendMoneyPhone(request):
             'status': 'error'
         }, status=404)
     
-    if sender_account.balance < amount:
+    try:
+        transfer(sender_account.pk, receiver_account.pk, amount)
+    except TransferError as e:
         return JsonResponse({
-            'error': 'Insufficient balance',
+            'error': e.message,
             'status': 'error'
-        }, status=400)
-    sender_account.balance = sender_account.balance - amount
-    receiver_account.balance = receiver_account.balance + amount
-    sender_account.save()
-    receiver_account.save()
-    
-    try:
-        transaction = Transaction.objects.create(
-            sender=sender_account,
-            receiver=receiver_account,
-            amount=amount,
-            status='completed'
-        )
-        transaction.save()
+        }, status=e.status_code)
     except Exception as e:
         return JsonResponse({
             'error': str(e),
             'status': 'error'
         }, status=500)
+    # Outside the try: the money has moved, so nothing after this may turn into an error
+    notifications.payment_received(sender_account.user, receiver, amount)
     
     return JsonResponse({
         'message': f'Successfully sent {amount} to {receiver.upiName}',
         'status': 'success'
     })
 
+BULK_MODES = ('all_or_nothing', 'best_effort')
+
+
+def _parse_bulk_items(data, key):
+    """(recipient, account, amount, message) for each entry of data[key]
+
+    An entry names its recipient by 'phone' or 'upi'; 'amount' and 'message'
+    fall back to the top-level ones, so "200 each" needs a single amount.
+    All recipients are resolved with one query; unknown ones get account None.
+    """
+    entries = data.get(key)
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        raise InvalidQuery(f'{key} must be a list of objects')
+    by_phone, by_upi = resolve_recipients(
+        phones=[entry['phone'] for entry in entries if entry.get('phone')],
+        upi_ids=[entry['upi'] for entry in entries if entry.get('upi') and not entry.get('phone')],
+    )
+    items = []
+    for entry in entries:
+        if entry.get('phone'):
+            recipient, account = entry['phone'], by_phone.get(entry['phone'])
+        else:
+            recipient, account = entry.get('upi'), by_upi.get(entry.get('upi'))
+        try:
+            amount = Decimal(str(entry.get('amount', data.get('amount'))))
+            if not amount.is_finite():
+                amount = None
+        except InvalidOperation:
+            amount = None
+        items.append((recipient, account, amount, entry.get('message', data.get('message', ''))))
+    return items
+
+
+def _bulk_response(items, results, id_field, record_field):
+    completed = [result for result in results if result['status'] in ('completed', 'created')]
+    rows = []
+    for (recipient, _, amount, _), result in zip(items, results):
+        row = {'recipient': recipient, 'amount': None if amount is None else str(amount), 'status': result['status']}
+        if 'error' in result:
+            row['error'] = result['error']
+        if record_field in result:
+            row[id_field] = result[record_field].id
+        rows.append(row)
+    return JsonResponse({
+        'results': rows,
+        'succeeded': len(completed),
+        'failed': len(rows) - len(completed),
+        'totalAmount': str(sum((result[record_field].amount for result in completed), Decimal('0'))),
+        'status': 'success' if len(completed) == len(rows) else 'partial' if completed else 'error'
+    }, status=200 if completed else 400)
+
+
+def _bulk_failure(items, e):
+    return JsonResponse({
+        'error': e.message,
+        'results': [
+            {'recipient': recipient, 'amount': None if amount is None else str(amount), **result}
+            for (recipient, _, amount, _), result in zip(items, e.results)
+        ],
+        'status': 'error'
+    }, status=e.status_code)
+
+
+@in_thread_pool
+@api_view(['POST'])
+@idempotent
+def bulkSend(request):
+    """Pay several recipients from one account in a single database transaction
+
+    Body: senderPhone, payments [{phone|upi, amount}], an optional default
+    amount, and mode: all_or_nothing (default) or best_effort.
+    """
+    mode = request.data.get('mode', 'all_or_nothing')
+    if mode not in BULK_MODES:
+        return JsonResponse({'error': f'mode must be one of {", ".join(BULK_MODES)}', 'status': 'error'}, status=400)
+    try:
+        sender_account = account_by_phone(request.data.get('senderPhone'))
+    except User.DoesNotExist:
+        return JsonResponse({
+            'error': 'Sender not found',
+            'status': 'error'
+        }, status=404)
+    except UserAccount.DoesNotExist:
+        return JsonResponse({
+            'error': 'Sender account not found',
+            'status': 'error'
+        }, status=404)
+
+    try:
+        items = _parse_bulk_items(request.data, 'payments')
+        results = bulk_transfer(
+            sender_account.pk,
+            [(account and account.pk, amount) for _, account, amount, _ in items],
+            all_or_nothing=mode == 'all_or_nothing'
+        )
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e), 'status': 'error'}, status=400)
+    except BulkFailed as e:
+        return _bulk_failure(items, e)
+    except TransferError as e:
+        return JsonResponse({
+            'error': e.message,
+            'status': 'error'
+        }, status=e.status_code)
+
+    for (_, account, amount, _), result in zip(items, results):
+        if result['status'] == 'completed':
+            notifications.payment_received(sender_account.user, account.user, amount)
+    return _bulk_response(items, results, 'transactionId', 'transaction')
+
+
+@in_thread_pool
 @api_view(['POST'])
+@idempotent
+def bulkRequest(request):
+    """Request money from several people at once, e.g. to split a bill
+
+    Body: requesterPhone, requests [{phone|upi, amount, message}], optional
+    default amount and message, and mode: all_or_nothing (default) or best_effort.
+    """
+    mode = request.data.get('mode', 'all_or_nothing')
+    if mode not in BULK_MODES:
+        return JsonResponse({'error': f'mode must be one of {", ".join(BULK_MODES)}', 'status': 'error'}, status=400)
+    try:
+        requester_account = account_by_phone(request.data.get('requesterPhone'))
+    except User.DoesNotExist:
+        return JsonResponse({
+            'error': 'Requester not found',
+            'status': 'error'
+        }, status=404)
+    except UserAccount.DoesNotExist:
+        return JsonResponse({
+            'error': 'Requester account not found',
+            'status': 'error'
+        }, status=404)
+
+    try:
+        items = _parse_bulk_items(request.data, 'requests')
+        results = bulk_request(
+            requester_account.pk,
+            [(account and account.pk, amount, message) for _, account, amount, message in items],
+            all_or_nothing=mode == 'all_or_nothing'
+        )
+    except InvalidQuery as e:
+        return JsonResponse({'error': str(e), 'status': 'error'}, status=400)
+    except BulkFailed as e:
+        return _bulk_failure(items, e)
+    except TransferError as e:
+        return JsonResponse({
+            'error': e.message,
+            'status': 'error'
+        }, status=e.status_code)
+
+    for (_, account, amount, message), result in zip(items, results):
+        if result['status'] == 'created':
+            notifications.money_requested(requester_account.user, account.user, amount, message)
+    return _bulk_response(items, results, 'requestId', 'request')
+
+@require_GET
+async def getTransactionHistory(request):
+    """Merged sent/received history, newest first, one page per call
+
+    Query params: phoneNumber, limit, cursor (nextCursor of the previous page),
+    status, direction (all|sent|received), counterparty (phone or UPI ID),
+    since, until (ISO date or datetime).
+    """
+    params = request.GET
+    try:
+        user_account = await aaccount_by_phone(params.get('phoneNumber'))
+        direction = params.get('direction', 'all')
+        if direction not in DIRECTIONS:
+            raise InvalidQuery(f"direction must be one of {', '.join(DIRECTIONS)}")
+        limit = parse_limit(params.get('limit'))
+        rows = await atransaction_history(
+            user_account,
+            limit=limit + 1,
+            direction=direction,
+            status=params.get('status'),
+            counterparty=params.get('counterparty'),
+            since=parse_time_bound(params.get('since')),
+            until=parse_time_bound(params.get('until'), end_of_day=True),
+            cursor=decode_cursor(params['cursor']) if params.get('cursor') else None,
+        )
+    except InvalidQuery as e:
+        return JsonResponse({
+            'error': str(e),
+            'status': 'error'
+        }, status=400)
+    except User.DoesNotExist:
+        return JsonResponse({
+            'error': 'User not found',
+            'status': 'error'
+        }, status=404)
+    except UserAccount.DoesNotExist:
+        return JsonResponse({
+            'error': 'User account not found',
+            'status': 'error'
+        }, status=404)
+    
+    page, next_cursor = paginate(rows, limit, 'timestamp')
+    return JsonResponse({
+        'transactions': [{
+            'id': row['id'],
+            'direction': row['direction'],
+            'amount': row['amount'],
+            'timestamp': row['timestamp'],
+            'status': row['status'],
+            'counterparty': {
+                'name': row['counterparty_name'],
+                'phoneNumber': row['counterparty_phone'],
+                'upiId': row['counterparty_upi'],
+            },
+        } for row in page],
+        'nextCursor': next_cursor,
+        'hasMore': next_cursor is not None,
+        'status': 'success'
+    })
+
+@api_view(['GET', 'POST'])
 def getTransactions(request):
-    phoneNumber = request.data.get('phoneNumber')
+    """Full history split into sent/received; kept for older clients, see getTransactionHistory"""
+    phoneNumber = request.data.get('phoneNumber') or request.GET.get('phoneNumber')
     try:
-        user = User.objects.get(phoneNumber=phoneNumber)
-        user_account = UserAccount.objects.get(user=user)
-        sent_transactions = Transaction.objects.filter(sender=user_account).values('receiver__user__upiName', 'amount', 'timestamp', 'status')
-        received_transactions = Transaction.objects.filter(receiver=user_account).values('sender__user__upiName', 'amount', 'timestamp', 'status')
+        user_account = account_by_phone(phoneNumber)
+        rows = transaction_history(user_account)
         
         transactions = {
-            'sent': list(sent_transactions),
-            'received': list(received_transactions)
+            'sent': [{
+                'receiver__user__upiName': row['counterparty_name'],
+                'amount': row['amount'],
+                'timestamp': row['timestamp'],
+                'status': row['status']
+            } for row in rows if row['direction'] == 'sent'],
+            'received': [{
+                'sender__user__upiName': row['counterparty_name'],
+                'amount': row['amount'],
+                'timestamp': row['timestamp'],
+                'status': row['status']
+            } for row in rows if row['direction'] == 'received']
         }
         
         return JsonResponse({
@@ -373,30 +630,24 @@ def getTransactions(request):
             'status': 'error'
         }, status=404)
 
-@api_view(['GET'])        
-def checkHasAccount(request):
+@require_GET
+async def checkHasAccount(request):
     phoneNumber = request.GET.get('phoneNumber')
     print('here')
-    try:
-        user = User.objects.get(phoneNumber=phoneNumber)
-        user_account = UserAccount.objects.get(user=user)
+    if await UserAccount.objects.filter(user__phoneNumber=phoneNumber).aexists():
         return JsonResponse({
             'hasAccount': True,
             'status': 'success'
         })
-    except User.DoesNotExist:
-        return JsonResponse({
-            'hasAccount': False,
-            'status': 'error'
-        }, status=404)
-    except UserAccount.DoesNotExist:
-        return JsonResponse({
-            'hasAccount': False,
-            'status': 'error'
-        }, status=404)
+    return JsonResponse({
+        'hasAccount': False,
+        'status': 'error'
+    }, status=404)
 
 # Money Request APIs
+@in_thread_pool
 @api_view(['POST'])
+@idempotent
 def createMoneyRequest(request):
     requester_phone = request.data.get('requesterPhone')
     requestee_phone = request.data.get('requesteePhone')
@@ -404,8 +655,7 @@ def createMoneyRequest(request):
     message = request.data.get('message', '')
     
     try:
-        requester = User.objects.get(phoneNumber=requester_phone)
-        requester_account = UserAccount.objects.get(user=requester)
+        requester_account = account_by_phone(requester_phone)
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Requester not found',
@@ -418,8 +668,8 @@ def createMoneyRequest(request):
         }, status=404)
     
     try:
-        requestee = User.objects.get(phoneNumber=requestee_phone)
-        requestee_account = UserAccount.objects.get(user=requestee)
+        requestee_account = account_by_phone(requestee_phone)
+        requestee = requestee_account.user
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Requestee not found',
@@ -439,7 +689,8 @@ def createMoneyRequest(request):
             message=message,
             status='pending'
         )
-        money_request.save()
+        contacts.invalidate(requester_account.pk, requestee_account.pk)
+        notifications.money_requested(requester_account.user, requestee, amount, message)
         
         return JsonResponse({
             'message': f'Money request of ₹{amount} sent to {requestee.upiName}',
@@ -452,7 +703,9 @@ def createMoneyRequest(request):
             'status': 'error'
         }, status=500)
 
+@in_thread_pool
 @api_view(['POST'])
+@idempotent
 def createMoneyRequestByUpi(request):
     requester_phone = request.data.get('requesterPhone')
     requestee_upi = request.data.get('requesteeUpi')
@@ -460,8 +713,7 @@ def createMoneyRequestByUpi(request):
     message = request.data.get('message', '')
     
     try:
-        requester = User.objects.get(phoneNumber=requester_phone)
-        requester_account = UserAccount.objects.get(user=requester)
+        requester_account = account_by_phone(requester_phone)
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Requester not found',
@@ -474,8 +726,8 @@ def createMoneyRequestByUpi(request):
         }, status=404)
     
     try:
-        requestee = User.objects.get(upiMail=requestee_upi)
-        requestee_account = UserAccount.objects.get(user=requestee)
+        requestee_account = account_by_upi(requestee_upi)
+        requestee = requestee_account.user
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'Requestee not found',
@@ -495,7 +747,8 @@ def createMoneyRequestByUpi(request):
             message=message,
             status='pending'
         )
-        money_request.save()
+        contacts.invalidate(requester_account.pk, requestee_account.pk)
+        notifications.money_requested(requester_account.user, requestee, amount, message)
         
         return JsonResponse({
             'message': f'Money request of ₹{amount} sent to {requestee.upiName}',
@@ -508,32 +761,66 @@ def createMoneyRequestByUpi(request):
             'status': 'error'
         }, status=500)
 
-@api_view(['GET'])
-def getMoneyRequests(request):
-    phone_number = request.GET.get('phoneNumber')
+@require_GET
+async def getMoneyRequests(request):
+    """Sent and received money requests, newest first
+
+    Optional query params: status, side (all|sent|received), limit, and
+    sentCursor/receivedCursor from the previous page. Without limit or a
+    cursor every matching request is returned, as before.
+    """
+    params = request.GET
+    phone_number = params.get('phoneNumber')
     
     try:
-        user = User.objects.get(phoneNumber=phone_number)
-        user_account = UserAccount.objects.get(user=user)
-        
-        # Get sent requests
-        sent_requests = MoneyRequest.objects.filter(requester=user_account).values(
-            'id', 'requestee__user__upiName', 'requestee__user__phoneNumber', 
-            'amount', 'message', 'status', 'created_at', 'updated_at'
-        )
-        
-        # Get received requests
-        received_requests = MoneyRequest.objects.filter(requestee=user_account).values(
-            'id', 'requester__user__upiName', 'requester__user__phoneNumber',
-            'amount', 'message', 'status', 'created_at', 'updated_at'
-        )
+        user_account = await aaccount_by_phone(phone_number)
+        side = params.get('side', 'all')
+        if side not in REQUEST_SIDES:
+            raise InvalidQuery(f"side must be one of {', '.join(REQUEST_SIDES)}")
+        paginated = any(params.get(name) for name in ('limit', 'sentCursor', 'receivedCursor'))
+        limit = parse_limit(params.get('limit')) if paginated else None
         
+        pages = {}
+        for name in ('sent', 'received'):
+            if side not in ('all', name):
+                continue
+            cursor = params.get(f'{name}Cursor')
+            rows = await amoney_requests(
+                user_account,
+                name,
+                status=params.get('status'),
+                cursor=decode_cursor(cursor) if cursor else None,
+                limit=limit + 1 if paginated else None,
+            )
+            pages[name] = paginate(rows, limit, 'created_at') if paginated else (rows, None)
+    except InvalidQuery as e:
         return JsonResponse({
-            'sentRequests': list(sent_requests),
-            'receivedRequests': list(received_requests),
-            'status': 'success'
-        })
-        
+            'error': str(e),
+            'status': 'error'
+        }, status=400)
+    except User.DoesNotExist:
+        return JsonResponse({
+            'error': 'User not found',
+            'status': 'error'
+        }, status=404)
+    except UserAccount.DoesNotExist:
+        return JsonResponse({
+            'error': 'User account not found',
+            'status': 'error'
+        }, status=404)
+    
+    response = {'status': 'success'}
+    for name, (rows, next_cursor) in pages.items():
+        response[f'{name}Requests'] = rows
+        if paginated:
+            response[f'next{name.title()}Cursor'] = next_cursor
+    return JsonResponse(response)
+
+@require_GET
+async def getPendingRequestCount(request):
+    """Pending requests for the badge the app polls, without downloading the list"""
+    try:
+        user_account = await aaccount_by_phone(request.GET.get('phoneNumber'))
     except User.DoesNotExist:
         return JsonResponse({
             'error': 'User not found',
@@ -544,75 +831,73 @@ def getMoneyRequests(request):
             'error': 'User account not found',
             'status': 'error'
         }, status=404)
+    
+    counts = await apending_request_counts(user_account)
+    return JsonResponse({
+        'received': counts['received'],
+        'sent': counts['sent'],
+        'status': 'success'
+    })
+
+@api_view(['GET'])
+def getTaskMetrics(request):
+    """Background task queue depth, outcomes, latencies and recent dead letters"""
+    return JsonResponse({
+        'tasks': tasks.stats(),
+        'status': 'success'
+    })
 
+@in_thread_pool
 @api_view(['POST'])
+@idempotent
 def updateRequestStatus(request):
     request_id = request.data.get('requestId')
     new_status = request.data.get('status')  # 'approved', 'rejected', 'cancelled'
     phone_number = request.data.get('phoneNumber')
     
     try:
-        money_request = MoneyRequest.objects.get(id=request_id)
-        user = User.objects.get(phoneNumber=phone_number)
-        user_account = UserAccount.objects.get(user=user)
-        
-        # Check if user has permission to update this request
-        if money_request.requester != user_account and money_request.requestee != user_account:
-            return JsonResponse({
-                'error': 'Unauthorized to update this request',
-                'status': 'error'
-            }, status=403)
-        
-        # Validate status transitions
-        if new_status == 'cancelled' and money_request.requester != user_account:
-            return JsonResponse({
-                'error': 'Only requester can cancel the request',
-                'status': 'error'
-            }, status=403)
-        
-        if new_status in ['approved', 'rejected'] and money_request.requestee != user_account:
-            return JsonResponse({
-                'error': 'Only requestee can approve or reject the request',
-                'status': 'error'
-            }, status=403)
-        
-        if money_request.status != 'pending':
-            return JsonResponse({
-                'error': 'Request has already been processed',
-                'status': 'error'
-            }, status=400)
+        user_account = account_by_phone(phone_number)
         
-        # If approved, process the payment
-        if new_status == 'approved':
-            requestee_account = money_request.requestee
-            requester_account = money_request.requester
-            amount = money_request.amount
+        # The request row stays locked until commit, so it can only be processed once
+        with transaction.atomic():
+            money_request = MoneyRequest.objects.select_for_update(of=('self',)).select_related(
+                'requester__user', 'requestee__user'
+            ).get(id=request_id)
+            
+            # Check if user has permission to update this request
+            if money_request.requester_id != user_account.pk and money_request.requestee_id != user_account.pk:
+                return JsonResponse({
+                    'error': 'Unauthorized to update this request',
+                    'status': 'error'
+                }, status=403)
+            
+            # Validate status transitions
+            if new_status == 'cancelled' and money_request.requester_id != user_account.pk:
+                return JsonResponse({
+                    'error': 'Only requester can cancel the request',
+                    'status': 'error'
+                }, status=403)
+            
+            if new_status in ['approved', 'rejected'] and money_request.requestee_id != user_account.pk:
+                return JsonResponse({
+                    'error': 'Only requestee can approve or reject the request',
+                    'status': 'error'
+                }, status=403)
             
-            # Check if requestee has sufficient balance
-            if requestee_account.balance < amount:
+            if money_request.status != 'pending':
                 return JsonResponse({
-                    'error': 'Insufficient balance to approve request',
+                    'error': 'Request has already been processed',
                     'status': 'error'
                 }, status=400)
             
-            # Process the payment
-            requestee_account.balance -= amount
-            requester_account.balance += amount
-            requestee_account.save()
-            requester_account.save()
+            # If approved, the requestee pays the requester in the same transaction
+            if new_status == 'approved':
+                transfer(money_request.requestee_id, money_request.requester_id, money_request.amount)
             
-            # Create transaction record
-            transaction = Transaction.objects.create(
-                sender=requestee_account,
-                receiver=requester_account,
-                amount=amount,
-                status='completed'
-            )
-            transaction.save()
-        
-        # Update request status
-        money_request.status = new_status
-        money_request.save()
+            # Update request status
+            money_request.status = new_status
+            money_request.save(update_fields=['status', 'updated_at'])
+            notifications.request_updated(money_request, new_status)
         
         return JsonResponse({
             'message': f'Request {new_status} successfully',
@@ -634,6 +919,16 @@ def updateRequestStatus(request):
             'error': 'User account not found',
             'status': 'error'
         }, status=404)
+    except InsufficientBalance:
+        return JsonResponse({
+            'error': 'Insufficient balance to approve request',
+            'status': 'error'
+        }, status=400)
+    except TransferError as e:
+        return JsonResponse({
+            'error': e.message,
+            'status': 'error'
+        }, status=e.status_code)
     except Exception as e:
         return JsonResponse({
             'error': str(e),
@@ -0,0 +1,113 @@
+"""Load test for the accounts API: requests/sec and latency percentiles.
+
+Runs the same request mix, concurrency and duration against each target in
+turn, so WSGI and ASGI serving can be compared at a fixed worker count:
+
+    gunicorn DJBackend.wsgi -w 4 -b :8001 &
+    uvicorn DJBackend.asgi:application --workers 4 --port 8002 &
+    python loadtest.py --phone +919000000001 wsgi=http://localhost:8001 asgi=http://localhost:8002
+
+The mix is the read endpoints the app polls. --send-to adds one
+sendMoneyPhone of ₹1 every --send-every requests.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+READS = [
+    ('getBalance', lambda phone: {'phoneNumber': phone}),
+    ('getProfile', lambda phone: {'phoneNumber': phone}),
+    ('checkHasAccount', lambda phone: {'phoneNumber': phone}),
+    ('transactionHistory', lambda phone: {'phoneNumber': phone, 'limit': 20}),
+    ('getMoneyRequests', lambda phone: {'phoneNumber': phone, 'limit': 20}),
+    ('pendingRequestCount', lambda phone: {'phoneNumber': phone}),
+]
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def client(session, base_url, args, deadline, latencies, errors, rng):
+    sent = 0
+    while time.perf_counter() < deadline:
+        sent += 1
+        started = time.perf_counter()
+        try:
+            if args.send_to and sent % args.send_every == 0:
+                request = session.post(f'{base_url}/accounts/sendMoneyPhone/', json={
+                    'senderPhone': args.phone, 'receiverPhone': args.send_to, 'amount': '1'
+                })
+            else:
+                endpoint, params = rng.choice(READS)
+                request = session.get(f'{base_url}/accounts/{endpoint}/', params=params(args.phone))
+            async with request as response:
+                await response.read()
+                ok = response.status < 500
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        if time.perf_counter() <= deadline:
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(1)
+
+
+async def run_target(base_url, args):
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Results of the warm-up pass are discarded
+        for seconds in (args.warmup, args.duration):
+            latencies, errors = [], []
+            deadline = time.perf_counter() + seconds
+            await asyncio.gather(*[
+                client(session, base_url, args, deadline, latencies, errors, random.Random(seed))
+                for seed in range(args.concurrency)
+            ])
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('targets', nargs='+', help='label=base_url, e.g. asgi=http://localhost:8002')
+    parser.add_argument('--phone', required=True, help='phone number of an existing account')
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--send-to', help='receiver phone; adds sendMoneyPhone calls to the mix')
+    parser.add_argument('--send-every', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.targets:
+        label, _, base_url = target.rpartition('=')
+        results[label or base_url] = asyncio.run(run_target(base_url.rstrip('/'), args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.concurrency} concurrent clients, {args.duration:g}s per target")
+    print(f"{'target':<12}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for label, result in results.items():
+        print(f"{label:<12}{result['requests']:>10}{result['rps']:>10}{result['p50_ms']!s:>10}"
+              f"{result['p95_ms']!s:>10}{result['p99_ms']!s:>10}{result['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()